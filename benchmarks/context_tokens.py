@@ -0,0 +1,123 @@
+"""Context tokens per turn: raw top-k snippets vs. ContextCompressor.
+
+Builds a synthetic FAQ corpus in which every answer was ingested several
+times: as an exact copy (the same text under another source) and as near
+copies (a few words reworded). Each query asks about one answer; the top
+`--top-k` hits by `HashingEmbedder` cosine are then rendered as the chat
+router would, raw and after each compression setting. "distinct" counts
+the different answers left in the context, and "hit" is the share of
+queries whose answer (or one of its copies) is still in it.
+
+Run from the repo root:
+
+    python -m benchmarks.context_tokens --queries 200 --top-k 20 --max-tokens 1000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from statistics import mean
+
+import numpy as np
+
+from src.helpers.context import ContextCompressor
+from src.helpers.history import get_token_counter
+from src.helpers.retriever import Hit, Retriever
+from src.helpers.vector_store import HashingEmbedder
+
+TOPICS = {
+    "cards": "card limit contactless pin chip replacement expiry freeze stolen",
+    "transfers": "transfer wire iban swift beneficiary cutoff instant domestic international",
+    "security": "password device login verification biometric phishing session lockout",
+    "fees": "fee monthly charge overdraft interest statement waiver premium",
+    "identity": "identity kyc passport address proof selfie document review",
+}
+FILLER = "the your a for to when after before you can we will please from within days".split()
+
+
+def _sentence(rng: random.Random, words: list[str], n: int) -> str:
+    return " ".join(rng.choice(words) for _ in range(n))
+
+
+def _reword(rng: random.Random, text: str, changes: int) -> str:
+    words = text.split()
+    for index in rng.sample(range(len(words)), changes):
+        words[index] = rng.choice(FILLER)
+    return " ".join(words)
+
+
+def _corpus(rng: random.Random, answers: int, exact: int, near: int, words: int) -> list[tuple[str, str, str]]:
+    """(id, category, text) rows; ids share the `faq-N` prefix of the answer they copy."""
+    rows = []
+    for number in range(answers):
+        category = rng.choice(list(TOPICS))
+        # A few terms of its own (product names, form numbers) set each answer apart within its topic.
+        vocabulary = TOPICS[category].split() + FILLER + [f"term{rng.randrange(5000)}" for _ in range(6)]
+        text = _sentence(rng, vocabulary, words)
+        rows.append((f"faq-{number}", category, text))
+        rows += [(f"faq-{number}-copy{copy}", category, text) for copy in range(exact)]
+        rows += [(f"faq-{number}-near{copy}", category, _reword(rng, text, max(1, words // 30))) for copy in range(near)]
+    return rows
+
+
+def _answer(hit: Hit) -> str:
+    return "-".join(hit["_id"].split("-")[:2])
+
+
+def _search(embedder: HashingEmbedder, vectors: np.ndarray, rows: list[tuple[str, str, str]], query: str, top_k: int) -> list[Hit]:
+    scores = vectors @ embedder.embed([query])[0]
+    best = np.argsort(-scores)[:top_k]
+    return [{"_id": rows[i][0], "_score": float(scores[i]), "fields": {"text": rows[i][2], "category": rows[i][1]}} for i in best]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=300)
+    parser.add_argument("--exact-copies", type=int, default=1)
+    parser.add_argument("--near-copies", type=int, default=2)
+    parser.add_argument("--words", type=int, default=90, help="words per answer")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--max-tokens", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    rows = _corpus(rng, args.answers, args.exact_copies, args.near_copies, args.words)
+    embedder = HashingEmbedder()
+    vectors = embedder.embed([text for _, _, text in rows])
+    originals = [row for row in rows if row[0].count("-") == 1]
+    queries = []
+    for _ in range(args.queries):
+        answer_id, _, text = rng.choice(originals)
+        # A question echoes part of its answer, as FAQ questions usually do.
+        queries.append((answer_id, " ".join(rng.sample(text.split(), 12))))
+
+    counter = get_token_counter()
+    unlimited = 10 ** 9
+    settings = {
+        "dedup": ContextCompressor(top_k=args.top_k, max_tokens=unlimited),
+        "dedup+budget": ContextCompressor(top_k=args.top_k, max_tokens=args.max_tokens),
+        "budget only": ContextCompressor(top_k=args.top_k, max_tokens=args.max_tokens, dedup_threshold=None),
+        "dedup+mmr+budget": ContextCompressor(top_k=args.top_k, max_tokens=args.max_tokens, reranker="mmr"),
+    }
+    results: dict[str, list[tuple[int, int, int, bool]]] = {"raw": []}
+    results.update({label: [] for label in settings})
+    for answer_id, query in queries:
+        hits = _search(embedder, vectors, rows, query, args.top_k)
+        answers = {_answer(hit) for hit in hits}
+        results["raw"].append((len(hits), counter(Retriever.format_hits(hits)), len(answers), answer_id in answers))
+        for label, compressor in settings.items():
+            context = compressor.compress(query, hits)
+            answers = {_answer(hit) for hit in context.hits}
+            results[label].append((context.kept, counter(context.render()), len(answers), answer_id in answers))
+
+    raw_tokens = mean(sample[1] for sample in results["raw"])
+    print(f"{len(rows)} rows ({args.answers} answers), {args.queries} queries, top_k={args.top_k}, budget={args.max_tokens}")
+    print(f"{'setting':<18} {'snippets':>9} {'tokens':>8} {'saved':>7} {'distinct':>9} {'hit':>6}")
+    for label, samples in results.items():
+        snippets, tokens, distinct, hit = (mean(column) for column in zip(*samples))
+        print(f"{label:<18} {snippets:>9.1f} {tokens:>8.0f} {1 - tokens / raw_tokens:>7.0%} {distinct:>9.1f} {hit:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Local stand-ins for the OpenAI Responses API and a Pinecone index.
+
+One HTTP server answers both, so the app can run (and be load tested)
+without network access or keys:
+
+- `POST /v1/responses`: `responses.parse` (JSON) and `responses.stream`
+  (SSE with the created/output_item/content_part/delta/completed event
+  sequence the SDK's stream accumulator expects). The first delta waits
+  `--ttft-ms`, then words are emitted at `--tokens-per-second`. Usage is
+  reported with a ~4 chars/token estimate of the prompt. A
+  `--slow-fraction` of calls wait `--slow-ttft-ms` instead (a latency
+  tail), and an `--error-rate` of calls fail with 503.
+- `POST /records/namespaces/{namespace}/search`: Pinecone integrated
+  search over a synthetic FAQ corpus, after `--search-latency-ms`.
+- `POST /describe_index_stats`: used by the retriever warm-up.
+
+Point the app at it with:
+
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+    PINECONE_API_KEY=fake PINECONE_HOST=http://127.0.0.1:9100
+
+Run from the repo root:
+
+    python -m benchmarks.fake_upstreams --port 9100 --ttft-ms 400 --tokens-per-second 60
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+WORDS = (
+    "account card transfer limit fee verification identity wire payment refund "
+    "dispute security password device login statement region compliance kyc"
+).split()
+CATEGORIES = ["Account & Registration", "Payments & Transactions", "Security & Fraud Prevention", "Regulations & Compliance", "Technical Support"]
+
+
+@dataclass
+class FakeSettings:
+    ttft_ms: float = 400.0
+    tokens_per_second: float = 60.0
+    answer_tokens: int = 120
+    search_latency_ms: float = 40.0
+    corpus_size: int = 500
+    slow_fraction: float = 0.0
+    slow_ttft_ms: float = 3000.0
+    error_rate: float = 0.0
+
+
+def _corpus(size: int) -> list[dict]:
+    rng = random.Random(11)
+    return [
+        {
+            "_id": f"faq-{i}",
+            "fields": {"text": " ".join(rng.choice(WORDS) for _ in range(60)), "category": CATEGORIES[i % len(CATEGORIES)]},
+        }
+        for i in range(size)
+    ]
+
+
+def _prompt_text(body: dict) -> str:
+    items = body.get("input")
+    if isinstance(items, str):
+        return items
+    return "".join(str(item.get("content", "")) for item in items or [])
+
+
+def _answer_words(prompt: str, count: int) -> list[str]:
+    rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+    return [rng.choice(WORDS) + " " for _ in range(count)]
+
+
+def _response_object(response_id: str, message_id: str, model: str, text: str, prompt_tokens: int, completion_tokens: int, status: str) -> dict:
+    output = []
+    if status == "completed":
+        output = [
+            {
+                "type": "message",
+                "id": message_id,
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": [], "logprobs": []}],
+            }
+        ]
+    return {
+        "id": response_id,
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": status,
+        "model": model,
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "text": {"format": {"type": "text"}},
+        "usage": None if status != "completed" else {
+            "input_tokens": prompt_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": completion_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def build_app(settings: FakeSettings) -> Starlette:
+    corpus = _corpus(settings.corpus_size)
+
+    async def responses(request: Request):
+        body = await request.json()
+        model = body.get("model", "gpt-4o")
+        prompt = _prompt_text(body)
+        prompt_tokens = len(prompt) // 4 + 1
+        words = _answer_words(prompt, settings.answer_tokens)
+        text = "".join(words)
+        response_id, message_id = f"resp_{uuid.uuid4().hex}", f"msg_{uuid.uuid4().hex}"
+        if random.random() < settings.error_rate:
+            return JSONResponse({"error": {"message": "Service unavailable", "type": "server_error", "code": None}}, status_code=503)
+        ttft = (settings.slow_ttft_ms if random.random() < settings.slow_fraction else settings.ttft_ms) / 1000
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + len(words) / settings.tokens_per_second)
+            return JSONResponse(_response_object(response_id, message_id, model, text, prompt_tokens, len(words), "completed"))
+
+        async def events():
+            sequence = 0
+
+            def frame(payload: dict) -> bytes:
+                nonlocal sequence
+                payload["sequence_number"] = sequence
+                sequence += 1
+                return f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+
+            in_progress = _response_object(response_id, message_id, model, "", prompt_tokens, 0, "in_progress")
+            yield frame({"type": "response.created", "response": in_progress})
+            yield frame({"type": "response.in_progress", "response": in_progress})
+            await asyncio.sleep(ttft)
+            item = {"type": "message", "id": message_id, "status": "in_progress", "role": "assistant", "content": []}
+            yield frame({"type": "response.output_item.added", "output_index": 0, "item": item})
+            part = {"type": "output_text", "text": "", "annotations": [], "logprobs": []}
+            yield frame({"type": "response.content_part.added", "item_id": message_id, "output_index": 0, "content_index": 0, "part": part})
+            interval = 1 / settings.tokens_per_second
+            started = time.perf_counter()
+            for index, word in enumerate(words):
+                # Pace against the start time so the rate holds regardless of sleep overshoot.
+                delay = started + index * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield frame({
+                    "type": "response.output_text.delta",
+                    "item_id": message_id,
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": word,
+                    "logprobs": [],
+                })
+            yield frame({"type": "response.output_text.done", "item_id": message_id, "output_index": 0, "content_index": 0, "text": text, "logprobs": []})
+            done_part = {"type": "output_text", "text": text, "annotations": [], "logprobs": []}
+            yield frame({"type": "response.content_part.done", "item_id": message_id, "output_index": 0, "content_index": 0, "part": done_part})
+            done_item = dict(item, status="completed", content=[done_part])
+            yield frame({"type": "response.output_item.done", "output_index": 0, "item": done_item})
+            completed = _response_object(response_id, message_id, model, text, prompt_tokens, len(words), "completed")
+            yield frame({"type": "response.completed", "response": completed})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def search(request: Request):
+        body = await request.json()
+        query = body.get("query", {})
+        text = (query.get("inputs") or {}).get("text", "")
+        top_k = int(query.get("top_k", 10))
+        await asyncio.sleep(settings.search_latency_ms / 1000)
+        rng = random.Random(zlib.crc32(text.lower().encode("utf-8")))
+        picked = rng.sample(range(len(corpus)), min(top_k, len(corpus)))
+        hits = [dict(corpus[i], _score=round(0.9 - rank * 0.02, 4)) for rank, i in enumerate(picked)]
+        return JSONResponse({"result": {"hits": hits}, "usage": {"read_units": 1, "embed_total_tokens": len(text) // 4 + 1}})
+
+    async def describe_index_stats(request: Request):
+        return JSONResponse({"namespaces": {"__default__": {"vectorCount": len(corpus)}}, "dimension": 1024, "indexFullness": 0.0, "totalVectorCount": len(corpus)})
+
+    return Starlette(
+        routes=[
+            Route("/v1/responses", responses, methods=["POST"]),
+            Route("/records/namespaces/{namespace}/search", search, methods=["POST"]),
+            Route("/describe_index_stats", describe_index_stats, methods=["POST", "GET"]),
+        ]
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--ttft-ms", type=float, default=400.0, help="delay before the first output token")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--answer-tokens", type=int, default=120, help="tokens (words) per answer")
+    parser.add_argument("--search-latency-ms", type=float, default=40.0)
+    parser.add_argument("--corpus-size", type=int, default=500)
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="share of model calls that use --slow-ttft-ms")
+    parser.add_argument("--slow-ttft-ms", type=float, default=3000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of model calls answered with 503")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    settings = FakeSettings(
+        args.ttft_ms,
+        args.tokens_per_second,
+        args.answer_tokens,
+        args.search_latency_ms,
+        args.corpus_size,
+        args.slow_fraction,
+        args.slow_ttft_ms,
+        args.error_rate,
+    )
+    uvicorn.run(build_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
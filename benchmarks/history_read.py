@@ -0,0 +1,107 @@
+"""History fetch cost: ORM rows + filter_messages vs. projected rows + filter_rows.
+
+Builds a SQLite conversation where every USER row stores a full
+HUMAN_PROMPT with ten retrieved snippets (as the chat router does), then
+serves its history both ways through `api_response`. Reports wall time and
+peak Python memory per fetch, and checks both produce the same body.
+
+Run from the repo root:
+
+    python -m benchmarks.history_read --messages 1000 --repeat 20
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import UTC, datetime
+from pathlib import Path
+
+from sqlmodel import Session, create_engine
+
+from src.constants.prompts import HUMAN_PROMPT, SYSTEM_PROMPT
+from src.constants.role import Role
+from src.controllers.conversation import get_conversation_messages, get_display_messages
+from src.helpers.filter_message import filter_messages, filter_rows
+from src.helpers.migrations import run_migrations
+from src.helpers.response import api_response
+from src.sql_models.conversation import Conversation
+from src.sql_models.message import Message
+
+WORDS = (
+    "account card transfer limit fee verification identity wire payment refund "
+    "dispute security password device login statement region compliance kyc"
+).split()
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def _snippets(rng: random.Random, k: int = 10) -> str:
+    return "".join(f"Source: doc-{rng.randint(1, 500)}\nCategory: faq\nText: {_sentence(rng, 60)}\n\n" for _ in range(k))
+
+
+def _populate(session: Session, messages: int, rng: random.Random) -> int:
+    conversation = Conversation(user_id=1, created_at=datetime.now(UTC))
+    session.add(conversation)
+    session.flush()
+    rows = [Message(conversation_id=conversation.id, role=Role.SYSTEM, content=SYSTEM_PROMPT, user_message=None)]
+    for i in range(messages // 2):
+        question = _sentence(rng, 14) + "?"
+        if i % 25 == 24:
+            rows.append(Message(conversation_id=conversation.id, role=Role.GUARDRAILS, content="I can't help with that.", user_message=question))
+            continue
+        prompt = HUMAN_PROMPT.format(USER_QUERY=question, CONTEXT_SNIPPETS=_snippets(rng))
+        rows.append(Message(conversation_id=conversation.id, role=Role.USER, content=prompt, user_message=question))
+        rows.append(Message(conversation_id=conversation.id, role=Role.ASSISTANT, content=_sentence(rng, 90), user_message=None))
+    session.add_all(rows)
+    session.commit()
+    return conversation.id
+
+
+def _measure(fn, repeat: int) -> tuple[float, float]:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        run_migrations(engine)
+        with Session(engine) as session:
+            conversation_id = _populate(session, args.messages, random.Random(7))
+
+        def orm() -> bytes:
+            with Session(engine) as session:
+                return api_response({"messages": filter_messages(get_conversation_messages(conversation_id, session))}).body
+
+        def projected() -> bytes:
+            with Session(engine) as session:
+                return api_response({"messages": filter_rows(get_display_messages(conversation_id, session))}).body
+
+        assert orm() == projected(), "projected history differs from the ORM path"
+        print(f"{'path':<10} {'ms/fetch':>9} {'peak_MiB':>9}")
+        for name, fn in (("orm", orm), ("projected", projected)):
+            elapsed, peak = _measure(fn, args.repeat)
+            print(f"{name:<10} {elapsed:>9.2f} {peak:>9.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Prompt size per turn: full-history replay vs. HistoryBuilder.
+
+Simulates a long conversation where every USER row stores the full
+HUMAN_PROMPT with ten retrieved snippets, exactly as the chat router does,
+and reports the prompt tokens each strategy would send to the model.
+
+Run from the repo root:
+
+    python -m benchmarks.history_tokens --turns 200 --budget 8000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from datetime import UTC, datetime
+
+from src.constants.prompts import HUMAN_PROMPT, SYSTEM_PROMPT
+from src.constants.role import Role
+from src.helpers.history import HistoryBuilder
+from src.sql_models.message import Message
+
+WORDS = (
+    "account card transfer limit fee verification identity wire payment refund "
+    "dispute security password device login statement region compliance kyc"
+).split()
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def _snippets(rng: random.Random, k: int = 10) -> str:
+    return "".join(
+        f"Source: doc-{rng.randint(1, 500)}\nCategory: faq\nText: {_sentence(rng, 60)}\n\n" for _ in range(k)
+    )
+
+
+def _message(role: str, content: str, user_message: str | None = None) -> Message:
+    return Message(conversation_id=1, role=role, content=content, user_message=user_message, created_at=datetime.now(UTC))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=8000)
+    parser.add_argument("--summary", action="store_true", help="fold trimmed turns into a digest")
+    parser.add_argument("--every", type=int, default=20, help="print every N turns")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    builder = HistoryBuilder(max_tokens=args.budget, summarize=args.summary)
+    stored: list[Message] = [_message(Role.SYSTEM, SYSTEM_PROMPT)]
+
+    print(f"{'turn':>5} {'naive_tokens':>13} {'built_tokens':>13} {'built_msgs':>11}")
+    peak = 0
+    for turn in range(1, args.turns + 1):
+        question = _sentence(rng, 12) + "?"
+        current = _message(Role.USER, HUMAN_PROMPT.format(USER_QUERY=question, CONTEXT_SNIPPETS=_snippets(rng)), question)
+        naive = builder.count_tokens(stored + [current])
+        built = builder.build(stored + [current])
+        built_tokens = builder.count_tokens(built)
+        peak = max(peak, built_tokens)
+        if turn == 1 or turn % args.every == 0:
+            print(f"{turn:>5} {naive:>13} {built_tokens:>13} {len(built):>11}")
+        stored += [current, _message(Role.ASSISTANT, _sentence(rng, 80))]
+
+    print(f"\npeak built prompt: {peak} tokens (budget {args.budget})")
+
+
+if __name__ == "__main__":
+    main()
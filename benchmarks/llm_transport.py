@@ -0,0 +1,140 @@
+"""Stream TTFT with and without hedging against a model with a latency tail.
+
+Serves `benchmarks.fake_upstreams` in-process, where `--slow-fraction` of
+calls wait `--slow-ttft-ms` for their first token instead of `--ttft-ms`
+and `--error-rate` of calls fail with 503. `AsyncOpenAIHelper.astream_response`
+is then driven with `--concurrency` concurrent streams, once per mode:
+
+- plain: pooled transport, retry budget, no hedging
+- hedged: same, plus a second request once a stream passes the recent p95 TTFT
+
+The hedged run starts with `--calibrate` streams so the TTFT window is
+filled before measuring. "sent" counts requests that reached the fake
+model, so the extra load from hedges and retries is visible.
+
+Run from the repo root:
+
+    python -m benchmarks.llm_transport --streams 400 --concurrency 16 --slow-fraction 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import socket
+import time
+from dataclasses import replace
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class CountingApp:
+    """ASGI wrapper counting model requests that reach the fake."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.model_requests = 0
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"] == "/v1/responses":
+            self.model_requests += 1
+        await self.app(scope, receive, send)
+
+
+async def _drive(helper, streams: int, concurrency: int) -> tuple[list[float], int]:
+    from src.sql_models.message import Message
+
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for index in range(streams):
+        queue.put_nowait(index)
+    ttfts: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while not queue.empty():
+            index = queue.get_nowait()
+            messages = [Message(role="user", content=f"question {index}", conversation_id=1)]
+            started = time.perf_counter()
+            first = None
+            try:
+                async for _ in helper.astream_response(messages):
+                    if first is None:
+                        first = time.perf_counter() - started
+            except Exception:
+                errors += 1
+                continue
+            if first is not None:
+                ttfts.append(first)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return ttfts, errors
+
+
+async def _run(args: argparse.Namespace) -> None:
+    import uvicorn
+
+    from benchmarks.fake_upstreams import FakeSettings, build_app
+    from src.helpers.llm_transport import TransportSettings
+    from src.helpers.openai import AsyncOpenAIHelper
+
+    fake = CountingApp(build_app(FakeSettings(
+        ttft_ms=args.ttft_ms,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        slow_fraction=args.slow_fraction,
+        slow_ttft_ms=args.slow_ttft_ms,
+        error_rate=args.error_rate,
+    )))
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(fake, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+
+    print(f"{args.streams} streams x {args.concurrency} concurrent, {args.slow_fraction:.0%} at {args.slow_ttft_ms:.0f} ms TTFT, {args.error_rate:.0%} errors")
+    print(f"{'mode':<8} {'sent':>6} {'errors':>6} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'max_ms':>8}")
+    base = TransportSettings.from_env()
+    for label, settings in (("plain", replace(base, hedge=False)), ("hedged", replace(base, hedge=True))):
+        helper = AsyncOpenAIHelper(settings)
+        if settings.hedge:
+            await _drive(helper, args.calibrate, args.concurrency)
+        sent_before = fake.model_requests
+        ttfts, errors = await _drive(helper, args.streams, args.concurrency)
+        print(
+            f"{label:<8} {fake.model_requests - sent_before:>6} {errors:>6} {_percentile(ttfts, 50) * 1000:>8.0f} "
+            f"{_percentile(ttfts, 95) * 1000:>8.0f} {_percentile(ttfts, 99) * 1000:>8.0f} {max(ttfts) * 1000:>8.0f}"
+        )
+        await helper.client.close()
+
+    server.should_exit = True
+    await serving
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--calibrate", type=int, default=100, help="streams run before the hedged measurement")
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    parser.add_argument("--slow-ttft-ms", type=float, default=3000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    parser.add_argument("--answer-tokens", type=int, default=20)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
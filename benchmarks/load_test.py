@@ -0,0 +1,377 @@
+"""Closed-loop load test of the HTTP and WebSocket endpoints.
+
+Each scenario runs `--concurrency` clients for `--duration` seconds, every
+client sending its next request as soon as the previous one finishes:
+
+- create:   `POST /api/chat/create`, a new conversation every `--turns` requests
+- stream:   `POST /api/chat/stream`, same; TTFT is the first `data:` delta
+- ws:       `/api/chat/ws/0`, one session per `--turns` messages; TTFT is the first text frame
+- login:    `POST /api/auth/login`
+- messages: `GET /api/chat/messages/{id}` over conversations made during setup
+
+and reports throughput, p50/p95/p99 latency and p50/p95 TTFT per level.
+429/503 answers (and WebSocket turns refused with `retry_after`) are
+counted as `rejected`, load shed on purpose; every other failure is an
+error.
+
+Without `--url` the script starts
+`benchmarks.fake_upstreams` and `uvicorn main:app` as subprocesses, with a
+throwaway SQLite database and `BCRYPT_ROUNDS=4`, so nothing leaves the
+machine. Against a deployed instance pass `--url`; the OpenAI and Pinecone
+calls are then whatever that instance is configured with.
+
+Run from the repo root:
+
+    python -m benchmarks.load_test --concurrency 1,8,32 --duration 10
+    python -m benchmarks.load_test --scenarios stream,ws --ttft-ms 400 --tokens-per-second 60 --json out.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+
+PASSWORD = "correct horse battery staple"
+SCENARIOS = ("create", "stream", "ws", "login", "messages")
+QUESTIONS = (
+    "How do I raise my card limit?",
+    "Why was my transfer declined?",
+    "How long does identity verification take?",
+    "Can I dispute a payment I don't recognise?",
+    "How do I reset my password?",
+    "Which documents do you accept for KYC?",
+    "What fees apply to international wires?",
+    "How do I add a new device to my account?",
+)
+
+
+@dataclass
+class Samples:
+    latencies: list[float] = field(default_factory=list)
+    ttfts: list[float] = field(default_factory=list)
+    errors: int = 0
+    # 429/503 answers: load shed by the app rather than failures.
+    rejected: int = 0
+
+    def fail(self, exc: Exception) -> None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+        if status in (429, 503):
+            self.rejected += 1
+        else:
+            self.errors += 1
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+async def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+            await asyncio.sleep(0.1)
+
+
+@contextmanager
+def _spawned(args: argparse.Namespace) -> Iterator[str]:
+    """Start the fake upstreams and the app; yield the app's base URL."""
+    fake_port, app_port = _free_port(), _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            OPENAI_API_KEY="fake",
+            OPENAI_BASE_URL=f"http://127.0.0.1:{fake_port}/v1",
+            PINECONE_API_KEY="fake",
+            PINECONE_HOST=f"http://127.0.0.1:{fake_port}",
+            RETRIEVER_BACKEND="pinecone",
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'load.db')}",
+            BCRYPT_ROUNDS="4",
+        )
+        # Every client signs in as the same user, so lift the per-user bucket
+        # unless the environment sets one; the in-flight limit stays in force.
+        env.setdefault("ADMISSION_USER_RATE", "10000")
+        env.setdefault("ADMISSION_USER_BURST", "10000")
+        fake = subprocess.Popen(
+            [
+                sys.executable, "-m", "benchmarks.fake_upstreams", "--port", str(fake_port),
+                "--ttft-ms", str(args.ttft_ms), "--tokens-per-second", str(args.tokens_per_second),
+                "--answer-tokens", str(args.answer_tokens), "--search-latency-ms", str(args.search_latency_ms),
+            ],
+            env=env,
+        )
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(app_port),
+                "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+            ],
+            env=env,
+        )
+        try:
+            yield f"http://127.0.0.1:{app_port}"
+        finally:
+            for process in (server, fake):
+                process.terminate()
+            for process in (server, fake):
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+
+class LoadDriver:
+    def __init__(self, base_url: str, turns: int) -> None:
+        import httpx
+
+        self.base_url = base_url.rstrip("/")
+        self.ws_url = "ws" + self.base_url[len("http"):]
+        self.turns = max(1, turns)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=120.0, limits=limits)
+        self.email = f"load-{int(time.time() * 1000)}@example.com"
+        self.token = ""
+        self.conversation_ids: list[int] = []
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def setup(self, conversations: int) -> None:
+        await self.client.post("/api/auth/signup", json={"email": self.email, "name": "Load", "password": PASSWORD})
+        login = await self.client.post("/api/auth/login", json={"email": self.email, "password": PASSWORD})
+        login.raise_for_status()
+        self.token = login.json()["data"]["access_token"]
+        for index in range(conversations):
+            created = await self.client.post("/api/chat/create", json={"message": QUESTIONS[index % len(QUESTIONS)]}, headers=self.headers)
+            created.raise_for_status()
+            self.conversation_ids.append(created.json()["data"]["conversation_id"])
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def run(self, scenario: str, concurrency: int, duration: float) -> tuple[Samples, float]:
+        samples = Samples()
+        deadline = time.perf_counter() + duration
+        client_fn = getattr(self, f"_{scenario}_client")
+        started = time.perf_counter()
+        await asyncio.gather(*(client_fn(index, deadline, samples) for index in range(concurrency)))
+        return samples, time.perf_counter() - started
+
+    async def _create_client(self, index: int, deadline: float, samples: Samples) -> None:
+        conversation_id, count = None, 0
+        while time.perf_counter() < deadline:
+            body = {"message": QUESTIONS[count % len(QUESTIONS)], "conversation_id": conversation_id}
+            started = time.perf_counter()
+            try:
+                response = await self.client.post("/api/chat/create", json=body, headers=self.headers)
+                response.raise_for_status()
+                conversation_id = response.json()["data"]["conversation_id"]
+            except Exception as exc:
+                samples.fail(exc)
+                conversation_id = None
+                continue
+            samples.latencies.append(time.perf_counter() - started)
+            count += 1
+            if count % self.turns == 0:
+                conversation_id = None
+
+    async def _stream_client(self, index: int, deadline: float, samples: Samples) -> None:
+        conversation_id, count = None, 0
+        while time.perf_counter() < deadline:
+            body = {"message": QUESTIONS[count % len(QUESTIONS)], "conversation_id": conversation_id}
+            started = time.perf_counter()
+            first, done = None, None
+            try:
+                async with self.client.stream("POST", "/api/chat/stream", json=body, headers=self.headers) as response:
+                    response.raise_for_status()
+                    event = None
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: "):
+                            event = line[len("event: "):]
+                        elif line.startswith("data: "):
+                            if event is None and first is None:
+                                first = time.perf_counter() - started
+                            elif event == "done":
+                                done = json.loads(line[len("data: "):])
+                            elif event == "error":
+                                raise RuntimeError(line)
+                        elif not line:
+                            event = None
+                if done is None:
+                    raise RuntimeError("stream ended without a done event")
+            except Exception as exc:
+                samples.fail(exc)
+                conversation_id = None
+                continue
+            samples.latencies.append(time.perf_counter() - started)
+            if first is not None:
+                samples.ttfts.append(first)
+            conversation_id = done["conversation_id"]
+            count += 1
+            if count % self.turns == 0:
+                conversation_id = None
+
+    async def _ws_client(self, index: int, deadline: float, samples: Samples) -> None:
+        import websockets
+
+        while time.perf_counter() < deadline:
+            try:
+                async with websockets.connect(f"{self.ws_url}/api/chat/ws/0?token={self.token}", max_size=None) as ws:
+                    for turn in range(self.turns):
+                        if time.perf_counter() >= deadline:
+                            break
+                        started = time.perf_counter()
+                        first, rejected = None, False
+                        await ws.send(json.dumps({"message": QUESTIONS[turn % len(QUESTIONS)]}))
+                        while True:
+                            frame = await ws.recv()
+                            if frame.startswith("{"):
+                                event = json.loads(frame)
+                                if event.get("event") in ("done", "guardrails"):
+                                    break
+                                if event.get("event") == "error":
+                                    # Admission control turns a turn away with `retry_after`; the session stays open.
+                                    if "retry_after" not in event:
+                                        raise RuntimeError(frame)
+                                    rejected = True
+                                    break
+                            elif first is None:
+                                first = time.perf_counter() - started
+                        if rejected:
+                            samples.rejected += 1
+                            continue
+                        samples.latencies.append(time.perf_counter() - started)
+                        if first is not None:
+                            samples.ttfts.append(first)
+            except Exception as exc:
+                samples.fail(exc)
+
+    async def _login_client(self, index: int, deadline: float, samples: Samples) -> None:
+        body = {"email": self.email, "password": PASSWORD}
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                (await self.client.post("/api/auth/login", json=body)).raise_for_status()
+            except Exception as exc:
+                samples.fail(exc)
+                continue
+            samples.latencies.append(time.perf_counter() - started)
+
+    async def _messages_client(self, index: int, deadline: float, samples: Samples) -> None:
+        count = index
+        while time.perf_counter() < deadline:
+            conversation_id = self.conversation_ids[count % len(self.conversation_ids)]
+            started = time.perf_counter()
+            try:
+                (await self.client.get(f"/api/chat/messages/{conversation_id}", headers=self.headers)).raise_for_status()
+            except Exception as exc:
+                samples.fail(exc)
+                continue
+            samples.latencies.append(time.perf_counter() - started)
+            count += 1
+
+
+def _row(scenario: str, concurrency: int, samples: Samples, elapsed: float) -> dict[str, object]:
+    def ms(value: float | None) -> float | None:
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(samples.latencies),
+        "errors": samples.errors,
+        "rejected": samples.rejected,
+        "rps": round(len(samples.latencies) / elapsed, 2),
+        "p50_ms": ms(_percentile(samples.latencies, 50)),
+        "p95_ms": ms(_percentile(samples.latencies, 95)),
+        "p99_ms": ms(_percentile(samples.latencies, 99)),
+        "ttft_p50_ms": ms(_percentile(samples.ttfts, 50)),
+        "ttft_p95_ms": ms(_percentile(samples.ttfts, 95)),
+    }
+
+
+def _print_row(row: dict[str, object]) -> None:
+    cells = [f"{row['scenario']:<9}", f"{row['concurrency']:>5}", f"{row['requests']:>7}", f"{row['errors']:>6}", f"{row['rejected']:>8}", f"{row['rps']:>8.1f}"]
+    for key in ("p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms", "ttft_p95_ms"):
+        value = row[key]
+        cells.append(f"{value:>9.1f}" if value is not None else f"{'-':>9}")
+    print(" ".join(cells), flush=True)
+
+
+async def _run(args: argparse.Namespace, base_url: str) -> list[dict[str, object]]:
+    await _wait_ready(f"{base_url}/health")
+    driver = LoadDriver(base_url, args.turns)
+    rows = []
+    try:
+        await driver.setup(args.setup_conversations)
+        print(f"{'scenario':<9} {'conc':>5} {'reqs':>7} {'errors':>6} {'rejected':>8} {'rps':>8} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'ttft_p50':>9} {'ttft_p95':>9}")
+        for scenario in args.scenarios:
+            for concurrency in args.concurrency:
+                samples, elapsed = await driver.run(scenario, concurrency, args.duration)
+                row = _row(scenario, concurrency, samples, elapsed)
+                _print_row(row)
+                rows.append(row)
+    finally:
+        await driver.aclose()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running instance; omit to spawn the app against the fakes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario and level")
+    parser.add_argument("--turns", type=int, default=4, help="messages per conversation before starting a new one")
+    parser.add_argument("--setup-conversations", type=int, default=16, help="conversations read by the messages scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when spawning")
+    parser.add_argument("--ttft-ms", type=float, default=400.0, help="fake model delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--search-latency-ms", type=float, default=40.0)
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+
+    if args.url:
+        rows = asyncio.run(_run(args, args.url))
+    else:
+        with _spawned(args) as base_url:
+            rows = asyncio.run(_run(args, base_url))
+    if args.json_path:
+        with open(args.json_path, "w") as handle:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k != "json_path"}, "results": rows}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Chat latency during a login storm.
+
+Drives the real app in-process (httpx ASGI transport, throwaway SQLite
+database, stubbed model and retriever) and measures `/api/chat/create`
+latency, first alone and then while concurrent clients hammer
+`/api/auth/login`. The storm is repeated with the bcrypt checks run three
+ways:
+
+- inline:  on the event loop, as an async route calling bcrypt directly would
+- threads: in the anyio threadpool, as the old sync auth endpoints did
+- pool:    in the bounded process pool (`PasswordHasher`)
+
+Run from the repo root:
+
+    python -m benchmarks.login_storm --chat-clients 16 --logins 16 --seconds 5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Callable
+
+import anyio
+
+from src.helpers.password import PasswordHasher
+
+PASSWORD = "correct horse battery staple"
+
+
+class InlineHasher(PasswordHasher):
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return fn(*args)
+
+
+class ThreadHasher(PasswordHasher):
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await anyio.to_thread.run_sync(fn, *args)
+
+
+class FakeModel:
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    async def agenerate_response(self, messages, model: str = "gpt-4o") -> str:
+        await asyncio.sleep(self.latency)
+        return "stub answer"
+
+
+class FakeRetriever:
+    index_version = "0"
+
+    async def asearch(self, query_text: str, top_k: int = 10) -> list[dict]:
+        return [{"_id": "doc-1", "_score": 1.0, "fields": {"text": "stub snippet", "category": "faq"}}]
+
+
+def _provide(hasher: PasswordHasher) -> Callable[[], PasswordHasher]:
+    return lambda: hasher
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _chat_loop(client, deadline: float, latencies: list[float]) -> None:
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.post("/api/chat/create", json={"message": "How do I raise my card limit?"})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def _login_loop(client, email: str, deadline: float, counts: dict[str, int]) -> None:
+    while time.perf_counter() < deadline:
+        response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        counts[str(response.status_code)] = counts.get(str(response.status_code), 0) + 1
+        if response.status_code == 503:
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+
+
+async def _phase(client, args: argparse.Namespace, email: str, storm: bool) -> tuple[list[float], dict[str, int]]:
+    deadline = time.perf_counter() + args.seconds
+    latencies: list[float] = []
+    counts: dict[str, int] = {}
+    tasks = [_chat_loop(client, deadline, latencies) for _ in range(args.chat_clients)]
+    if storm:
+        tasks += [_login_loop(client, email, deadline, counts) for _ in range(args.logins)]
+    await asyncio.gather(*tasks)
+    return latencies, counts
+
+
+async def _run(args: argparse.Namespace) -> None:
+    import httpx
+
+    import main
+    from src.helpers.history import get_history_builder
+    from src.helpers.openai import get_async_openai_helper
+    from src.helpers.password import get_password_hasher
+    from src.helpers.pinecone import get_pinecone_helper
+
+    app = main.app
+    app.dependency_overrides[get_async_openai_helper] = lambda: FakeModel(args.model_latency_ms / 1000)
+    app.dependency_overrides[get_pinecone_helper] = lambda: FakeRetriever()
+    get_history_builder()
+
+    hashers: dict[str, PasswordHasher] = {
+        "inline": InlineHasher(rounds=args.rounds),
+        "threads": ThreadHasher(rounds=args.rounds),
+        "pool": PasswordHasher(rounds=args.rounds, max_pending=args.max_pending),
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        app.dependency_overrides[get_password_hasher] = lambda: hashers["pool"]
+        email = "storm@example.com"
+        (await client.post("/api/auth/signup", json={"email": email, "name": "Storm", "password": PASSWORD})).raise_for_status()
+        # Start the pool's worker processes and open DB connections outside the timed phases.
+        await hashers["pool"].ahash(PASSWORD)
+        await _phase(client, argparse.Namespace(**{**vars(args), "seconds": 1.0}), email, storm=False)
+
+        print(f"{'phase':<16} {'chat/s':>7} {'p50_ms':>8} {'p99_ms':>8} {'max_ms':>8}  logins")
+        for label in ("baseline", *hashers):
+            storm = label != "baseline"
+            if storm:
+                app.dependency_overrides[get_password_hasher] = _provide(hashers[label])
+            latencies, counts = await _phase(client, args, email, storm)
+            rate = len(latencies) / args.seconds
+            print(
+                f"{label:<16} {rate:>7.0f} {statistics.median(latencies):>8.1f} {_percentile(latencies, 0.99):>8.1f} "
+                f"{max(latencies):>8.1f}  {counts or '-'}"
+            )
+    hashers["pool"].shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat-clients", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login clients during the storm")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each phase")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--max-pending", type=int, default=None, help="process pool admission limit")
+    parser.add_argument("--model-latency-ms", type=float, default=50.0, help="stubbed model response time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # DATABASE_URL is read at import time, so it must be set before the app is imported.
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        # Chat clients are anonymous and share one IP: lift the admission bucket unless set.
+        os.environ.setdefault("ADMISSION_ANONYMOUS_RATE", "10000")
+        os.environ.setdefault("ADMISSION_ANONYMOUS_BURST", "10000")
+        asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Write amplification and history-read cost: legacy indexes vs. migrated schema.
+
+Builds two throwaway SQLite databases with the same tables. One keeps the
+pre-migration indexes (B-trees over `message.content`, `user_message`,
+`role`, ...). The other is created through `run_migrations`. The benchmark
+inserts identical chat turns into both and then times ordered history reads.
+
+Run from the repo root:
+
+    python -m benchmarks.message_indexes --conversations 200 --turns 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import UTC, datetime
+
+from sqlalchemy import event, text
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from src.constants.prompts import HUMAN_PROMPT
+from src.constants.role import Role
+from src.helpers.migrations import run_migrations
+from src.sql_models.conversation import Conversation
+from src.sql_models.message import Message
+
+LEGACY_INDEXES = [
+    "CREATE INDEX ix_message_conversation_id ON message (conversation_id)",
+    "CREATE INDEX ix_message_role ON message (role)",
+    "CREATE INDEX ix_message_content ON message (content)",
+    "CREATE INDEX ix_message_user_message ON message (user_message)",
+    "CREATE INDEX ix_conversation_user_id ON conversation (user_id)",
+    'CREATE INDEX ix_user_password ON "user" (password)',
+]
+
+
+def _engine(path: str):
+    # fsync per commit would dominate the timings and hide index maintenance cost.
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", lambda dbapi_conn, _: dbapi_conn.execute("PRAGMA synchronous=OFF"))
+    return engine
+
+
+def _legacy_engine(path: str):
+    engine = _engine(path)
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_message_conversation_id_id"))
+        conn.execute(text("DROP INDEX ix_conversation_user_id_is_deleted_created_at"))
+        for statement in LEGACY_INDEXES:
+            conn.execute(text(statement))
+    return engine
+
+
+def _migrated_engine(path: str):
+    engine = _engine(path)
+    run_migrations(engine)
+    return engine
+
+
+def _turns(conversations: int, turns: int, seed: int = 3):
+    rng = random.Random(seed)
+    words = "account card transfer limit fee verification identity wire payment refund dispute".split()
+    for conversation in range(conversations):
+        for _ in range(turns):
+            question = " ".join(rng.choice(words) for _ in range(12))
+            context = "".join(f"Source: doc-{rng.randint(1, 999)}\nText: {' '.join(rng.choice(words) for _ in range(60))}\n\n" for _ in range(10))
+            answer = " ".join(rng.choice(words) for _ in range(80))
+            yield conversation, question, HUMAN_PROMPT.format(USER_QUERY=question, CONTEXT_SNIPPETS=context), answer
+
+
+def _insert(engine, conversations: int, turns: int) -> tuple[float, list[int]]:
+    ids: dict[int, int] = {}
+    started = time.perf_counter()
+    for index, question, prompt, answer in _turns(conversations, turns):
+        with Session(engine) as session:
+            if index not in ids:
+                conversation = Conversation(user_id=index % 50, created_at=datetime.now(UTC))
+                session.add(conversation)
+                session.flush()
+                ids[index] = conversation.id
+            now = datetime.now(UTC)
+            session.add_all([
+                Message(conversation_id=ids[index], role=Role.USER, content=prompt, user_message=question, created_at=now),
+                Message(conversation_id=ids[index], role=Role.ASSISTANT, content=answer, user_message=None, created_at=now),
+            ])
+            session.commit()
+    return time.perf_counter() - started, list(ids.values())
+
+
+def _read(engine, conversation_ids: list[int], reads: int) -> float:
+    rng = random.Random(5)
+    started = time.perf_counter()
+    with Session(engine) as session:
+        for _ in range(reads):
+            conversation_id = rng.choice(conversation_ids)
+            list(session.exec(select(Message).where(Message.conversation_id == conversation_id).order_by(Message.id)))
+    return time.perf_counter() - started
+
+
+def _plan(engine) -> str:
+    with engine.connect() as conn:
+        rows = conn.execute(text("EXPLAIN QUERY PLAN SELECT * FROM message WHERE conversation_id = 1 ORDER BY id")).all()
+    return "; ".join(row[-1] for row in rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'schema':<10} {'insert_s':>9} {'turns/s':>9} {'db_MB':>8} {'reads/s':>9}  plan")
+        for label, factory in (("legacy", _legacy_engine), ("migrated", _migrated_engine)):
+            path = os.path.join(tmp, f"{label}.db")
+            engine = factory(path)
+            insert_s, ids = _insert(engine, args.conversations, args.turns)
+            read_s = _read(engine, ids, args.reads)
+            size_mb = os.path.getsize(path) / 1e6
+            total_turns = args.conversations * args.turns
+            print(f"{label:<10} {insert_s:>9.2f} {total_turns / insert_s:>9.0f} {size_mb:>8.1f} {args.reads / read_s:>9.0f}  {_plan(engine)}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
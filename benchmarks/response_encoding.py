@@ -0,0 +1,96 @@
+"""Response encoding cost: jsonable_encoder + JSONResponse vs. api_response.
+
+Encodes the payloads the chat routes return for long histories: the
+`filter_messages` list of a 1k-message conversation, and a page of ORM
+`Conversation` rows, both as models and as the dicts `/chat/conversations`
+builds. Both paths must produce the same JSON document, datetimes included.
+
+Run from the repo root:
+
+    python -m benchmarks.response_encoding --messages 1000 --repeat 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from datetime import UTC, datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.constants.role import Role
+from src.helpers.filter_message import filter_messages
+from src.helpers.response import api_response
+from src.sql_models.conversation import Conversation
+from src.sql_models.message import Message
+
+WORDS = (
+    "account card transfer limit fee verification identity wire payment refund "
+    "dispute security password device login statement region compliance kyc"
+).split()
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def _legacy_response(data: object, status_code: int = 200) -> JSONResponse:
+    return JSONResponse(content={"data": jsonable_encoder(data), "status_code": status_code}, status_code=status_code)
+
+
+def _time(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def _parse(body: bytes) -> object:
+    # Only whitespace may differ between the two encoders.
+    return json.loads(body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    history: list[Message] = [Message(conversation_id=1, role=Role.SYSTEM, content=_sentence(rng, 300), user_message=None)]
+    for _ in range(args.messages // 2):
+        question = _sentence(rng, 14) + "?"
+        history.append(Message(conversation_id=1, role=Role.USER, content=_sentence(rng, 700), user_message=question))
+        history.append(Message(conversation_id=1, role=Role.ASSISTANT, content=_sentence(rng, 90), user_message=None))
+    now = datetime.now(UTC)
+    conversations = [
+        Conversation(id=i, user_id=1, short_name=_sentence(rng, 4), created_at=now - timedelta(minutes=i))
+        for i in range(args.conversations)
+    ]
+
+    payloads = {
+        f"history ({args.messages} messages)": lambda: {"messages": filter_messages(history), "conversation_id": 1},
+        f"conversations ({args.conversations} ORM rows)": lambda: {"conversations": conversations},
+        f"conversations ({args.conversations} dicts)": lambda: {
+            "conversations": [
+                {"id": c.id, "short_name": c.short_name, "created_at": c.created_at, "last_message": {"role": "user", "content": c.short_name, "created_at": c.created_at}}
+                for c in conversations
+            ]
+        },
+    }
+    print(f"{'payload':<32} {'bytes':>9} {'legacy_ms':>10} {'api_response_ms':>16} {'speedup':>8}")
+    for name, build in payloads.items():
+        data = build()
+        legacy = _legacy_response(data).body
+        fast = api_response(data).body
+        assert _parse(legacy) == _parse(fast), f"{name}: encodings differ"
+        legacy_ms = _time(lambda: _legacy_response(build()), args.repeat)
+        fast_ms = _time(lambda: api_response(build()), args.repeat)
+        print(f"{name:<32} {len(fast):>9} {legacy_ms:>10.2f} {fast_ms:>16.2f} {legacy_ms / fast_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Worker cold start: import cost of `main` and time to the first 200 on `/health`.
+
+Each run starts a fresh interpreter, so nothing is shared between runs:
+
+- `python -X importtime -c "import main"` gives the cumulative import
+  time of `main` and the slowest modules under it.
+- `uvicorn main:app` on a free port is polled until `/health` answers 200.
+  The clock starts at process launch. Pass `--warmup` to include
+  `WARMUP_ON_STARTUP`.
+
+Medians are printed. With `--json`, results are also written to a file,
+and `--max-import-ms` / `--max-ready-ms` exit non-zero when a budget is
+exceeded (CI uses both).
+
+Run from the repo root:
+
+    python -m benchmarks.startup --runs 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile(env: dict[str, str]) -> tuple[float, list[tuple[str, float]]]:
+    """Cumulative ms to import `main`, and the slowest top-level imports beneath it."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0.0
+    children: list[tuple[str, float]] = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match is None:
+            continue
+        cumulative_ms = int(match.group(2)) / 1000
+        depth = len(match.group(3)) // 2
+        if match.group(4) == "main" and depth == 0:
+            total = cumulative_ms
+        elif depth == 1:
+            children.append((match.group(4), cumulative_ms))
+    return total, sorted(children, key=lambda item: item[1], reverse=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_ready(env: dict[str, str], timeout: float) -> float:
+    """Milliseconds from launching uvicorn to the first 200 from `/health`."""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise TimeoutError(f"/health not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    parser.add_argument("--warmup", action="store_true", help="set WARMUP_ON_STARTUP=1 for the server runs")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time exceeds this")
+    parser.add_argument("--max-ready-ms", type=float, help="fail if the median time to first 200 exceeds this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'startup.db')}"}
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        if args.warmup:
+            env["WARMUP_ON_STARTUP"] = "1"
+        # Prime the bytecode cache so every measured run sees the same state.
+        import_profile(env)
+
+        imports = [import_profile(env) for _ in range(args.runs)]
+        ready = [time_to_ready(env, args.timeout) for _ in range(args.runs)]
+
+    import_ms = statistics.median(total for total, _ in imports)
+    ready_ms = statistics.median(ready)
+    slowest = imports[-1][1][: args.top]
+    print(f"import main      median {import_ms:8.1f} ms  (runs: {', '.join(f'{total:.0f}' for total, _ in imports)})")
+    print(f"first 200 /health median {ready_ms:7.1f} ms  (runs: {', '.join(f'{value:.0f}' for value in ready)})")
+    print("slowest imports under main:")
+    for name, cumulative_ms in slowest:
+        print(f"  {cumulative_ms:8.1f} ms  {name}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump(
+                {"import_ms": import_ms, "ready_ms": ready_ms, "warmup": args.warmup, "slowest_imports": dict(slowest)},
+                handle,
+                indent=2,
+            )
+    failures = []
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import time {import_ms:.0f} ms > budget {args.max_import_ms:.0f} ms")
+    if args.max_ready_ms is not None and ready_ms > args.max_ready_ms:
+        failures.append(f"time to first 200 {ready_ms:.0f} ms > budget {args.max_ready_ms:.0f} ms")
+    if failures:
+        sys.exit("startup budget exceeded: " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Frames per second and CPU per stream for many concurrent SSE streams.
+
+Runs `--streams` concurrent fake model streams in one event loop. Each
+emits `--tokens` deltas of about 4 characters at `--rate` deltas per
+second, with the jitter of a real token stream. Every stream is written
+the way uvicorn's h11 protocol writes it: each ASGI body message becomes
+an HTTP chunk and one `transport.write` on a real socket. A reader task
+per stream drains the other end in 64 KiB reads, and its CPU is counted
+too.
+
+Two pipelines are compared:
+
+- `per-delta`: the old generator. One `json.dumps({...})` str frame per
+  delta, and the answer accumulated with `buffer += delta`.
+- `coalesced`: `DeltaCoalescer` (`--flush-ms`, `--flush-bytes`),
+  `sse_delta_frame` bytes frames and a list accumulator.
+
+A self-check runs first. The coalesced output must concatenate to the
+input, and no chunk may be flushed much later than `--flush-ms` after its
+oldest delta arrived.
+
+Run from the repo root:
+
+    python -m benchmarks.stream_coalescing --streams 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import time
+from typing import AsyncIterator
+
+import h11
+
+from src.helpers.streaming import DeltaCoalescer, sse_delta_frame
+
+# Event-loop wake-up jitter allowed on top of max_delay in the self-check.
+SCHEDULING_SLACK = 0.05
+WORDS = "your card limit can be raised from the app once identity verification is complete".split()
+
+
+def _deltas(rng: random.Random, count: int) -> list[str]:
+    text = " ".join(rng.choice(WORDS) for _ in range(count))
+    return [text[i:i + 4] for i in range(0, 4 * count, 4)]
+
+
+async def _model(deltas: list[str], rate: float, rng: random.Random) -> AsyncIterator[str]:
+    for delta in deltas:
+        await asyncio.sleep(rng.expovariate(rate))
+        yield delta
+
+
+_REQUEST = b"POST /api/chat/stream HTTP/1.1\r\nHost: bench\r\nContent-Length: 0\r\n\r\n"
+
+
+class _Connection:
+    """One SSE response on a socket pair, written like `uvicorn.protocols.http.h11_impl`."""
+
+    async def open(self) -> None:
+        server_sock, client_sock = socket.socketpair()
+        _, self.writer = await asyncio.open_connection(sock=server_sock)
+        self.reader, self._client = await asyncio.open_connection(sock=client_sock)
+        self.conn = h11.Connection(h11.SERVER)
+        self.conn.receive_data(_REQUEST)
+        while self.conn.next_event() is not h11.NEED_DATA:
+            pass
+        headers = [(b"content-type", b"text/event-stream"), (b"transfer-encoding", b"chunked")]
+        self.writer.write(self.conn.send(h11.Response(status_code=200, headers=headers)))
+        self.drained = asyncio.ensure_future(self._drain())
+
+    async def _drain(self) -> None:
+        while await self.reader.read(65536):
+            pass
+
+    async def send(self, message: dict) -> None:
+        self.writer.write(self.conn.send(h11.Data(data=message["body"])))
+        await self.writer.drain()
+        if not message["more_body"]:
+            self.writer.write(self.conn.send(h11.EndOfMessage()))
+            self.writer.close()
+            await self.drained
+            self._client.close()
+
+
+async def per_delta(
+    deltas: list[str], rate: float, rng: random.Random, coalescer: DeltaCoalescer, connection: _Connection
+) -> tuple[int, str]:
+    frames = 0
+    buffer = ""
+    async for delta in _model(deltas, rate, rng):
+        buffer += delta
+        frame = f"data: {json.dumps({'delta': delta})}\n\n"
+        await connection.send({"type": "http.response.body", "body": frame.encode("utf-8"), "more_body": True})
+        frames += 1
+    await connection.send({"type": "http.response.body", "body": b"", "more_body": False})
+    return frames, buffer
+
+
+async def coalesced(
+    deltas: list[str], rate: float, rng: random.Random, coalescer: DeltaCoalescer, connection: _Connection
+) -> tuple[int, str]:
+    frames = 0
+    parts: list[str] = []
+    async for chunk in coalescer.coalesce(_model(deltas, rate, rng)):
+        parts.append(chunk)
+        await connection.send({"type": "http.response.body", "body": sse_delta_frame(chunk), "more_body": True})
+        frames += 1
+    await connection.send({"type": "http.response.body", "body": b"", "more_body": False})
+    return frames, "".join(parts)
+
+
+PIPELINES = {"per-delta": per_delta, "coalesced": coalesced}
+
+
+async def self_check(coalescer: DeltaCoalescer) -> int:
+    loop = asyncio.get_running_loop()
+    checked = 0
+    for seed in range(20):
+        rng = random.Random(seed)
+        deltas = _deltas(rng, 60)
+        arrivals: list[float] = []
+
+        async def source() -> AsyncIterator[str]:
+            async for delta in _model(deltas, rng.choice([50.0, 200.0, 2000.0]), rng):
+                arrivals.append(loop.time())
+                yield delta
+
+        chunks: list[str] = []
+        flushed = 0
+        async for chunk in coalescer.coalesce(source()):
+            # The oldest delta in the chunk must not wait much longer than max_delay.
+            waited = loop.time() - arrivals[flushed]
+            assert waited <= coalescer.max_delay + SCHEDULING_SLACK, (seed, waited)
+            chunks.append(chunk)
+            flushed += len(chunk) // 4
+        assert "".join(chunks) == "".join(deltas), seed
+        checked += 1
+    return checked
+
+
+async def run(pipeline: str, streams: int, tokens: int, rate: float, coalescer: DeltaCoalescer) -> dict[str, float]:
+    jobs = []
+    for index in range(streams):
+        rng = random.Random(index)
+        deltas = _deltas(rng, tokens)
+        connection = _Connection()
+        await connection.open()
+        jobs.append((deltas, PIPELINES[pipeline](deltas, rate, rng, coalescer, connection)))
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    results = await asyncio.gather(*(job for _, job in jobs))
+    cpu, wall = time.process_time() - cpu_started, time.perf_counter() - wall_started
+    for (deltas, _), (_, text) in zip(jobs, results):
+        assert text == "".join(deltas)
+    frames = sum(count for count, _ in results)
+    return {
+        "frames": frames,
+        "frames_per_sec": frames / wall,
+        "wall_s": wall,
+        "cpu_ms_per_stream": cpu * 1000 / streams,
+        "cpu_util": cpu / wall,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=500)
+    parser.add_argument("--tokens", type=int, default=300, help="deltas per stream")
+    parser.add_argument("--rate", type=float, default=100.0, help="deltas per second per stream")
+    parser.add_argument("--flush-ms", type=float, default=30.0)
+    parser.add_argument("--flush-bytes", type=int, default=1024)
+    args = parser.parse_args()
+
+    coalescer = DeltaCoalescer(max_delay_ms=args.flush_ms, max_bytes=args.flush_bytes)
+    print(f"self-check: {asyncio.run(self_check(coalescer))} streams reassemble exactly and flush on time")
+    print(f"{args.streams} streams x {args.tokens} deltas at {args.rate:.0f}/s, flush {args.flush_ms:.0f} ms / {args.flush_bytes} B")
+    for pipeline in PIPELINES:
+        result = asyncio.run(run(pipeline, args.streams, args.tokens, args.rate, coalescer))
+        print(
+            f"{pipeline:>10}: {result['frames']:7d} frames  {result['frames_per_sec']:8.0f} frames/s  "
+            f"wall {result['wall_s']:5.2f} s  CPU {result['cpu_ms_per_stream']:6.2f} ms/stream  "
+            f"loop busy {result['cpu_util']:.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
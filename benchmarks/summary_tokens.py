@@ -0,0 +1,83 @@
+"""Prompt tokens per summarize call: full-history rebuild vs. rolling summary.
+
+Simulates a conversation that is summarized every few turns and reports
+the tokens each strategy sends to the model. The model is a stub that
+returns a fixed-size summary, so only prompt size is measured.
+
+Run from the repo root:
+
+    python -m benchmarks.summary_tokens --turns 400 --every 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+from datetime import UTC, datetime
+
+from src.constants.prompts import SUMMARY_PROMPT
+from src.constants.role import Role
+from src.helpers.history import get_token_counter
+from src.helpers.summary import ConversationSummarizer, format_message
+from src.sql_models.message import Message
+
+WORDS = (
+    "account card transfer limit fee verification identity wire payment refund "
+    "dispute security password device login statement region compliance kyc"
+).split()
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+class _StubModel:
+    def __init__(self, counter) -> None:
+        self.counter = counter
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    async def agenerate_response(self, messages: list[Message], model: str = "gpt-4o") -> str:
+        self.calls += 1
+        self.prompt_tokens += sum(self.counter(message.content) for message in messages)
+        return _sentence(random.Random(self.calls), 120)
+
+
+async def _run(args: argparse.Namespace) -> None:
+    rng = random.Random(7)
+    counter = get_token_counter()
+    summarizer = ConversationSummarizer(chunk_tokens=args.chunk_tokens, counter=counter)
+    model = _StubModel(counter)
+
+    history: list[Message] = []
+    summary: str | None = None
+    covered = 0
+    naive_total = 0
+    print(f"{'turn':>5} {'naive_tokens':>13} {'rolling_tokens':>15} {'rolling_calls':>14}")
+    for turn in range(1, args.turns + 1):
+        question = _sentence(rng, 14) + "?"
+        history.append(Message(conversation_id=1, role=Role.USER, content="", user_message=question, created_at=datetime.now(UTC)))
+        history.append(Message(conversation_id=1, role=Role.ASSISTANT, content=_sentence(rng, 90), created_at=datetime.now(UTC)))
+        if turn % args.every:
+            continue
+
+        naive = counter(SUMMARY_PROMPT.format(CONTEXT="\n\n".join(format_message(message) for message in history)))
+        naive_total += naive
+        calls_before, tokens_before = model.calls, model.prompt_tokens
+        summary = await summarizer.asummarize(summary, history[covered:], model)
+        covered = len(history)
+        print(f"{turn:>5} {naive:>13} {model.prompt_tokens - tokens_before:>15} {model.calls - calls_before:>14}")
+
+    print(f"\ntotal prompt tokens: naive {naive_total}, rolling {model.prompt_tokens} ({model.calls} calls)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--every", type=int, default=10, help="summarize every N turns")
+    parser.add_argument("--chunk-tokens", type=int, default=6000)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
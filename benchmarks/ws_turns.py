@@ -0,0 +1,155 @@
+"""Per-turn latency of WebSocket chat: a new socket per turn vs one session.
+
+Serves the real app with uvicorn on a local port (throwaway SQLite
+database, stubbed model and retriever) and drives it with a `websockets`
+client that signs in with a JWT. Each client sends `--turns` messages to
+its own conversation in one of two ways:
+
+- reconnect: open a socket, authenticate, send one message, wait for
+  `done`, close. This is how the endpoint was used when it served a single
+  turn.
+- session:   one socket for every turn.
+
+Turn time runs from sending the message (or opening the socket) to
+receiving `done`.
+
+Run from the repo root:
+
+    python -m benchmarks.ws_turns --clients 8 --turns 30
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import tempfile
+import time
+
+PASSWORD = "correct horse battery staple"
+
+
+class FakeModel:
+    async def agenerate_response(self, messages, model: str = "gpt-4o") -> str:
+        return "stub answer"
+
+    async def astream_response(self, messages, model: str = "gpt-4o"):
+        for word in "you can raise the limit from the app settings".split():
+            await asyncio.sleep(0)
+            yield word + " "
+
+
+class FakeRetriever:
+    index_version = "0"
+
+    async def asearch(self, query_text: str, top_k: int = 10) -> list[dict]:
+        return [{"_id": "doc-1", "_score": 1.0, "fields": {"text": "stub snippet", "category": "faq"}}]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _until_done(ws) -> dict:
+    while True:
+        frame = await ws.recv()
+        if frame.startswith("{"):
+            event = json.loads(frame)
+            if event.get("event") == "done":
+                return event
+            if event.get("event") == "error":
+                raise RuntimeError(event["message"])
+
+
+async def _reconnect_client(url: str, token: str, conversation_id: int, turns: int, samples: list[float]) -> None:
+    import websockets
+
+    for turn in range(turns):
+        started = time.perf_counter()
+        async with websockets.connect(f"{url}/api/chat/ws/{conversation_id}?token={token}") as ws:
+            await ws.send(json.dumps({"message": f"question {turn}"}))
+            await _until_done(ws)
+        samples.append((time.perf_counter() - started) * 1000)
+
+
+async def _session_client(url: str, token: str, conversation_id: int, turns: int, samples: list[float]) -> None:
+    import websockets
+
+    async with websockets.connect(f"{url}/api/chat/ws/{conversation_id}?token={token}") as ws:
+        for turn in range(turns):
+            started = time.perf_counter()
+            await ws.send(json.dumps({"message": f"question {turn}"}))
+            await _until_done(ws)
+            samples.append((time.perf_counter() - started) * 1000)
+
+
+async def _run(args: argparse.Namespace) -> None:
+    import httpx
+    import uvicorn
+
+    import main
+    from src.helpers.openai import get_async_openai_helper
+    from src.helpers.pinecone import get_pinecone_helper
+
+    app = main.app
+    app.dependency_overrides[get_async_openai_helper] = lambda: FakeModel()
+    app.dependency_overrides[get_pinecone_helper] = lambda: FakeRetriever()
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws="websockets"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    base = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient(base_url=base) as client:
+        email = "ws@example.com"
+        await client.post("/api/auth/signup", json={"email": email, "name": "Bench", "password": PASSWORD})
+        login = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        token = login.json()["data"]["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        conversation_ids = []
+        for _ in range(2 * args.clients):
+            created = await client.post("/api/chat/create", json={"message": "hello"}, headers=headers)
+            conversation_ids.append(created.json()["data"]["conversation_id"])
+
+    url = f"ws://127.0.0.1:{port}"
+    print(f"{args.clients} clients x {args.turns} turns")
+    print(f"{'mode':<10} {'turns/s':>8} {'p50_ms':>8} {'p99_ms':>8}")
+    for index, (label, client_fn) in enumerate((("reconnect", _reconnect_client), ("session", _session_client))):
+        samples: list[float] = []
+        ids = conversation_ids[index * args.clients:(index + 1) * args.clients]
+        started = time.perf_counter()
+        await asyncio.gather(*(client_fn(url, token, cid, args.turns, samples) for cid in ids))
+        elapsed = time.perf_counter() - started
+        ordered = sorted(samples)
+        print(
+            f"{label:<10} {len(samples) / elapsed:>8.0f} {statistics.median(samples):>8.2f} "
+            f"{ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]:>8.2f}"
+        )
+
+    server.should_exit = True
+    await serving
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=30, help="messages per client")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # DATABASE_URL is read at import time, so it must be set before the app is imported.
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.setdefault("BCRYPT_ROUNDS", "4")
+        # Every client is the same user: lift the per-user admission bucket unless set.
+        os.environ.setdefault("ADMISSION_USER_RATE", "10000")
+        os.environ.setdefault("ADMISSION_USER_BURST", "10000")
+        asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""Gunicorn settings picked up automatically from the working directory.
+
+With PROMETHEUS_MULTIPROC_DIR set, each worker writes its metrics to files
+in that directory; a worker that exits must have its live gauges removed
+or `/metrics` would keep counting its in-flight streams and connections.
+
+The worker count is exported as WEB_CONCURRENCY so per-worker pools (the
+bcrypt pool in src/helpers/password.py) split the cores between workers.
+"""
+import os
+
+
+def on_starting(server):
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,16 +1,32 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
 import dotenv
 from src.routers.chat import router as chat_router
 from src.routers.auth import router as auth_router
+from src.helpers.admission import get_admission_controller
+from src.helpers.answer_cache import get_answer_cache
+from src.helpers.database import get_pool_stats
+from src.helpers.metrics import render_metrics
+from src.helpers.pinecone import get_pinecone_helper
+from src.helpers.password import get_password_hasher
+from src.helpers.warmup import warm_up, warmup_enabled
 from src.helpers.response import api_response
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if warmup_enabled():
+        await warm_up()
+    yield
+    get_password_hasher().shutdown()
+
 app = FastAPI(
     title="Eloquent AI Agent",
     description="A Chat application for Eloquent AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 dotenv.load_dotenv()
@@ -28,7 +44,11 @@ app.include_router(auth_router, prefix="/api")
 
 @app.exception_handler(StarletteHTTPException)
 def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    return api_response({"message": exc.detail}, exc.status_code)
+    response = api_response({"message": exc.detail}, exc.status_code)
+    if exc.headers:
+        # Keeps `Retry-After` on 429/503 and `WWW-Authenticate` on 401.
+        response.headers.update(exc.headers)
+    return response
 
 @app.exception_handler(RequestValidationError)
 def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -42,9 +62,31 @@ def unhandled_exception_handler(request: Request, exc: Exception):
 def health_check():
     return api_response({"status": "healthy"})
 
+@app.get("/health/db")
+def db_pool_health():
+    return api_response({"pools": get_pool_stats()})
+
+@app.get("/health/cache")
+def cache_health():
+    # Only report the retriever once a request has built it; constructing it here could fail on missing keys.
+    retrieval = get_pinecone_helper().cache_stats() if get_pinecone_helper.cache_info().currsize else None
+    return api_response({"answers": get_answer_cache().stats(), "retrieval": retrieval})
+
+@app.get("/health/admission")
+def admission_health():
+    return api_response(get_admission_controller().stats())
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition, aggregated across workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/")
 def root():
     return api_response({"message": "Hello World"})
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -56,4 +56,13 @@ SUMMARY_PROMPT = (
     "Summarize the conversation below succinctly (<= 120 words). "
     "Include key points and any next steps. If there is no context, reply 'No conversation to summarize.'\n\n"
     "Conversation:\n{CONTEXT}"
-)
\ No newline at end of file
+)
+SUMMARY_UPDATE_PROMPT = (
+    "Below is a summary of a conversation so far, followed by the messages exchanged since. "
+    "Rewrite the summary so it also covers the new messages, succinctly (<= 120 words). "
+    "Include key points and any next steps.\n\n"
+    "Summary so far:\n{SUMMARY}\n\n"
+    "New messages:\n{CONTEXT}"
+)
+
+EMPTY_SUMMARY = "No conversation to summarize."
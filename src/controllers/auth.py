@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from datetime import UTC, datetime
 
 import bcrypt
@@ -7,18 +8,33 @@ from sqlmodel import select
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from src.helpers.database import get_db_session
+from src.helpers.cache import TTLCache
+from src.helpers.database import get_async_db_session, get_db_session
+from src.models.auth import CurrentUser
 from src.sql_models.user import User
 from src.helpers.jwt import create_access_token, decode_token
+from src.helpers.password import get_password_hasher
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
+# Authenticated principals by user id, so the auth check on each request is a memory lookup.
+_principal_cache: TTLCache[CurrentUser] = TTLCache(
+    max_entries=int(os.getenv("AUTH_USER_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60")),
+)
+
+def _to_principal(user: User) -> CurrentUser:
+    return CurrentUser(id=user.id, email=user.email, name=user.name, created_at=user.created_at)
+
+def invalidate_user_principal(user_id: int) -> None:
+    _principal_cache.pop(user_id)
+
 def add_user(email: str, name: str, password: str) -> User:
     with get_db_session() as session:
         user = User(
             email=email,
             name=name,
-            password=bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8"),
+            password=bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=get_password_hasher().rounds)).decode("utf-8"),
             created_at=datetime.now(UTC),
         )
         session.add(user)
@@ -33,6 +49,7 @@ def delete_user(user_id: int) -> bool:
             return False
         session.delete(user)
         session.commit()
+        invalidate_user_principal(user_id)
         return True
 
 def get_user_by_id(user_id: int | None) -> User | None:
@@ -47,10 +64,73 @@ def get_user_by_email(email: str | None) -> User | None:
     with get_db_session() as session:
         return session.exec(select(User).where(User.email == email)).first()
 
+async def aadd_user(email: str, name: str, password_hash: str) -> User:
+    """Insert a user whose password was already hashed (see `PasswordHasher.ahash`)"""
+    async with get_async_db_session() as session:
+        user = User(email=email, name=name, password=password_hash, created_at=datetime.now(UTC))
+        session.add(user)
+        await session.commit()
+        return user
+
+async def aupdate_user_password(user_id: int, password_hash: str) -> None:
+    async with get_async_db_session() as session:
+        user = await session.get(User, user_id)
+        if user is None:
+            return
+        user.password = password_hash
+        session.add(user)
+        await session.commit()
+
+async def adelete_user(user_id: int) -> bool:
+    async with get_async_db_session() as session:
+        user = await session.get(User, user_id)
+        if user is None:
+            return False
+        await session.delete(user)
+        await session.commit()
+        invalidate_user_principal(user_id)
+        return True
+
+async def aget_user_by_id(user_id: int | None) -> User | None:
+    if user_id is None:
+        return None
+    async with get_async_db_session() as session:
+        return await session.get(User, user_id)
+
+async def aget_user_by_email(email: str | None) -> User | None:
+    if email is None:
+        return None
+    async with get_async_db_session() as session:
+        return (await session.exec(select(User).where(User.email == email))).first()
+
+def get_user_principal(user_id: int | None) -> CurrentUser | None:
+    if user_id is None:
+        return None
+    principal = _principal_cache.get(user_id)
+    if principal is None:
+        user = get_user_by_id(user_id)
+        if user is None:
+            return None
+        principal = _to_principal(user)
+        _principal_cache.set(user_id, principal)
+    return principal
+
+async def aget_user_principal(user_id: int | None) -> CurrentUser | None:
+    if user_id is None:
+        return None
+    principal = _principal_cache.get(user_id)
+    if principal is None:
+        user = await aget_user_by_id(user_id)
+        if user is None:
+            return None
+        principal = _to_principal(user)
+        _principal_cache.set(user_id, principal)
+    return principal
+
 def create_user_token(user: User) -> str:
     return create_access_token({"user_id": str(user.id), "email": user.email})
 
-def get_current_user(credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)) -> User:
+def get_current_user(credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)) -> CurrentUser:
     """Get the current user from the token, if the token is not provided, raise an error"""
     if credentials is None or not credentials.scheme.lower() == "bearer":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
@@ -60,12 +140,12 @@ def get_current_user(credentials: HTTPAuthorizationCredentials | None = Depends(
     user_id_str = payload.get("user_id")
     if not user_id_str:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-    user = get_user_by_id(int(user_id_str))
+    user = get_user_principal(int(user_id_str))
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
 
-def get_current_user_optional(credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)) -> User | None:
+def get_current_user_optional(credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)) -> CurrentUser | None:
     """Get the current user from the token, if the token is not provided, return None"""
     if credentials is None or not credentials.scheme or credentials.credentials is None:
         return None
@@ -75,7 +155,37 @@ def get_current_user_optional(credentials: HTTPAuthorizationCredentials | None =
     user_id_str = payload.get("user_id")
     if not user_id_str:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-    user = get_user_by_id(int(user_id_str))
+    user = get_user_principal(int(user_id_str))
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    return user
+
+async def aget_current_user(credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)) -> CurrentUser:
+    """Async variant of `get_current_user` that loads the user without a worker thread"""
+    if credentials is None or not credentials.scheme.lower() == "bearer":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    payload = decode_token(credentials.credentials)
+    if payload is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    user_id_str = payload.get("user_id")
+    if not user_id_str:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
+    user = await aget_user_principal(int(user_id_str))
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    return user
+
+async def aget_current_user_optional(credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)) -> CurrentUser | None:
+    """Async variant of `get_current_user_optional` that loads the user without a worker thread"""
+    if credentials is None or not credentials.scheme or credentials.credentials is None:
+        return None
+    payload = decode_token(credentials.credentials)
+    if payload is None:
+        return None
+    user_id_str = payload.get("user_id")
+    if not user_id_str:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
+    user = await aget_user_principal(int(user_id_str))
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
@@ -1,10 +1,99 @@
 from __future__ import annotations
 from datetime import datetime, UTC
+from typing import Any
+
+from sqlalchemy import and_, case, func, or_, update
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.constants.role import Role
+from src.helpers.database import get_async_db_session
 
 from src.sql_models.conversation import Conversation
 from src.sql_models.message import Message
 
+# Characters of the last message shown under each conversation in the sidebar.
+PREVIEW_CHARS = 120
+
+def _messages_query(
+    conversation_id: int,
+    limit: int | None,
+    before: int | None,
+    after: int | None,
+    include_system: bool,
+    columns: tuple = (Message,),
+):
+    """History in id order, or one keyset page of it when `limit` is set.
+
+    Without `after` a page holds the newest `limit` messages before the
+    `before` cursor, so it is read newest first; callers flip it back.
+    """
+    query = select(*columns).where(Message.conversation_id == conversation_id)
+    if not include_system:
+        query = query.where(Message.role != Role.SYSTEM)
+    if before is not None:
+        query = query.where(Message.id < before)
+    if after is not None:
+        query = query.where(Message.id > after)
+    if limit is None:
+        return query.order_by(Message.id)
+    if after is None:
+        return query.order_by(Message.id.desc()).limit(limit)
+    return query.order_by(Message.id).limit(limit)
+
+# What the chat UI shows per message, as (id, role, text, reply). USER and
+# GUARDRAILS rows show the user's own words from `user_message`, so the
+# prompt-sized `content` of USER rows is never read; a GUARDRAILS row also
+# carries the refusal it was answered with.
+_DISPLAY_COLUMNS = (
+    Message.id,
+    Message.role,
+    case((Message.role.in_((Role.USER, Role.GUARDRAILS)), Message.user_message), else_=Message.content).label("text"),
+    case((Message.role == Role.GUARDRAILS, Message.content), else_=None).label("reply"),
+)
+
+def _conversations_query(user_id: int, is_deleted: bool, limit: int | None, before: int | None, after: int | None):
+    """A user's conversations newest first, or one keyset page on (created_at, id).
+
+    Cursors are conversation ids; their `created_at` is resolved in a
+    subquery. With `after` the page is read oldest first and flipped back.
+    """
+    query = select(Conversation).where(Conversation.user_id == user_id, Conversation.is_deleted == is_deleted)
+    if before is not None:
+        created_at = select(Conversation.created_at).where(Conversation.id == before).scalar_subquery()
+        query = query.where(or_(Conversation.created_at < created_at, and_(Conversation.created_at == created_at, Conversation.id < before)))
+    if after is not None:
+        created_at = select(Conversation.created_at).where(Conversation.id == after).scalar_subquery()
+        query = query.where(or_(Conversation.created_at > created_at, and_(Conversation.created_at == created_at, Conversation.id > after)))
+    if limit is not None and after is not None:
+        return query.order_by(Conversation.created_at, Conversation.id).limit(limit)
+    query = query.order_by(Conversation.created_at.desc(), Conversation.id.desc())
+    return query if limit is None else query.limit(limit)
+
+def _last_messages_query(conversation_ids: list[int]):
+    """Newest non-system message per conversation, via one window over the (conversation_id, id) index.
+
+    Only a prefix of the displayed text is read: USER rows store the full
+    prompt in `content`, so their `user_message` is selected instead.
+    """
+    text = case((Message.role == Role.USER, Message.user_message), else_=Message.content)
+    ranked = (
+        select(
+            Message.conversation_id,
+            Message.role,
+            func.substr(text, 1, PREVIEW_CHARS).label("content"),
+            Message.created_at,
+            func.row_number().over(partition_by=Message.conversation_id, order_by=Message.id.desc()).label("rank"),
+        )
+        .where(Message.conversation_id.in_(conversation_ids), Message.role != Role.SYSTEM)
+        .subquery()
+    )
+    return select(ranked.c.conversation_id, ranked.c.role, ranked.c.content, ranked.c.created_at).where(ranked.c.rank == 1)
+
+def _preview(role: str, content: str | None, created_at: datetime) -> dict[str, Any]:
+    # A blocked prompt is displayed ending with the guardrails reply.
+    return {"role": Role.ASSISTANT if role == Role.GUARDRAILS else role, "content": content, "created_at": created_at}
+
 def get_conversation_by_id(conversation_id: int | None, session: Session) -> Conversation | None:
     """Get a conversation by its id"""
     if conversation_id is None:
@@ -14,10 +103,30 @@ def get_conversation_by_id(conversation_id: int | None, session: Session) -> Con
         return None
     return conversation
 
-def get_conversation_messages(conversation_id: int, session: Session) -> list[Message]:
-    """Get the chat history for a conversation"""
-    query = select(Message).where(Message.conversation_id == conversation_id)
-    return list(session.exec(query))
+def get_conversation_messages(
+    conversation_id: int,
+    session: Session,
+    *,
+    limit: int | None = None,
+    before: int | None = None,
+    after: int | None = None,
+    include_system: bool = True,
+) -> list[Message]:
+    """Get the chat history for a conversation, or one keyset page of it, in id order"""
+    messages = list(session.exec(_messages_query(conversation_id, limit, before, after, include_system)))
+    return messages[::-1] if limit is not None and after is None else messages
+
+def get_display_messages(
+    conversation_id: int,
+    session: Session,
+    *,
+    limit: int | None = None,
+    before: int | None = None,
+    after: int | None = None,
+) -> list[Any]:
+    """Non-system history as projected `(id, role, text, reply)` rows for `filter_rows`, in id order"""
+    rows = list(session.execute(_messages_query(conversation_id, limit, before, after, False, _DISPLAY_COLUMNS)))
+    return rows[::-1] if limit is not None and after is None else rows
 
 def create_conversation(
     user_id: int | None,
@@ -45,13 +154,176 @@ def create_message(
     return message
 
 
-def get_conversations_by_user_id(user_id: int, session: Session, *, is_deleted: bool = False) -> list[Conversation]:
-    """Get a conversation by its user id"""
-    query = select(Conversation).where(Conversation.user_id == user_id, Conversation.is_deleted == is_deleted).order_by(Conversation.created_at.desc())
-    return session.exec(query).all()
+def get_conversations_by_user_id(
+    user_id: int,
+    session: Session,
+    *,
+    is_deleted: bool = False,
+    limit: int | None = None,
+    before: int | None = None,
+    after: int | None = None,
+) -> list[Conversation]:
+    """Get a user's conversations newest first, or one keyset page of them"""
+    conversations = list(session.exec(_conversations_query(user_id, is_deleted, limit, before, after)))
+    return conversations[::-1] if limit is not None and after is not None else conversations
+
+def get_last_messages(conversation_ids: list[int], session: Session) -> dict[int, dict[str, Any]]:
+    """Preview of the newest message of each conversation, keyed by conversation id"""
+    if not conversation_ids:
+        return {}
+    rows = session.execute(_last_messages_query(conversation_ids))
+    return {conversation_id: _preview(role, content, created_at) for conversation_id, role, content, created_at in rows}
 
 def update_conversation(conversation: Conversation, session: Session) -> None:
     """Update a conversation"""
     session.add(conversation)
     session.commit()
     session.refresh(conversation)
+
+
+async def aget_conversation_by_id(conversation_id: int | None, session: AsyncSession) -> Conversation | None:
+    """Get a conversation by its id"""
+    if conversation_id is None:
+        return None
+    return await session.get(Conversation, conversation_id)
+
+async def aget_conversation_messages(
+    conversation_id: int,
+    session: AsyncSession,
+    *,
+    limit: int | None = None,
+    before: int | None = None,
+    after: int | None = None,
+    include_system: bool = True,
+) -> list[Message]:
+    """Get the chat history for a conversation, or one keyset page of it, in id order"""
+    messages = list(await session.exec(_messages_query(conversation_id, limit, before, after, include_system)))
+    return messages[::-1] if limit is not None and after is None else messages
+
+async def aget_display_messages(
+    conversation_id: int,
+    session: AsyncSession,
+    *,
+    limit: int | None = None,
+    before: int | None = None,
+    after: int | None = None,
+) -> list[Any]:
+    """Non-system history as projected `(id, role, text, reply)` rows for `filter_rows`, in id order"""
+    rows = list(await session.execute(_messages_query(conversation_id, limit, before, after, False, _DISPLAY_COLUMNS)))
+    return rows[::-1] if limit is not None and after is None else rows
+
+async def acreate_conversation(
+    user_id: int | None,
+    session: AsyncSession,
+) -> Conversation:
+    """Create a new conversation"""
+    conversation = Conversation(user_id=user_id, created_at=datetime.now(UTC))
+    session.add(conversation)
+    await session.commit()
+    await session.refresh(conversation)
+    return conversation
+
+async def acreate_message(
+    conversation_id: int,
+    role: str,
+    content: str,
+    user_message: str | None,
+    session: AsyncSession,
+) -> Message:
+    """Create a new message"""
+    message = Message(conversation_id=conversation_id, role=role, content=content, user_message=user_message, created_at=datetime.now(UTC))
+    session.add(message)
+    await session.commit()
+    await session.refresh(message)
+    return message
+
+async def aget_conversations_by_user_id(
+    user_id: int,
+    session: AsyncSession,
+    *,
+    is_deleted: bool = False,
+    limit: int | None = None,
+    before: int | None = None,
+    after: int | None = None,
+) -> list[Conversation]:
+    """Get a user's conversations newest first, or one keyset page of them"""
+    conversations = list(await session.exec(_conversations_query(user_id, is_deleted, limit, before, after)))
+    return conversations[::-1] if limit is not None and after is not None else conversations
+
+async def aget_last_messages(conversation_ids: list[int], session: AsyncSession) -> dict[int, dict[str, Any]]:
+    """Preview of the newest message of each conversation, keyed by conversation id"""
+    if not conversation_ids:
+        return {}
+    rows = await session.execute(_last_messages_query(conversation_ids))
+    return {conversation_id: _preview(role, content, created_at) for conversation_id, role, content, created_at in rows}
+
+async def aupdate_conversation(conversation: Conversation, session: AsyncSession) -> None:
+    """Update a conversation"""
+    session.add(conversation)
+    await session.commit()
+    await session.refresh(conversation)
+
+def new_conversation(user_id: int | None) -> Conversation:
+    """Build a conversation in memory; it is inserted by `apersist_turn`"""
+    return Conversation(user_id=user_id, created_at=datetime.now(UTC))
+
+def new_message(role: str, content: str, user_message: str | None = None) -> Message:
+    """Build a message in memory; it is inserted by `apersist_turn`"""
+    return Message(conversation_id=None, role=role, content=content, user_message=user_message, created_at=datetime.now(UTC))
+
+async def apersist_turn(conversation: Conversation, messages: list[Message], session: AsyncSession) -> list[Message]:
+    """Write a whole turn in one transaction.
+
+    Inserts `conversation` first when it is new, then all of `messages` in a
+    single batched INSERT, and commits once. Primary keys are filled in by
+    the flush, so the returned rows can be used without a refresh or reread.
+    """
+    if conversation.id is None:
+        session.add(conversation)
+        await session.flush()
+    for message in messages:
+        message.conversation_id = conversation.id
+    session.add_all(messages)
+    await session.commit()
+    return messages
+
+async def aload_conversation(conversation_id: int | None) -> tuple[Conversation | None, list[Message]]:
+    """Load a conversation and its history on a short-lived session.
+
+    The connection goes back to the pool before the caller starts a model
+    call, instead of idling checked out for the whole generation.
+    """
+    async with get_async_db_session() as session:
+        conversation = await aget_conversation_by_id(conversation_id, session)
+        if conversation is None:
+            return None, []
+        return conversation, await aget_conversation_messages(conversation.id, session)
+
+async def asave_turn(conversation: Conversation, messages: list[Message]) -> list[Message]:
+    """`apersist_turn` on its own short-lived session"""
+    async with get_async_db_session() as session:
+        return await apersist_turn(conversation, messages, session)
+
+async def aload_summary_backlog(conversation_id: int) -> tuple[Conversation | None, list[Message]]:
+    """Load a conversation and the non-system messages its stored summary does not cover yet"""
+    async with get_async_db_session() as session:
+        conversation = await aget_conversation_by_id(conversation_id, session)
+        if conversation is None:
+            return None, []
+        query = select(Message).where(Message.conversation_id == conversation.id, Message.role != Role.SYSTEM)
+        if conversation.summary_message_id is not None:
+            query = query.where(Message.id > conversation.summary_message_id)
+        return conversation, list(await session.exec(query.order_by(Message.id)))
+
+async def asave_summary(conversation_id: int, summary: str, last_message_id: int) -> None:
+    """Store a rolling summary unless a concurrent call already stored a newer one"""
+    async with get_async_db_session() as session:
+        await session.execute(
+            update(Conversation)
+            .where(
+                Conversation.id == conversation_id,
+                or_(Conversation.summary_message_id.is_(None), Conversation.summary_message_id < last_message_id),
+            )
+            .values(summary=summary, summary_message_id=last_message_id)
+        )
+        await session.commit()
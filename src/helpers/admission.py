@@ -0,0 +1,318 @@
+"""Admission control for the model-backed chat endpoints.
+
+Two checks run before a turn reaches the model:
+
+- A token bucket per caller: `user:<id>` for signed-in users and
+  `ip:<address>` for anonymous ones, which get a lower rate and burst.
+  An empty bucket answers 429 with `Retry-After` set to the time until
+  the next token.
+- A global limit on in-flight model calls. Callers beyond it wait in a
+  bounded queue, signed-in users ahead of anonymous ones, and anonymous
+  callers may only fill part of it. A full queue, or a wait longer than
+  `max_wait_seconds`, answers 429 at once instead of piling requests up
+  in front of the OpenAI rate limit.
+
+State is kept in process by default. With `ADMISSION_BACKEND=redis` the
+buckets and the in-flight count are shared by every gunicorn worker
+(install the `redis` extra); the wait queue and its priority order stay
+per worker. Slots are leases, so a worker that dies mid-call frees its
+slots after `lease_seconds`.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+import anyio
+from fastapi import HTTPException, status
+from starlette.requests import HTTPConnection
+
+from src.helpers.cache import TTLCache
+from src.helpers.metrics import ADMISSION_REJECTIONS, LLM_CALLS_IN_FLIGHT, LLM_CALLS_WAITING
+
+
+def client_ip(connection: HTTPConnection) -> str:
+    """Address the anonymous bucket is keyed on (run uvicorn with `--proxy-headers` behind a proxy)."""
+    return connection.client.host if connection.client is not None else "unknown"
+
+
+class AdmissionBackend(ABC):
+    """Where token buckets and in-flight slots are kept."""
+
+    @abstractmethod
+    async def atake(self, key: str, rate: float, burst: float) -> float:
+        """Take one token from bucket `key`; return 0 if admitted, else seconds until a token is available."""
+
+    @abstractmethod
+    async def aacquire_slot(self, slot_id: str, limit: int, lease_seconds: float) -> bool:
+        """Claim an in-flight slot if fewer than `limit` live leases exist."""
+
+    @abstractmethod
+    async def arelease_slot(self, slot_id: str) -> None:
+        ...
+
+
+class InMemoryAdmissionBackend(AdmissionBackend):
+    """Per-process buckets and slots."""
+
+    def __init__(self, max_buckets: int = 100_000, bucket_ttl_seconds: float = 3600.0) -> None:
+        self._buckets: TTLCache[tuple[float, float]] = TTLCache(max_entries=max_buckets, ttl_seconds=bucket_ttl_seconds)
+        self._slots: dict[str, float] = {}
+
+    async def atake(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        tokens, stamp = self._buckets.get(key) or (burst, now)
+        tokens = min(burst, tokens + (now - stamp) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets.set(key, (tokens, now))
+        return wait
+
+    async def aacquire_slot(self, slot_id: str, limit: int, lease_seconds: float) -> bool:
+        now = time.monotonic()
+        expired = [key for key, expires_at in self._slots.items() if expires_at <= now]
+        for key in expired:
+            del self._slots[key]
+        if len(self._slots) >= limit:
+            return False
+        self._slots[slot_id] = now + lease_seconds
+        return True
+
+    async def arelease_slot(self, slot_id: str) -> None:
+        self._slots.pop(slot_id, None)
+
+
+_TAKE_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local tokens = tonumber(state[1]) or burst
+local stamp = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - stamp) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'stamp', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+_ACQUIRE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local lease = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then return 0 end
+redis.call('ZADD', KEYS[1], now + lease, ARGV[3])
+redis.call('PEXPIRE', KEYS[1], math.ceil(lease * 1000))
+return 1
+"""
+
+
+class RedisAdmissionBackend(AdmissionBackend):
+    """Buckets and slots shared by every worker through Redis, each update one Lua script."""
+
+    def __init__(self, url: str, prefix: str = "admission") -> None:
+        from redis.asyncio import Redis
+
+        self._client = Redis.from_url(url)
+        self._prefix = prefix
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+        self._acquire = self._client.register_script(_ACQUIRE_SCRIPT)
+
+    async def atake(self, key: str, rate: float, burst: float) -> float:
+        return float(await self._take(keys=[f"{self._prefix}:bucket:{key}"], args=[rate, burst]))
+
+    async def aacquire_slot(self, slot_id: str, limit: int, lease_seconds: float) -> bool:
+        return bool(await self._acquire(keys=[f"{self._prefix}:slots"], args=[limit, lease_seconds, slot_id]))
+
+    async def arelease_slot(self, slot_id: str) -> None:
+        await self._client.zrem(f"{self._prefix}:slots", slot_id)
+
+
+@dataclass
+class _Waiter:
+    authenticated: bool
+    wake: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class LLMSlot:
+    """One admitted model call; release it when the call is over (idempotent)."""
+
+    def __init__(self, controller: AdmissionController, slot_id: str) -> None:
+        self._controller = controller
+        self._slot_id = slot_id
+        self._started = time.monotonic()
+        self._released = False
+
+    async def arelease(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        # Runs from `finally` blocks of cancelled turns; the slot must still be returned.
+        with anyio.CancelScope(shield=True):
+            await self._controller._arelease(self._slot_id, time.monotonic() - self._started)
+
+    async def __aenter__(self) -> LLMSlot:
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.arelease()
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        backend: AdmissionBackend | None = None,
+        enabled: bool = True,
+        user_rate: float = 0.5,
+        user_burst: float = 10.0,
+        anonymous_rate: float = 0.1,
+        anonymous_burst: float = 3.0,
+        max_llm_calls: int = 32,
+        max_waiting: int = 64,
+        anonymous_queue_share: float = 0.5,
+        max_wait_seconds: float = 10.0,
+        lease_seconds: float = 300.0,
+        poll_interval: float = 0.1,
+    ) -> None:
+        # An idle bucket is full again after burst/rate seconds; keep it at least that long.
+        self.backend = backend or InMemoryAdmissionBackend(bucket_ttl_seconds=max(user_burst / user_rate, anonymous_burst / anonymous_rate))
+        self.enabled = enabled
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.anonymous_rate = anonymous_rate
+        self.anonymous_burst = anonymous_burst
+        self.max_llm_calls = max_llm_calls
+        self.max_waiting = max_waiting
+        self.max_anonymous_waiting = int(max_waiting * anonymous_queue_share)
+        self.max_wait_seconds = max_wait_seconds
+        self.lease_seconds = lease_seconds
+        # Releases wake the head of the queue directly; polling only picks up
+        # slots freed by other workers or by expired leases.
+        self.poll_interval = poll_interval
+        self._waiting: list[_Waiter] = []
+        self._in_flight = 0
+        self._hold_seconds = 1.0
+        self.rejections: dict[str, int] = {}
+
+    async def acheck_rate(self, user_id: int | None, ip: str) -> None:
+        """Take a token from the caller's bucket or raise 429."""
+        if not self.enabled:
+            return
+        if user_id is not None:
+            wait = await self.backend.atake(f"user:{user_id}", self.user_rate, self.user_burst)
+        else:
+            wait = await self.backend.atake(f"ip:{ip}", self.anonymous_rate, self.anonymous_burst)
+        if wait > 0:
+            raise self._rejected("rate_limited", "Too many requests", wait)
+
+    async def aacquire(self, authenticated: bool) -> LLMSlot:
+        """Wait for an in-flight model call slot or raise 429 when the queue is full or the wait too long."""
+        slot = LLMSlot(self, uuid.uuid4().hex)
+        if not self.enabled:
+            return slot
+        if not self._waiting and await self.backend.aacquire_slot(slot._slot_id, self.max_llm_calls, self.lease_seconds):
+            return self._admitted(slot)
+        anonymous_waiting = sum(1 for waiter in self._waiting if not waiter.authenticated)
+        if len(self._waiting) >= self.max_waiting or (not authenticated and anonymous_waiting >= self.max_anonymous_waiting):
+            raise self._rejected("queue_full", "Too many requests in flight", self._queue_wait())
+
+        waiter = _Waiter(authenticated)
+        if authenticated:
+            # Ahead of every anonymous waiter, behind earlier signed-in ones.
+            position = next((index for index, queued in enumerate(self._waiting) if not queued.authenticated), len(self._waiting))
+            self._waiting.insert(position, waiter)
+        else:
+            self._waiting.append(waiter)
+        LLM_CALLS_WAITING.inc()
+        deadline = time.monotonic() + self.max_wait_seconds
+        try:
+            while True:
+                if self._waiting[0] is waiter and await self.backend.aacquire_slot(slot._slot_id, self.max_llm_calls, self.lease_seconds):
+                    return self._admitted(slot)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._rejected("queue_timeout", "Too many requests in flight", self._queue_wait())
+                waiter.wake.clear()
+                try:
+                    await asyncio.wait_for(waiter.wake.wait(), min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiting.remove(waiter)
+            LLM_CALLS_WAITING.dec()
+            self._wake_head()
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiting),
+            "max_llm_calls": self.max_llm_calls,
+            "max_waiting": self.max_waiting,
+            "avg_call_seconds": round(self._hold_seconds, 3),
+            "rejections": dict(self.rejections),
+        }
+
+    def _admitted(self, slot: LLMSlot) -> LLMSlot:
+        self._in_flight += 1
+        LLM_CALLS_IN_FLIGHT.inc()
+        return slot
+
+    async def _arelease(self, slot_id: str, held: float) -> None:
+        if not self.enabled:
+            return
+        self._in_flight -= 1
+        LLM_CALLS_IN_FLIGHT.dec()
+        self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * held
+        try:
+            await self.backend.arelease_slot(slot_id)
+        finally:
+            self._wake_head()
+
+    def _wake_head(self) -> None:
+        if self._waiting:
+            self._waiting[0].wake.set()
+
+    def _queue_wait(self) -> float:
+        """Rough time until a new caller would get a slot: the queue ahead of it drained at the current call length."""
+        return self._hold_seconds * (len(self._waiting) + 1) / self.max_llm_calls
+
+    def _rejected(self, reason: str, detail: str, retry_after: float) -> HTTPException:
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+        ADMISSION_REJECTIONS.labels(reason).inc()
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(min(60, max(1, math.ceil(retry_after))))},
+        )
+
+
+@lru_cache
+def get_admission_controller() -> AdmissionController:
+    backend: AdmissionBackend | None = None
+    if os.getenv("ADMISSION_BACKEND", "memory").lower() == "redis":
+        backend = RedisAdmissionBackend(os.getenv("ADMISSION_REDIS_URL", "redis://localhost:6379/0"))
+    return AdmissionController(
+        backend=backend,
+        enabled=os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes"),
+        user_rate=float(os.getenv("ADMISSION_USER_RATE", "0.5")),
+        user_burst=float(os.getenv("ADMISSION_USER_BURST", "10")),
+        anonymous_rate=float(os.getenv("ADMISSION_ANONYMOUS_RATE", "0.1")),
+        anonymous_burst=float(os.getenv("ADMISSION_ANONYMOUS_BURST", "3")),
+        max_llm_calls=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+        max_waiting=int(os.getenv("LLM_MAX_WAITING", "64")),
+        max_wait_seconds=float(os.getenv("LLM_MAX_WAIT_SECONDS", "10")),
+    )
@@ -0,0 +1,191 @@
+"""Opt-in cache of first-turn answers for FAQ-style questions.
+
+Most support questions are paraphrases of a few hundred FAQs. When a new
+conversation asks one, the model input is just the system prompt plus
+the question and its retrieved snippets, so an earlier answer to the same
+question over the same snippets can be reused without a model call.
+
+An entry is keyed on the normalized question, the set of retrieved doc
+ids and the retriever's `index_version`, so re-ingesting the index makes
+every older entry unreachable; the first lookup under a new version also
+drops them. With a similarity threshold set, a miss
+on the exact key also accepts an entry for the same doc set whose
+question embedding is at least that cosine-similar.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Iterable
+
+import anyio.lowlevel
+
+from src.helpers.cache import TTLCache
+from src.helpers.retriever import normalize_query
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from src.helpers.vector_store import HashingEmbedder, OpenAIEmbedder
+
+# Most cached questions kept per doc set for the similarity scan.
+_MAX_CANDIDATES_PER_DOC_SET = 32
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    vector: np.ndarray | None
+
+
+@dataclass
+class AnswerLookup:
+    """Result of `AnswerCache.alookup`; pass it back to `store` on a miss."""
+
+    key: tuple[str, frozenset[str], str]
+    vector: np.ndarray | None
+    answer: str | None
+    match: str | None = None
+
+
+class AnswerCache:
+    """Bounded TTL/LRU store of first-turn answers with hit-rate counters."""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        max_entries: int = 4096,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: float | None = None,
+        embedder: HashingEmbedder | OpenAIEmbedder | None = None,
+        replay_chunk_chars: int = 64,
+    ) -> None:
+        self.enabled = enabled
+        self.similarity_threshold = similarity_threshold
+        self.replay_chunk_chars = max(1, replay_chunk_chars)
+        self._embedder = embedder
+        if similarity_threshold is not None and embedder is None:
+            from src.helpers.vector_store import HashingEmbedder
+
+            self._embedder = HashingEmbedder()
+        self._entries: TTLCache[CachedAnswer] = TTLCache(
+            max_entries=max_entries,
+            ttl_seconds=ttl_seconds,
+            max_bytes=None,
+        )
+        # (doc ids, index version) -> recent exact keys with that doc set, oldest first.
+        self._by_docs: dict[tuple[frozenset[str], str], list[tuple[str, frozenset[str], str]]] = {}
+        self._lock = threading.Lock()
+        self._index_version: str | None = None
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    async def alookup(self, query: str, doc_ids: Iterable[str], index_version: str) -> AnswerLookup:
+        """Find a cached answer for `query` over the retrieved `doc_ids`."""
+        if index_version != self._index_version:
+            if self._index_version is not None:
+                self.clear()
+            self._index_version = index_version
+        key = (normalize_query(query), frozenset(doc_ids), index_version)
+        cached = self._entries.get(key)
+        if cached is not None:
+            self.exact_hits += 1
+            return AnswerLookup(key, cached.vector, cached.answer, "exact")
+        vector = None
+        if self.similarity_threshold is not None:
+            vector = (await self._embedder.aembed([key[0]]))[0]
+            answer = self._similar(key, vector)
+            if answer is not None:
+                self.similar_hits += 1
+                return AnswerLookup(key, vector, answer, "similar")
+        self.misses += 1
+        return AnswerLookup(key, vector, None)
+
+    def store(self, lookup: AnswerLookup, answer: str) -> None:
+        """Cache `answer` under a missed lookup's key."""
+        if not answer.strip():
+            return
+        self._entries.set(lookup.key, CachedAnswer(answer, lookup.vector))
+        self.stores += 1
+        if lookup.vector is None:
+            return
+        with self._lock:
+            if len(self._by_docs) > 2 * self._entries.max_entries:
+                self._prune()
+            keys = self._by_docs.setdefault(lookup.key[1:], [])
+            if lookup.key in keys:
+                keys.remove(lookup.key)
+            keys.append(lookup.key)
+            del keys[:-_MAX_CANDIDATES_PER_DOC_SET]
+
+    async def replay(self, answer: str) -> AsyncIterator[str]:
+        """Yield a cached answer in small chunks, like a model stream."""
+        for start in range(0, len(answer), self.replay_chunk_chars):
+            yield answer[start:start + self.replay_chunk_chars]
+            await anyio.lowlevel.checkpoint()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_docs.clear()
+
+    def stats(self) -> dict[str, object]:
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        entries = self._entries.stats()
+        return {
+            "enabled": self.enabled,
+            "entries": entries["entries"],
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": entries["evictions"],
+            "expirations": entries["expirations"],
+            "hit_rate": (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0,
+        }
+
+    def _similar(self, key: tuple[str, frozenset[str], str], vector: np.ndarray) -> str | None:
+        with self._lock:
+            candidates = list(self._by_docs.get(key[1:], ()))
+        best_score, best = self.similarity_threshold, None
+        for candidate in reversed(candidates):
+            cached = self._entries.peek(candidate)
+            if cached is None:
+                continue
+            score = float(vector @ cached.vector)
+            if score >= best_score:
+                best_score, best = score, candidate
+        if best is None:
+            return None
+        cached = self._entries.get(best)
+        return cached.answer if cached is not None else None
+
+    def _prune(self) -> None:
+        """Forget candidate keys whose entries were evicted or expired (caller holds the lock)."""
+        for doc_set in list(self._by_docs):
+            keys = [key for key in self._by_docs[doc_set] if key in self._entries]
+            if keys:
+                self._by_docs[doc_set] = keys
+            else:
+                del self._by_docs[doc_set]
+
+
+@lru_cache
+def get_answer_cache() -> AnswerCache:
+    threshold = os.getenv("ANSWER_CACHE_SIMILARITY")
+    embedder = None
+    if threshold and os.getenv("ANSWER_CACHE_EMBEDDER", "hashing").lower() == "openai":
+        from src.helpers.vector_store import OpenAIEmbedder
+
+        embedder = OpenAIEmbedder(model=os.getenv("ANSWER_CACHE_EMBEDDING_MODEL", "text-embedding-3-small"))
+    return AnswerCache(
+        enabled=os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in ("1", "true", "yes"),
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "4096")),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+        similarity_threshold=float(threshold) if threshold else None,
+        embedder=embedder,
+    )
@@ -0,0 +1,220 @@
+"""Post-retrieval compression of the context snippets put into `HUMAN_PROMPT`.
+
+Retrieved hits go through three steps before they reach the prompt:
+
+1. Dedup: a hit whose text is the same as, or a near copy of, a
+   better-scored hit is dropped. Similarity is the Jaccard overlap of word
+   shingles, estimated from MinHash signatures. With a few dozen hits per
+   turn the signatures are compared pairwise; no LSH index is needed.
+2. Order: by retriever score (`none`), by maximal marginal relevance
+   (`mmr`, which trades relevance against overlap with snippets already
+   picked), or by a local cross-encoder (`cross_encoder`, needs
+   `sentence-transformers`).
+3. Pack: snippets are taken in that order while they fit `max_tokens`,
+   counted on the rendered `Source/Category/Text` block.
+
+The result keeps the structured hits; render them with `Retriever.format_hits`.
+"""
+from __future__ import annotations
+
+import os
+import re
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, List
+
+import anyio
+
+from src.helpers.history import TokenCounter, get_token_counter
+from src.helpers.metrics import CONTEXT_SNIPPETS, CONTEXT_TOKENS
+from src.helpers.retriever import Hit, Retriever
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from src.helpers.vector_store import HashingEmbedder
+
+_WORD_RE = re.compile(r"\w+")
+# Mersenne prime for the MinHash permutations; a * x + b stays below 2**63 for 31-bit inputs.
+_PRIME = (1 << 31) - 1
+
+RERANKERS = ("none", "mmr", "cross_encoder")
+
+
+def _text(hit: Hit) -> str:
+    return str(hit.get("fields", {}).get("text", ""))
+
+
+@dataclass
+class PackedContext:
+    hits: List[Hit]
+    retrieved: int
+    unique: int
+    tokens: int
+
+    @property
+    def kept(self) -> int:
+        return len(self.hits)
+
+    def render(self) -> str:
+        return Retriever.format_hits(self.hits)
+
+
+class MinHasher:
+    """MinHash signatures over word `shingle_size`-grams."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 7) -> None:
+        # Imported here, not at module level: the router imports this module on every worker boot.
+        import numpy as np
+
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.int64)
+        self._b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.int64)
+
+    def signature(self, text: str) -> np.ndarray:
+        import numpy as np
+
+        words = _WORD_RE.findall(text.casefold())
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        values = np.fromiter((zlib.crc32(shingle.encode("utf-8")) % _PRIME for shingle in shingles), dtype=np.int64, count=len(shingles))
+        return ((self._a * values + self._b) % _PRIME).min(axis=1)
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the two shingle sets."""
+        import numpy as np
+
+        return float(np.mean(first == second))
+
+
+class ContextCompressor:
+    def __init__(
+        self,
+        top_k: int = 10,
+        max_tokens: int = 2000,
+        dedup_threshold: float | None = 0.8,
+        reranker: str = "none",
+        mmr_lambda: float = 0.7,
+        cross_encoder_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        counter: TokenCounter | None = None,
+    ) -> None:
+        if reranker not in RERANKERS:
+            raise RuntimeError(f"Unknown CONTEXT_RERANKER: {reranker}")
+        self.top_k = top_k
+        self.max_tokens = max_tokens
+        self.dedup_threshold = dedup_threshold
+        self.reranker = reranker
+        self.mmr_lambda = mmr_lambda
+        self.counter = counter or get_token_counter()
+        self._minhash = MinHasher()
+        self._embedder: HashingEmbedder | None = None
+        self._cross_encoder: Any = None
+        if reranker == "mmr":
+            from src.helpers.vector_store import HashingEmbedder
+
+            self._embedder = HashingEmbedder()
+        elif reranker == "cross_encoder":
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError as exc:
+                raise RuntimeError("CONTEXT_RERANKER=cross_encoder needs the sentence-transformers package") from exc
+            self._cross_encoder = CrossEncoder(cross_encoder_model)
+
+    def compress(self, query_text: str, hits: List[Hit]) -> PackedContext:
+        """Dedup, order and pack `hits` for `query_text`."""
+        unique = self._dedup(hits)
+        ordered = self._order(query_text, unique)
+        kept, tokens = self._pack(ordered)
+        CONTEXT_SNIPPETS.labels("retrieved").observe(len(hits))
+        CONTEXT_SNIPPETS.labels("unique").observe(len(unique))
+        CONTEXT_SNIPPETS.labels("kept").observe(len(kept))
+        CONTEXT_TOKENS.observe(tokens)
+        return PackedContext(kept, len(hits), len(unique), tokens)
+
+    async def acompress(self, query_text: str, hits: List[Hit]) -> PackedContext:
+        """`compress`, moved off the event loop when a cross-encoder has to run."""
+        if self._cross_encoder is not None:
+            return await anyio.to_thread.run_sync(self.compress, query_text, hits)
+        return self.compress(query_text, hits)
+
+    def _dedup(self, hits: List[Hit]) -> List[Hit]:
+        ranked = sorted(hits, key=lambda hit: hit.get("_score") or 0.0, reverse=True)
+        kept: List[Hit] = []
+        seen_ids: set[str] = set()
+        seen_texts: set[str] = set()
+        signatures: List[np.ndarray] = []
+        for hit in ranked:
+            text = " ".join(_WORD_RE.findall(_text(hit).casefold()))
+            if hit.get("_id") in seen_ids or text in seen_texts:
+                continue
+            if self.dedup_threshold is not None:
+                signature = self._minhash.signature(text)
+                if any(MinHasher.similarity(signature, other) >= self.dedup_threshold for other in signatures):
+                    continue
+                signatures.append(signature)
+            seen_ids.add(hit.get("_id"))
+            seen_texts.add(text)
+            kept.append(hit)
+        return kept
+
+    def _order(self, query_text: str, hits: List[Hit]) -> List[Hit]:
+        if len(hits) < 2:
+            return hits
+        if self.reranker == "mmr":
+            return self._mmr(query_text, hits)
+        if self.reranker == "cross_encoder":
+            import numpy as np
+
+            scores = self._cross_encoder.predict([(query_text, _text(hit)) for hit in hits])
+            return [hits[index] for index in np.argsort(-np.asarray(scores), kind="stable")]
+        return hits
+
+    def _mmr(self, query_text: str, hits: List[Hit]) -> List[Hit]:
+        import numpy as np
+
+        vectors = self._embedder.embed([_text(hit) for hit in hits])
+        scores = np.array([hit.get("_score") or 0.0 for hit in hits], dtype=np.float32)
+        if np.ptp(scores) > 0:
+            relevance = (scores - scores.min()) / np.ptp(scores)
+        else:
+            # No usable retriever scores: fall back to lexical similarity to the query.
+            relevance = vectors @ self._embedder.embed([query_text])[0]
+        similarity = vectors @ vectors.T
+        selected: List[int] = []
+        remaining = list(range(len(hits)))
+        while remaining:
+            if selected:
+                redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            marginal = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            selected.append(remaining.pop(int(np.argmax(marginal))))
+        return [hits[index] for index in selected]
+
+    def _pack(self, hits: List[Hit]) -> tuple[List[Hit], int]:
+        kept: List[Hit] = []
+        used = 0
+        for hit in hits:
+            cost = self.counter(Retriever.format_hits([hit]))
+            # Skip rather than stop: a shorter snippet further down may still fit.
+            if used + cost > self.max_tokens:
+                continue
+            kept.append(hit)
+            used += cost
+        return kept, used
+
+
+@lru_cache
+def get_context_compressor() -> ContextCompressor:
+    threshold = os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8")
+    return ContextCompressor(
+        top_k=int(os.getenv("RETRIEVAL_TOP_K", "10")),
+        max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "2000")),
+        dedup_threshold=float(threshold) if threshold else None,
+        reranker=os.getenv("CONTEXT_RERANKER", "none").lower(),
+        mmr_lambda=float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7")),
+        cross_encoder_model=os.getenv("CONTEXT_CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+    )
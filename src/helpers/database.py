@@ -2,34 +2,117 @@ from __future__ import annotations
 import os
 from functools import lru_cache
 
-from sqlmodel import SQLModel, Session, create_engine
-from typing import Iterator
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import AsyncIterator, Iterator
+
+from src.helpers.metrics import DB_POOL_CHECKED_OUT
+from src.helpers.migrations import run_migrations
 
 DB_URL: str = os.getenv("DATABASE_URL", "sqlite:///./chat.db")
 
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def _pool_settings() -> dict[str, int]:
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "30")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+
+
+class PoolUsage:
+    """Checked-out connection gauge for one engine's pool, with its high-water mark."""
+
+    def __init__(self, engine: Engine, limit: int, name: str = "sync") -> None:
+        self.engine = engine
+        self.limit = limit
+        self._gauge = DB_POOL_CHECKED_OUT.labels(name)
+        self.in_use = 0
+        self.peak = 0
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, *_: object) -> None:
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        self._gauge.inc()
+
+    def _on_checkin(self, *_: object) -> None:
+        self.in_use -= 1
+        self._gauge.dec()
+
+    def snapshot(self) -> dict[str, int]:
+        return {"checked_out": self.in_use, "peak_checked_out": self.peak, "limit": self.limit}
+
+
+_pool_usage: dict[str, PoolUsage] = {}
+
+
+def _track_pool(name: str, engine: Engine) -> None:
+    settings = _pool_settings()
+    _pool_usage[name] = PoolUsage(engine, settings["pool_size"] + settings["max_overflow"], name)
+
+
+def get_pool_stats() -> dict[str, dict[str, int]]:
+    """Current and peak connection checkouts for each engine created so far."""
+    return {name: usage.snapshot() for name, usage in _pool_usage.items()}
+
+
+def get_async_db_url(url: str = DB_URL) -> str:
+    """Rewrite a sync DATABASE_URL onto its asyncio driver.
+
+    `sqlite:///./chat.db` becomes `sqlite+aiosqlite:///./chat.db` and
+    `postgresql://...` becomes `postgresql+asyncpg://...`. URLs that already
+    name a driver are returned unchanged.
+    """
+    scheme, sep, rest = url.partition("://")
+    if not sep or "+" in scheme:
+        return url
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
 
 @lru_cache
 def get_db_engine():
     """Create and cache a synchronous SQLModel engine.
 
-    In dev, ensure tables exist on first access. Adds sane pool defaults
-    and enables pre-ping to avoid stale connections.
+    Applies pending schema migrations on first access. Adds sane pool
+    defaults and enables pre-ping to avoid stale connections.
     """
-    pool_size = int(os.getenv("DB_POOL_SIZE", "30"))
-    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "20"))
-    pool_timeout = int(os.getenv("DB_POOL_TIMEOUT", "30"))
-    pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
-
     engine = create_engine(
         DB_URL,
         echo=False,
         pool_pre_ping=True,
-        pool_size=pool_size,
-        max_overflow=max_overflow,
-        pool_timeout=pool_timeout,
-        pool_recycle=pool_recycle,
+        **_pool_settings(),
     )
-    SQLModel.metadata.create_all(engine)
+    _track_pool("sync", engine)
+    run_migrations(engine)
+    return engine
+
+
+@lru_cache
+def get_async_db_engine() -> AsyncEngine:
+    """Create and cache an asyncio engine for the same database.
+
+    Uses aiosqlite for SQLite and asyncpg for Postgres. Migrations run on
+    the sync engine, so it is touched once here before the async pool opens.
+    """
+    get_db_engine()
+    engine = create_async_engine(
+        get_async_db_url(),
+        echo=False,
+        pool_pre_ping=True,
+        **_pool_settings(),
+    )
+    _track_pool("async", engine.sync_engine)
     return engine
 
 
@@ -42,6 +125,16 @@ def get_db_session() -> Session:
     return Session(engine)
 
 
+def get_async_db_session() -> AsyncSession:
+    """Return a new AsyncSession bound to the cached async engine.
+
+    Objects are not expired on commit so they stay readable without an
+    implicit (and, under asyncio, illegal) lazy reload.
+    """
+    engine = get_async_db_engine()
+    return AsyncSession(engine, expire_on_commit=False)
+
+
 def get_db_session_dep() -> Iterator[Session]:
     """FastAPI dependency that yields a Session and ensures it is closed.
 
@@ -51,4 +144,16 @@ def get_db_session_dep() -> Iterator[Session]:
     try:
         yield session
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+
+async def get_async_db_session_dep() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency that yields an AsyncSession and ensures it is closed.
+
+    Use as: Depends(get_async_db_session_dep)
+    """
+    session = get_async_db_session()
+    try:
+        yield session
+    finally:
+        await session.close()
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Any, Iterable
+
 from src.constants.role import Role
 from src.models.chat import UserMessage
 from src.sql_models.message import Message
@@ -16,4 +18,21 @@ def filter_messages(messages: list[Message]) -> list[UserMessage]:
             final_messages.append(UserMessage(role=Role.ASSISTANT, content=message.content))
         else:
             final_messages.append(UserMessage(role=message.role, content=message.content))
-    return final_messages
\ No newline at end of file
+    return final_messages
+
+def filter_rows(rows: Iterable[tuple[int, str, str | None, str | None]]) -> list[dict[str, Any]]:
+    """`filter_messages` for projected `(id, role, text, reply)` rows.
+
+    Rows come from `aget_display_messages`, which has already dropped
+    SYSTEM rows and picked the displayed text in SQL. Returns plain dicts
+    that go straight to the JSON encoder.
+    """
+    final_messages: list[dict[str, Any]] = []
+    append = final_messages.append
+    for _, role, text, reply in rows:
+        if role == Role.GUARDRAILS:
+            append({"role": Role.USER, "content": text})
+            append({"role": Role.ASSISTANT, "content": reply})
+        else:
+            append({"role": role, "content": text})
+    return final_messages
@@ -1,12 +1,13 @@
 from __future__ import annotations
 import functools
-import html
-import re
-from typing import Tuple, TYPE_CHECKING
+import os
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Tuple
 
-from guardrails import Guard
 from pydantic import BaseModel
 
+from src.helpers.guardrails_engine import DEFAULT_RULES, GuardrailResult, GuardrailsEngine
+from src.helpers.output_filter import StreamingOutputFilter, afilter_stream, filter_stream, strip_active_content
+
 
 class AssistantOutput(BaseModel):
     answer: str
@@ -15,41 +16,25 @@ class AssistantOutput(BaseModel):
 class GuardrailsHelper:
     """Security guardrails for inputs, context, and model outputs."""
 
-    _INJECTION_PATTERNS = [
-        r"ignore\s+(all|any|previous)\s+instructions",
-        r"disregard\s+previous\s+instructions",
-        r"system\s+prompt",
-        r"you\s+are\s+chatgpt",
-        r"override\s+the\s+(rules|instructions)",
-        r"act\s+as\s+an?\s+(.+)",
-    ]
-
-    _EMAIL_RE = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
-    _PHONE_RE = re.compile(r"\b(?:\+?\d{1,3}[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?){2}\d{4}\b")
-    _SECRET_RES = [
-        re.compile(r"sk-[A-Za-z0-9]{20,}"),
-        re.compile(r"ghp_[A-Za-z0-9]{36}"),
-        re.compile(r"xox[baprs]-[A-Za-z0-9-]{10,}"),
-        re.compile(r"AIzaSy[0-9A-Za-z\-_]{35}"),
-    ]
-
-    def __init__(self) -> None:
-        self._guard = Guard()
+    def __init__(self, engine: GuardrailsEngine | None = None, stream_holdback: int = 256) -> None:
+        self.engine = engine or GuardrailsEngine(DEFAULT_RULES)
+        self.stream_holdback = stream_holdback
+
+    def check(self, text: str) -> GuardrailResult:
+        """Scan user text once; the result names the rule that blocked it, if any, and holds the redacted text."""
+        return self.engine.scan(text)
 
     def validate_text(self, text: str) -> Tuple[bool, str]:
-        if self._looks_like_injection(text):
-            return False, "Possible prompt injection detected"
-        for regex in self._SECRET_RES:
-            if regex.search(text):
-                return False, "Possible secret detected"
+        result = self.check(text)
+        if result.blocked_by is not None:
+            return False, result.blocked_by.reason
         return True, "OK"
 
     def sanitize_user_text(self, text: str) -> Tuple[bool, str]:
-        ok, reason = self.validate_text(text)
-        if not ok:
-            return False, reason
-        redacted = self._redact_pii_and_secrets(text)
-        return True, redacted
+        result = self.check(text)
+        if result.blocked_by is not None:
+            return False, result.blocked_by.reason
+        return True, result.text
 
     def validate_output(self, text: str) -> AssistantOutput:
         candidate = text.strip()
@@ -66,24 +51,28 @@ class GuardrailsHelper:
         answer = self._redact_pii_and_secrets(answer)
         return AssistantOutput(answer=answer)
 
-    def _looks_like_injection(self, text: str) -> bool:
-        lowered = text.lower()
-        return any(re.search(pat, lowered) for pat in self._INJECTION_PATTERNS)
+    def output_filter(self) -> StreamingOutputFilter:
+        """Incremental `validate_output` for one streamed answer (JSON `answer` unwrapping aside)."""
+        return StreamingOutputFilter(self.engine, max_holdback=self.stream_holdback)
+
+    def filter_stream(self, deltas: Iterable[str]) -> Iterator[str]:
+        return filter_stream(deltas, self.output_filter())
+
+    def afilter_stream(self, deltas: AsyncIterable[str]) -> AsyncIterator[str]:
+        return afilter_stream(deltas, self.output_filter())
 
     def _strip_active_content(self, text: str) -> str:
-        without_scripts = re.sub(r"<\s*(script|style)[^>]*>.*?<\s*/\s*\1\s*>", " ", text, flags=re.I | re.S)
-        without_tags = re.sub(r"<[^>]+>", " ", without_scripts)
-        return html.unescape(without_tags)
+        return strip_active_content(text)
 
     def _redact_pii_and_secrets(self, text: str) -> str:
-        redacted = self._EMAIL_RE.sub("[redacted-email]", text)
-        redacted = self._PHONE_RE.sub("[redacted-phone]", redacted)
-        for regex in self._SECRET_RES:
-            redacted = regex.sub("[redacted-secret]", redacted)
-        return redacted
+        return self.engine.scan(text, output=True).text
 
 @functools.lru_cache(maxsize=1)
 def get_guardrails_helper() -> GuardrailsHelper:
-    return GuardrailsHelper()
+    rules_path = os.getenv("GUARDRAILS_RULES_PATH")
+    return GuardrailsHelper(
+        GuardrailsEngine.from_file(rules_path) if rules_path else None,
+        stream_holdback=int(os.getenv("GUARDRAILS_STREAM_HOLDBACK", "256")),
+    )
 
 
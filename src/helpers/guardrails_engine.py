@@ -0,0 +1,283 @@
+"""Prefiltered rule engine behind `GuardrailsHelper`.
+
+Every rule is a regex with an action for user input:
+
+- `block`: the text is rejected and the rule's `reason` is reported
+- `redact`: each match is replaced with the rule's `replacement`
+
+Model output is never blocked; matches of rules with `redact_output` are
+replaced there instead.
+
+A message is scanned three times at most, however many rules there are:
+
+1. A prefilter pass finds which literal anchors occur in the lowercased
+   text. Each rule's anchor is its longest required literal, and all
+   anchors are matched by one trie-shaped regex.
+2. The candidate blocking rules are combined into one alternation of
+   named groups and searched on the raw text. Candidates are the rules
+   whose anchor occurred plus the rules without an anchor. Blocking gets
+   its own pass so that a redaction starting earlier (an email address
+   around an API key, say) cannot consume a blocking match.
+3. The candidate redaction rules are combined the same way. One
+   `finditer` redacts them, and the group name of each match says which
+   rule fired. Model output skips step 2 and redacts every
+   `redact_output` rule here.
+
+Combined patterns are cached per candidate set.
+
+A clean message usually selects no anchored rules at all, so its cost
+stays near flat as the rule set grows.
+
+Extra rules are loaded from a JSON file (`GUARDRAILS_RULES_PATH`). The file
+holds either a list of rules, which are appended to the defaults, or an
+object `{"include_defaults": false, "rules": [...]}`. Each rule has the
+fields of `GuardrailRule`:
+
+    [{"name": "secret.stripe", "pattern": "sk_live_[0-9a-zA-Z]{24}",
+      "action": "block", "reason": "Possible secret detected"}]
+
+Rule patterns must not use named groups or backreferences, because they
+are embedded in the combined alternation.
+"""
+from __future__ import annotations
+
+import json
+import re
+from functools import lru_cache
+from typing import Iterable, Iterator, Literal
+
+from pydantic import BaseModel
+
+try:  # Python 3.11+
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_parse  # type: ignore[no-redef]
+
+
+
+class GuardrailRule(BaseModel):
+    name: str
+    pattern: str
+    action: Literal["block", "redact"] = "block"
+    reason: str = "Blocked by guardrails"
+    replacement: str = "[redacted]"
+    redact_output: bool = True
+    ignore_case: bool = False
+
+
+class GuardrailFinding(BaseModel):
+    rule: str
+    action: Literal["block", "redact"]
+    start: int
+    end: int
+
+
+class GuardrailResult(BaseModel):
+    """Outcome of one scan: `blocked_by` is the first blocking rule that fired, if any."""
+
+    text: str
+    blocked_by: GuardrailRule | None = None
+    findings: list[GuardrailFinding] = []
+
+    @property
+    def blocked(self) -> bool:
+        return self.blocked_by is not None
+
+
+_INJECTION = "Possible prompt injection detected"
+_SECRET = "Possible secret detected"
+
+# Injection rules come first: when a message trips both kinds, the injection reason is reported.
+DEFAULT_RULES: list[GuardrailRule] = [
+    *(
+        GuardrailRule(name=name, pattern=pattern, reason=_INJECTION, redact_output=False, ignore_case=True)
+        for name, pattern in (
+            ("injection.ignore_instructions", r"ignore\s+(all|any|previous)\s+instructions"),
+            ("injection.disregard_instructions", r"disregard\s+previous\s+instructions"),
+            ("injection.system_prompt", r"system\s+prompt"),
+            ("injection.you_are_chatgpt", r"you\s+are\s+chatgpt"),
+            ("injection.override_rules", r"override\s+the\s+(rules|instructions)"),
+            ("injection.act_as", r"act\s+as\s+an?\s+(.+)"),
+        )
+    ),
+    GuardrailRule(name="secret.openai_key", pattern=r"sk-[A-Za-z0-9]{20,}", reason=_SECRET, replacement="[redacted-secret]"),
+    GuardrailRule(name="secret.github_token", pattern=r"ghp_[A-Za-z0-9]{36}", reason=_SECRET, replacement="[redacted-secret]"),
+    GuardrailRule(name="secret.slack_token", pattern=r"xox[baprs]-[A-Za-z0-9-]{10,}", reason=_SECRET, replacement="[redacted-secret]"),
+    GuardrailRule(name="secret.google_api_key", pattern=r"AIzaSy[0-9A-Za-z\-_]{35}", reason=_SECRET, replacement="[redacted-secret]"),
+    GuardrailRule(
+        name="pii.email",
+        pattern=r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b",
+        action="redact",
+        replacement="[redacted-email]",
+    ),
+    GuardrailRule(
+        name="pii.phone",
+        pattern=r"\b(?:\+?\d{1,3}[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?){2}\d{4}\b",
+        action="redact",
+        replacement="[redacted-phone]",
+    ),
+]
+
+
+def literal_anchor(rule: GuardrailRule) -> str | None:
+    """Longest literal run every match of `rule` must contain, lowercased.
+
+    Only top-level literals are considered, since those are mandatory in
+    every match. Returns None when the pattern has no top-level literal.
+    """
+    flags = re.IGNORECASE if rule.ignore_case else 0
+    best, run = "", []
+    for op, arg in list(sre_parse.parse(rule.pattern, flags)) + [(None, None)]:
+        if op is sre_parse.LITERAL:
+            run.append(chr(arg))
+            continue
+        if len(run) > len(best):
+            best = "".join(run)
+        run = []
+    return best.lower() or None
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex matching any of `words`, shaped as a trie so each position is tried once per prefix."""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: dict) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return render(trie)
+
+
+class GuardrailsEngine:
+    """Compiled rule set; see the module docstring."""
+
+    def __init__(self, rules: Iterable[GuardrailRule]) -> None:
+        # Blocking rules go first so that, at equal start offsets, they win over redactions in output.
+        self.rules = sorted(rules, key=lambda rule: rule.action != "block")
+        for rule in self.rules:
+            compiled = re.compile(rule.pattern)
+            if compiled.groupindex or re.search(r"\\\d|\(\?P=", rule.pattern):
+                raise ValueError(f"Guardrail rule {rule.name!r} must not use named groups or backreferences")
+        self._by_group = {f"r{index}": rule for index, rule in enumerate(self.rules)}
+        self._patterns = {
+            group: re.compile(rule.pattern, re.IGNORECASE if rule.ignore_case else 0) for group, rule in self._by_group.items()
+        }
+        anchors = {group: literal_anchor(rule) for group, rule in self._by_group.items()}
+        self._unanchored = frozenset(group for group, anchor in anchors.items() if anchor is None)
+        self._groups_by_anchor: dict[str, set[str]] = {}
+        for group, anchor in anchors.items():
+            if anchor is not None:
+                self._groups_by_anchor.setdefault(anchor, set()).add(group)
+        # Matched against lowercased text: re.IGNORECASE makes the trie several times slower.
+        self._prefilter = re.compile(_trie_pattern(self._groups_by_anchor)) if self._groups_by_anchor else None
+        # A trie match only reports the longest anchor at a position; shorter anchors that
+        # are its prefixes are present too.
+        self._prefix_groups = {
+            anchor: frozenset().union(*(groups for other, groups in self._groups_by_anchor.items() if anchor.startswith(other)))
+            for anchor in self._groups_by_anchor
+        }
+        self._combined = lru_cache(maxsize=256)(self._compile)
+
+    @classmethod
+    def from_file(cls, path: str) -> GuardrailsEngine:
+        with open(path, encoding="utf-8") as handle:
+            config = json.load(handle)
+        if isinstance(config, list):
+            config = {"rules": config}
+        rules = [GuardrailRule.model_validate(rule) for rule in config.get("rules", [])]
+        if config.get("include_defaults", True):
+            rules = DEFAULT_RULES + rules
+        return cls(rules)
+
+    def _includes(self, rule: GuardrailRule, kind: Literal["block", "redact", "output"]) -> bool:
+        return rule.redact_output if kind == "output" else rule.action == kind
+
+    def _compile(self, groups: frozenset[str], kind: Literal["block", "redact", "output"]) -> re.Pattern[str] | None:
+        parts = []
+        for group, rule in self._by_group.items():
+            if group not in groups or not self._includes(rule, kind):
+                continue
+            body = f"(?i:{rule.pattern})" if rule.ignore_case else f"(?:{rule.pattern})"
+            parts.append(f"(?P<{group}>{body})")
+        return re.compile("|".join(parts)) if parts else None
+
+    def _candidates(self, text: str) -> frozenset[str]:
+        if self._prefilter is None:
+            return self._unanchored
+        lowered = text.lower()
+        found: set[str] = set()
+        # Restart one character after each hit so anchors overlapping an earlier one are seen.
+        match = self._prefilter.search(lowered)
+        while match is not None:
+            found.add(match.group())
+            match = self._prefilter.search(lowered, match.start() + 1)
+        return self._unanchored.union(*(self._prefix_groups[anchor] for anchor in found))
+
+    @property
+    def output_rules(self) -> list[GuardrailRule]:
+        return [rule for rule in self.rules if rule.redact_output]
+
+    def iter_matches(self, text: str, output: bool = False, pos: int = 0) -> Iterator[tuple[GuardrailRule, re.Match[str]]]:
+        """Yield `(rule, match)` for each non-overlapping redaction match in `text[pos:]`.
+
+        On input only `redact` rules take part; blocking is `scan`'s own pass.
+        Characters before `pos` only serve as context for assertions such as `\\b`.
+        """
+        yield from self._iter_matches(text, self._candidates(text), "output" if output else "redact", pos)
+
+    def _iter_matches(
+        self, text: str, candidates: frozenset[str], kind: Literal["block", "redact", "output"], pos: int = 0
+    ) -> Iterator[tuple[GuardrailRule, re.Match[str]]]:
+        pattern = self._combined(candidates, kind)
+        if pattern is None:
+            return
+        for match in pattern.finditer(text, pos):
+            yield self._by_group[match.lastgroup], match
+
+    def _blocking_match(self, text: str, candidates: frozenset[str]) -> tuple[GuardrailRule, re.Match[str]] | None:
+        """First blocking rule, in rule order, that matches anywhere in `text`."""
+        pattern = self._combined(candidates, "block")
+        if pattern is None or pattern.search(text) is None:
+            return None
+        # Rare path: the combined search only proves some rule matched, possibly not the first one.
+        for group, rule in self._by_group.items():
+            if group in candidates and rule.action == "block":
+                match = self._patterns[group].search(text)
+                if match is not None:
+                    return rule, match
+        return None
+
+    def scan(self, text: str, output: bool = False) -> GuardrailResult:
+        """Detect blocking rules, then redact, on `text` (after the prefilter).
+
+        On input, a blocking match returns the text unchanged with the
+        first blocking rule that matched. With `output`, nothing blocks and
+        every match of a `redact_output` rule is replaced.
+        """
+        candidates = self._candidates(text)
+        if not output:
+            blocking = self._blocking_match(text, candidates)
+            if blocking is not None:
+                rule, match = blocking
+                finding = GuardrailFinding(rule=rule.name, action=rule.action, start=match.start(), end=match.end())
+                return GuardrailResult(text=text, blocked_by=rule, findings=[finding])
+        pieces: list[str] = []
+        findings: list[GuardrailFinding] = []
+        position = 0
+        for rule, match in self._iter_matches(text, candidates, "output" if output else "redact"):
+            findings.append(GuardrailFinding(rule=rule.name, action=rule.action, start=match.start(), end=match.end()))
+            pieces.append(text[position:match.start()])
+            pieces.append(rule.replacement)
+            position = match.end()
+        if not findings:
+            return GuardrailResult(text=text)
+        pieces.append(text[position:])
+        return GuardrailResult(text="".join(pieces), findings=findings)
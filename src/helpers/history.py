@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import os
+from datetime import UTC, datetime
+from functools import lru_cache
+from typing import Callable
+
+from src.constants.role import Role
+from src.sql_models.message import Message
+
+TokenCounter = Callable[[str], int]
+
+# Fixed per-message framing cost of the chat format (role markers, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_HEADER = "Summary of earlier conversation (older turns omitted):"
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+@lru_cache(maxsize=4)
+def get_token_counter(model: str = "gpt-4o") -> TokenCounter:
+    """Return a callable that counts tokens for `model`.
+
+    Uses tiktoken when it is installed and its encoding can be loaded (the
+    BPE file is fetched on first use, so offline hosts may not have it);
+    otherwise falls back to the usual ~4 characters per token estimate,
+    which is close enough for budgeting.
+    """
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return _estimate_tokens
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def _summarize_turns(turns: list[list[Message]], max_chars: int = 1200) -> str:
+    """Extractive digest of dropped turns: the user's earlier questions, newest last."""
+    questions = [turn[0].content.strip().replace("\n", " ") for turn in turns if turn and turn[0].role == Role.USER]
+    lines: list[str] = []
+    used = 0
+    for question in reversed(questions):
+        line = f"- {question[:200]}"
+        if used + len(line) > max_chars:
+            break
+        lines.append(line)
+        used += len(line) + 1
+    if not lines:
+        return ""
+    return SUMMARY_HEADER + "\nThe user previously asked:\n" + "\n".join(reversed(lines))
+
+
+class HistoryBuilder:
+    """Assemble the model input for a turn within a token budget.
+
+    The stored history keeps every USER row with its full `HUMAN_PROMPT`
+    (question + retrieved context). Only the current turn needs that
+    context, so past USER rows are replayed as their bare `user_message`,
+    GUARDRAILS rows (blocked prompts) are dropped, and the oldest turns are
+    trimmed until system prompt + kept turns + current turn fit `max_tokens`.
+    When `summarize` is enabled the trimmed turns are folded into a short
+    digest instead of disappearing completely.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 8000,
+        counter: TokenCounter | None = None,
+        summarize: bool = False,
+        summarizer: Callable[[list[list[Message]]], str] | None = None,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.counter = counter or get_token_counter()
+        self.summarize = summarize
+        self.summarizer = summarizer or _summarize_turns
+
+    def count_tokens(self, messages: list[Message]) -> int:
+        return sum(self.counter(message.content) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+    def build(self, messages: list[Message]) -> list[Message]:
+        """Return the messages to send to the model.
+
+        `messages` is the stored history in order with the current USER turn
+        last. The returned list holds transient copies; stored rows are never
+        modified.
+        """
+        if not messages:
+            return []
+        current = messages[-1]
+        system = [message for message in messages[:-1] if message.role == Role.SYSTEM]
+        turns = self._group_turns(messages[:-1])
+
+        used = self.count_tokens(system) + self.count_tokens([current])
+        kept: list[list[Message]] = []
+        for turn in reversed(turns):
+            cost = self.count_tokens(turn)
+            if used + cost > self.max_tokens:
+                break
+            kept.append(turn)
+            used += cost
+        kept.reverse()
+
+        dropped = turns[: len(turns) - len(kept)]
+        if dropped and self.summarize:
+            summary = self._summary(current, dropped)
+            # Make room for the digest by shedding further old turns, which are folded into it.
+            while summary is not None and kept and used + self.count_tokens([summary]) > self.max_tokens:
+                turn = kept.pop(0)
+                used -= self.count_tokens(turn)
+                dropped.append(turn)
+                summary = self._summary(current, dropped)
+            if summary is not None:
+                system = system + [summary]
+
+        return system + [message for turn in kept for message in turn] + [current]
+
+    def _group_turns(self, messages: list[Message]) -> list[list[Message]]:
+        """Split past messages into [user, assistant...] turns with compact content."""
+        turns: list[list[Message]] = []
+        for message in messages:
+            if message.role == Role.SYSTEM or message.role == Role.GUARDRAILS:
+                continue
+            if message.role == Role.USER:
+                content = message.user_message if message.user_message is not None else message.content
+                turns.append([self._copy(message, Role.USER, content)])
+            elif turns:
+                turns[-1].append(message)
+            else:
+                turns.append([message])
+        return turns
+
+    def _summary(self, current: Message, dropped: list[list[Message]]) -> Message | None:
+        digest = self.summarizer(dropped)
+        return self._copy(current, Role.SYSTEM, digest) if digest else None
+
+    @staticmethod
+    def _copy(message: Message, role: str, content: str) -> Message:
+        return Message(
+            conversation_id=message.conversation_id,
+            role=role,
+            content=content,
+            user_message=None,
+            created_at=message.created_at or datetime.now(UTC),
+        )
+
+
+@lru_cache
+def get_history_builder() -> HistoryBuilder:
+    return HistoryBuilder(
+        max_tokens=int(os.getenv("HISTORY_TOKEN_BUDGET", "8000")),
+        summarize=os.getenv("HISTORY_SUMMARY", "false").lower() in ("1", "true", "yes"),
+    )
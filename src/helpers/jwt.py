@@ -1,17 +1,26 @@
 from __future__ import annotations
 
+import hashlib
 import os
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, Optional
 
 import jwt
 from fastapi import HTTPException, status
 
+from src.helpers.cache import TTLCache
 
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "60"))
 JWT_SECRET = os.getenv("JWT_SECRET", "eloquentaioperator")
 
+# Verified payloads keyed by token hash, each kept no longer than the token's own `exp`.
+_payload_cache: TTLCache[Dict[str, Any]] = TTLCache(
+    max_entries=int(os.getenv("JWT_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("JWT_CACHE_TTL_SECONDS", "300")),
+)
+
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -21,8 +30,17 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
 
 
 def decode_token(token: str) -> Dict[str, Any]:
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    cached = _payload_cache.get(key)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            remaining = exp - time.time()
+            if remaining > 0:
+                _payload_cache.set(key, payload, ttl_seconds=min(remaining, _payload_cache.ttl_seconds))
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
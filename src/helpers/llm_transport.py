@@ -0,0 +1,190 @@
+"""Connection, timeout, retry and hedging settings for the OpenAI clients.
+
+- Pool: one httpx client per helper with bounded connections and
+  keep-alive. HTTP/2 is used when `h2` is installed, so concurrent calls
+  share a few multiplexed connections instead of opening one each.
+- Timeouts: `connect` for the TCP/TLS handshake, `request` for a whole
+  blocking call, and for streams `first_token` (until the first text
+  delta) and `inter_token` (between deltas), so a stuck stream fails fast
+  instead of holding a slot until the request timeout.
+- Retries: the SDK's own retries are turned off. Connection errors,
+  timeouts, 429s and 5xx are retried with jittered backoff, but only
+  while the worker's `RetryBudget` allows, so retries cannot multiply the
+  load on an upstream that is already slow. Streams are only retried
+  before their first delta.
+- Hedging (opt-in): when a stream has no first token after the model's
+  recent TTFT percentile, a second identical request is sent and
+  whichever answers first is kept; the other is closed. Hedges spend from
+  the same budget as retries.
+"""
+from __future__ import annotations
+
+import importlib.util
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+
+class StreamTimeoutError(RuntimeError):
+    """A streamed model call produced no token within its first-token or inter-token timeout."""
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class TransportSettings:
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+    connect_timeout: float = 5.0
+    request_timeout: float = 120.0
+    first_token_timeout: float = 30.0
+    inter_token_timeout: float = 15.0
+    max_retries: int = 2
+    max_backoff: float = 8.0
+    hedge: bool = False
+    hedge_percentile: float = 95.0
+    hedge_min_delay: float = 0.5
+    hedge_min_samples: int = 20
+
+    @classmethod
+    def from_env(cls) -> TransportSettings:
+        return cls(
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "30")),
+            http2=_env_bool("OPENAI_HTTP2", "true"),
+            connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "5")),
+            request_timeout=float(os.getenv("OPENAI_REQUEST_TIMEOUT_SECONDS", "120")),
+            first_token_timeout=float(os.getenv("OPENAI_FIRST_TOKEN_TIMEOUT_SECONDS", "30")),
+            inter_token_timeout=float(os.getenv("OPENAI_INTER_TOKEN_TIMEOUT_SECONDS", "15")),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2")),
+            max_backoff=float(os.getenv("OPENAI_MAX_BACKOFF_SECONDS", "8")),
+            hedge=_env_bool("OPENAI_HEDGE_ENABLED", "false"),
+            hedge_percentile=float(os.getenv("OPENAI_HEDGE_PERCENTILE", "95")),
+            hedge_min_delay=float(os.getenv("OPENAI_HEDGE_MIN_DELAY_SECONDS", "0.5")),
+            hedge_min_samples=int(os.getenv("OPENAI_HEDGE_MIN_SAMPLES", "20")),
+        )
+
+    def http_client_kwargs(self) -> dict[str, Any]:
+        """Keyword arguments for the SDK's `DefaultHttpxClient` / `DefaultAsyncHttpxClient`."""
+        import httpx
+
+        return {
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            # httpx raises at construction when http2 is asked for without the h2 package.
+            "http2": self.http2 and importlib.util.find_spec("h2") is not None,
+        }
+
+    def request_timeout_config(self) -> Any:
+        import httpx
+
+        return httpx.Timeout(self.request_timeout, connect=self.connect_timeout)
+
+    def stream_timeout_config(self) -> Any:
+        """Transport-level backstop for streams; the token timeouts themselves are enforced per read."""
+        import httpx
+
+        return httpx.Timeout(self.request_timeout, connect=self.connect_timeout, read=max(self.first_token_timeout, self.inter_token_timeout))
+
+
+class RetryBudget:
+    """Retries allowed as a share of recent requests, shared by every model call in the worker.
+
+    Over a sliding `window_seconds`, at most `ratio` retries per request
+    are allowed, plus `min_per_second` so that a quiet worker can still
+    retry. Thread-safe, as the sync helper runs in the threadpool.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 0.5, window_seconds: float = 10.0) -> None:
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window_seconds = window_seconds
+        self._requests: deque[float] = deque()
+        self._retries: deque[float] = deque()
+        self._lock = threading.Lock()
+        self.exhausted = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._requests.append(now)
+            self._trim(now)
+
+    def try_spend(self) -> bool:
+        """Take one retry (or hedge) from the budget; False once it is used up."""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            allowed = self.min_per_second * self.window_seconds + self.ratio * len(self._requests)
+            if len(self._retries) >= allowed:
+                self.exhausted += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def _trim(self, now: float) -> None:
+        horizon = now - self.window_seconds
+        for stamps in (self._requests, self._retries):
+            while stamps and stamps[0] < horizon:
+                stamps.popleft()
+
+
+class TtftTracker:
+    """Recent time-to-first-token samples per model, for the hedging threshold."""
+
+    def __init__(self, window: int = 200) -> None:
+        self.window = window
+        self._samples: dict[str, deque[float]] = {}
+
+    def observe(self, model: str, seconds: float) -> None:
+        self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, model: str, pct: float, min_samples: int) -> float | None:
+        samples = self._samples.get(model)
+        if samples is None or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def is_retryable(exc: BaseException) -> bool:
+    import httpx
+    import openai
+
+    # Errors while reading a stream reach the caller as raw httpx errors, not SDK ones.
+    return isinstance(exc, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError, httpx.TransportError, StreamTimeoutError))
+
+
+def backoff_delay(exc: BaseException, attempt: int, max_backoff: float) -> float | None:
+    """Seconds to wait before retry `attempt` (0-based), or None when the upstream asks for longer than `max_backoff`."""
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after is not None:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            delay = max_backoff
+        return delay if delay <= max_backoff else None
+    # Full jitter keeps retries from many workers from arriving together.
+    return random.uniform(0, min(max_backoff, 0.25 * 2 ** attempt))
+
+
+@lru_cache
+def get_retry_budget() -> RetryBudget:
+    return RetryBudget(
+        ratio=float(os.getenv("OPENAI_RETRY_BUDGET_RATIO", "0.1")),
+        min_per_second=float(os.getenv("OPENAI_RETRY_BUDGET_MIN_PER_SECOND", "0.5")),
+    )
@@ -0,0 +1,156 @@
+"""Prometheus metrics for the chat pipeline.
+
+Each chat turn is timed stage by stage (guardrails, DB read, retrieval,
+LLM, DB write) into `chat_stage_seconds`, and the same timings are sent
+back on the response as a `Server-Timing` header. The OpenAI helpers
+record time to first token, generation time, token counts and tokens/sec
+from the Responses API usage.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory that
+every worker can write to; values are then kept in per-process files and
+`/metrics` aggregates all of them. `gunicorn.conf.py` drops the files of
+workers that exit.
+"""
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CHAT_STAGE_SECONDS = Histogram(
+    "chat_stage_seconds",
+    "Time spent in each stage of a chat turn",
+    ["route", "stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from sending a streamed request to its first output text delta",
+    ["model"],
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_GENERATION_SECONDS = Histogram(
+    "llm_generation_seconds",
+    "Total time of a model call, until the full response is received",
+    ["model", "mode"],
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens",
+    "Tokens reported by the Responses API usage",
+    ["model", "kind"],
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_tokens_per_second",
+    "Completion tokens per second of generation (after the first token when streaming)",
+    ["model", "mode"],
+    buckets=(5, 10, 20, 40, 60, 80, 100, 150, 200, 300, 500),
+)
+LLM_RETRIES = Counter(
+    "llm_retries",
+    "Model calls retried within the retry budget, by error type",
+    ["reason"],
+)
+LLM_HEDGES = Counter(
+    "llm_hedges",
+    "Hedged stream requests sent after a slow first token, and those that answered first",
+    ["outcome"],
+)
+STREAMS_IN_FLIGHT = Gauge(
+    "chat_streams_in_flight",
+    "Answers currently being streamed to clients",
+    ["transport"],
+    multiprocess_mode="livesum",
+)
+LLM_CALLS_IN_FLIGHT = Gauge(
+    "llm_calls_in_flight",
+    "Model calls holding an admission slot",
+    multiprocess_mode="livesum",
+)
+LLM_CALLS_WAITING = Gauge(
+    "llm_calls_waiting",
+    "Model calls queued for an admission slot",
+    multiprocess_mode="livesum",
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections",
+    "Chat requests answered 429 by admission control",
+    ["reason"],
+)
+CONTEXT_SNIPPETS = Histogram(
+    "context_snippets",
+    "Retrieved snippets per chat turn: as retrieved, after dedup, and kept in the prompt",
+    ["stage"],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50),
+)
+CONTEXT_TOKENS = Histogram(
+    "context_tokens",
+    "Tokens of retrieved context put into the prompt per chat turn",
+    buckets=(0, 100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of each database pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+
+class StageTimings:
+    """Per-turn stage timer feeding `chat_stage_seconds` and a `Server-Timing` header."""
+
+    def __init__(self, route: str) -> None:
+        self.route = route
+        self.durations: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        CHAT_STAGE_SECONDS.labels(self.route, name).observe(seconds)
+
+    def server_timing(self) -> str:
+        """`Server-Timing` header value, durations in milliseconds."""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.durations.items())
+
+
+def record_llm_call(model: str, mode: str, usage: Any, elapsed: float, first_token: float | None = None) -> None:
+    """Record one model call; `usage` is the Responses API usage object (may be None).
+
+    `first_token` is the time to the first delta of a streamed call; tokens
+    per second are then measured over the time after it.
+    """
+    LLM_GENERATION_SECONDS.labels(model, mode).observe(elapsed)
+    if first_token is not None:
+        LLM_TIME_TO_FIRST_TOKEN_SECONDS.labels(model).observe(first_token)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "input_tokens", 0) or 0
+    completion_tokens = getattr(usage, "output_tokens", 0) or 0
+    LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+    generation = elapsed - (first_token or 0.0)
+    if completion_tokens and generation > 0:
+        LLM_TOKENS_PER_SECOND.labels(model, mode).observe(completion_tokens / generation)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Exposition of every metric, aggregated across workers in multi-process mode."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
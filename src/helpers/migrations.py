@@ -0,0 +1,158 @@
+"""Versioned schema migrations applied on engine startup.
+
+Each migration is an idempotent function of a `Connection`, recorded in the
+`schema_version` table once applied. Append new migrations to `MIGRATIONS`
+with the next version number; never edit one that has shipped. Migrations
+spell out their DDL rather than reading the models, so a fresh database and
+an upgraded one go through the same steps.
+
+Workers booting together are serialised by a Postgres advisory lock, or on
+SQLite by taking the write lock up front with `BEGIN IMMEDIATE`.
+
+Check or apply from the command line:
+
+    python -m src.helpers.migrations          # apply pending migrations
+    python -m src.helpers.migrations --status # show applied/pending versions
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import UTC, datetime
+from typing import Callable
+
+from sqlalchemy import Boolean, Column, DateTime, Engine, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection
+
+_version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Arbitrary key for the Postgres advisory lock that serialises workers migrating at boot.
+_PG_LOCK_KEY = 0x656C6F71
+
+
+# The schema as the models created it before versioning; frozen, whatever the models look like now.
+_v1_metadata = MetaData()
+Table(
+    "user",
+    _v1_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("email", String, nullable=False, index=True, unique=True),
+    Column("name", String, nullable=False, index=True),
+    Column("password", String, nullable=False, index=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("token", String, nullable=True),
+)
+Table(
+    "conversation",
+    _v1_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, nullable=True, index=True),
+    Column("short_name", String, nullable=True, index=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("is_deleted", Boolean, nullable=False),
+)
+Table(
+    "message",
+    _v1_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("conversation_id", Integer, nullable=False, index=True),
+    Column("role", String, nullable=False, index=True),
+    Column("content", String, nullable=False, index=True),
+    Column("user_message", String, nullable=True, index=True),
+    Column("created_at", DateTime, nullable=False),
+)
+
+
+def _initial_schema(conn: Connection) -> None:
+    """Create any missing v1 tables (a no-op for databases created before versioning)."""
+    _v1_metadata.create_all(conn)
+
+
+def _index_overhaul(conn: Connection) -> None:
+    """Drop B-trees over large text columns; add composite indexes for the hot reads."""
+    for index in (
+        "ix_message_content",
+        "ix_message_user_message",
+        "ix_message_role",
+        "ix_message_conversation_id",
+        "ix_conversation_user_id",
+        "ix_user_password",
+    ):
+        conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_message_conversation_id_id ON message (conversation_id, id)"))
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_conversation_user_id_is_deleted_created_at "
+            "ON conversation (user_id, is_deleted, created_at)"
+        )
+    )
+
+
+def _conversation_summary(conn: Connection) -> None:
+    """Add the rolling summary columns to `conversation`."""
+    columns = {column["name"] for column in inspect(conn).get_columns("conversation")}
+    if "summary" not in columns:
+        conn.execute(text("ALTER TABLE conversation ADD COLUMN summary VARCHAR"))
+    if "summary_message_id" not in columns:
+        conn.execute(text("ALTER TABLE conversation ADD COLUMN summary_message_id INTEGER"))
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "initial schema", _initial_schema),
+    (2, "message and conversation index overhaul", _index_overhaul),
+    (3, "conversation rolling summary", _conversation_summary),
+]
+
+
+def _applied_versions(conn: Connection) -> set[int]:
+    return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def run_migrations(engine: Engine) -> list[int]:
+    """Apply pending migrations in order and return the versions applied."""
+    applied: list[int] = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_LOCK_KEY})
+        elif conn.dialect.name == "sqlite":
+            # pysqlite defers BEGIN until the first write, so two workers could both read an
+            # empty schema_version; taking the write lock now makes the second one wait.
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        _version_metadata.create_all(conn)
+        done = _applied_versions(conn)
+        for version, name, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            migrate(conn)
+            conn.execute(schema_version.insert().values(version=version, name=name, applied_at=datetime.now(UTC)))
+            applied.append(version)
+    return applied
+
+
+def main(argv: list[str] | None = None) -> None:
+    from src.helpers.database import DB_URL
+    from sqlmodel import create_engine
+
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations")
+    parser.add_argument("--status", action="store_true", help="list applied and pending versions without migrating")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(DB_URL)
+    if args.status:
+        with engine.connect() as conn:
+            done = _applied_versions(conn) if inspect(conn).has_table("schema_version") else set()
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:>4}  {'applied' if version in done else 'pending':<8} {name}")
+        return
+    applied = run_migrations(engine)
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
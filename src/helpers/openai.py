@@ -1,48 +1,311 @@
 from __future__ import annotations
+import asyncio
 import os
+import time
+from dataclasses import dataclass
 from functools import lru_cache
-from openai import OpenAI
+from typing import TYPE_CHECKING, Any, AsyncIterator
+
+import anyio
 
 from src.sql_models.message import Message
 from src.constants.role import Role
+from src.helpers.llm_transport import (
+    StreamTimeoutError,
+    TransportSettings,
+    TtftTracker,
+    backoff_delay,
+    get_retry_budget,
+    is_retryable,
+)
+from src.helpers.metrics import LLM_HEDGES, LLM_RETRIES, record_llm_call
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+
+def _to_input(messages: list[Message]) -> list[dict[str, str]]:
+    """Map stored messages onto Responses API input items."""
+    return [{"role": message.role if message.role != Role.GUARDRAILS else Role.USER, "content": message.content} for message in messages]
+
+
+def _delta(event: Any) -> str:
+    """Text of an output delta event, '' for any other event; raises on a stream error event."""
+    kind = getattr(event, "type", "")
+    if kind == "response.output_text.delta":
+        return getattr(event, "delta", "") or ""
+    if kind == "response.error":
+        err = getattr(event, "error", None)
+        message = getattr(err, "message", None) if err is not None else None
+        raise RuntimeError(message or "Model streaming error")
+    return ""
+
+
+class _ModelClient:
+    """Transport settings and the retry policy shared by both helpers (see `src/helpers/llm_transport.py`)."""
+
+    def __init__(self, settings: TransportSettings | None = None) -> None:
+        self.settings = settings or TransportSettings.from_env()
+        self.retry_budget = get_retry_budget()
+
+    def _retry_delay(self, exc: BaseException, attempt: int) -> float | None:
+        """Backoff before retrying a failed call, or None to give up."""
+        if attempt >= self.settings.max_retries or not is_retryable(exc):
+            return None
+        delay = backoff_delay(exc, attempt, self.settings.max_backoff)
+        if delay is None or not self.retry_budget.try_spend():
+            return None
+        LLM_RETRIES.labels(type(exc).__name__).inc()
+        return delay
+
 
-class OpenAIHelper:
-    def __init__(self) -> None:
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+class OpenAIHelper(_ModelClient):
+    def __init__(self, settings: TransportSettings | None = None) -> None:
+        super().__init__(settings)
+        # The SDK is imported here rather than at module level to keep worker boot fast.
+        from openai import DefaultHttpxClient, OpenAI
+
+        self.client: OpenAI = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL"),
+            http_client=DefaultHttpxClient(**self.settings.http_client_kwargs()),
+            timeout=self.settings.request_timeout_config(),
+            max_retries=0,
+        )
 
     def generate_response(self, messages: list[Message], model: str = "gpt-4o") -> str:
         """Generate an assistant message text from a list of prior messages.
 
         Returns the textual output produced by the model.
         """
-
-        response = self.client.responses.parse(
-            model=model,
-            input=[{"role": message.role if message.role != Role.GUARDRAILS else Role.USER, "content": message.content} for message in messages],
-        )
+        start = time.perf_counter()
+        self.retry_budget.record_request()
+        attempt = 0
+        while True:
+            try:
+                response = self.client.responses.parse(
+                    model=model,
+                    input=_to_input(messages),
+                )
+                break
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+        record_llm_call(model, "blocking", getattr(response, "usage", None), time.perf_counter() - start)
         return response.output_text
 
     def stream_response(self, messages: list[Message], model: str = "gpt-4o"):
         """Stream assistant output tokens as they are produced by the model.
 
         Yields small text deltas (strings). Caller is responsible for assembling
-        the final text if needed.
+        the final text if needed. The token timeouts are only enforced through
+        the httpx read timeout here, and there is no hedging.
         """
-        with self.client.responses.stream(
-            model=model,
-            input=[{"role": message.role if message.role != Role.GUARDRAILS else Role.USER, "content": message.content} for message in messages],
-        ) as stream:
-            for event in stream:
-                if getattr(event, "type", "") == "response.output_text.delta":
-                    delta = getattr(event, "delta", "")
+        start = time.perf_counter()
+        first_token = None
+        self.retry_budget.record_request()
+        attempt = 0
+        while True:
+            try:
+                with self.client.responses.stream(
+                    model=model,
+                    input=_to_input(messages),
+                    timeout=self.settings.stream_timeout_config(),
+                ) as stream:
+                    for event in stream:
+                        delta = _delta(event)
+                        if delta:
+                            if first_token is None:
+                                first_token = time.perf_counter() - start
+                            yield delta
+                    final = stream.get_final_response()
+                break
+            except Exception as exc:
+                # Output already sent to the caller cannot be taken back, so only retry before it.
+                delay = self._retry_delay(exc, attempt) if first_token is None else None
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+        record_llm_call(model, "stream", getattr(final, "usage", None), time.perf_counter() - start, first_token)
+
+
+@dataclass
+class _OpenedStream:
+    stream: Any
+    first_delta: str | None
+    # Time to `first_delta` from this request's own start.
+    ttft: float | None
+
+    async def aclose(self) -> None:
+        with anyio.CancelScope(shield=True):
+            await self.stream.close()
+
+
+class AsyncOpenAIHelper(_ModelClient):
+    """Event-loop friendly counterpart of `OpenAIHelper` built on `AsyncOpenAI`."""
+
+    def __init__(self, settings: TransportSettings | None = None) -> None:
+        super().__init__(settings)
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        self.client: AsyncOpenAI = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL"),
+            http_client=DefaultAsyncHttpxClient(**self.settings.http_client_kwargs()),
+            timeout=self.settings.request_timeout_config(),
+            max_retries=0,
+        )
+        self.ttft = TtftTracker()
+
+    async def agenerate_response(self, messages: list[Message], model: str = "gpt-4o") -> str:
+        """Generate an assistant message text from a list of prior messages.
+
+        Returns the textual output produced by the model.
+        """
+        start = time.perf_counter()
+        self.retry_budget.record_request()
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.responses.parse(
+                    model=model,
+                    input=_to_input(messages),
+                )
+                break
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+        record_llm_call(model, "blocking", getattr(response, "usage", None), time.perf_counter() - start)
+        return response.output_text
+
+    async def astream_response(self, messages: list[Message], model: str = "gpt-4o") -> AsyncIterator[str]:
+        """Stream assistant output tokens as they are produced by the model.
+
+        Async generator yielding small text deltas (strings). Caller is
+        responsible for assembling the final text if needed. Raises
+        `StreamTimeoutError` when the model stalls past the first-token or
+        inter-token timeout.
+        """
+        start = time.perf_counter()
+        opened = await self._aopen_stream(model, _to_input(messages))
+        first_token = None
+        try:
+            if opened.first_delta:
+                first_token = time.perf_counter() - start
+                yield opened.first_delta
+            while True:
+                try:
+                    async with asyncio.timeout(self.settings.inter_token_timeout):
+                        event = await opened.stream.__anext__()
+                except StopAsyncIteration:
+                    break
+                except TimeoutError:
+                    raise StreamTimeoutError(f"No model output for {self.settings.inter_token_timeout:.0f}s") from None
+                delta = _delta(event)
+                if delta:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    yield delta
+            final = await opened.stream.get_final_response()
+        finally:
+            await opened.aclose()
+        record_llm_call(model, "stream", getattr(final, "usage", None), time.perf_counter() - start, first_token)
+
+    async def _aopen_stream(self, model: str, input_items: list[dict[str, str]]) -> _OpenedStream:
+        """Open a stream up to its first delta, retrying within the budget."""
+        self.retry_budget.record_request()
+        attempt = 0
+        while True:
+            try:
+                if self._hedge_delay(model) is None:
+                    opened = await self._afirst_delta(model, input_items)
+                else:
+                    opened = await self._ahedged_first_delta(model, input_items)
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            if opened.ttft is not None:
+                self.ttft.observe(model, opened.ttft)
+            return opened
+
+    async def _afirst_delta(self, model: str, input_items: list[dict[str, str]]) -> _OpenedStream:
+        """Send one streamed request and read it up to its first text delta."""
+        started = time.perf_counter()
+        stream = None
+        try:
+            async with asyncio.timeout(self.settings.first_token_timeout):
+                stream = await self.client.responses.stream(
+                    model=model,
+                    input=input_items,
+                    timeout=self.settings.stream_timeout_config(),
+                ).__aenter__()
+                while True:
+                    try:
+                        event = await stream.__anext__()
+                    except StopAsyncIteration:
+                        return _OpenedStream(stream, None, None)
+                    delta = _delta(event)
                     if delta:
-                        yield delta
-                elif getattr(event, "type", "") == "response.error":
-                    err = getattr(event, "error", None)
-                    message = getattr(err, "message", None) if err is not None else None
-                    raise RuntimeError(message or "Model streaming error")
-            _ = stream.get_final_response()
+                        return _OpenedStream(stream, delta, time.perf_counter() - started)
+        except BaseException as exc:
+            if stream is not None:
+                await _OpenedStream(stream, None, None).aclose()
+            if isinstance(exc, TimeoutError):
+                raise StreamTimeoutError(f"No first token within {self.settings.first_token_timeout:.0f}s") from None
+            raise
+
+    async def _ahedged_first_delta(self, model: str, input_items: list[dict[str, str]]) -> _OpenedStream:
+        """Race a second request against a slow first token; keep the first to answer, close the other."""
+        primary = asyncio.create_task(self._afirst_delta(model, input_items))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self._hedge_delay(model))
+            if not done and self.retry_budget.try_spend():
+                LLM_HEDGES.labels("fired").inc()
+                pending.add(asyncio.create_task(self._afirst_delta(model, input_items)))
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                answered = [task for task in done if task.exception() is None]
+                if answered:
+                    for extra in answered[1:]:
+                        await extra.result().aclose()
+                    if answered[0] is not primary:
+                        LLM_HEDGES.labels("won").inc()
+                    return answered[0].result()
+                error = error or next(iter(done)).exception()
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            # The cancelled request closes its own stream; wait so it is gone before returning.
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def _hedge_delay(self, model: str) -> float | None:
+        """How long to wait for a first token before hedging, or None when hedging is off or still calibrating."""
+        if not self.settings.hedge:
+            return None
+        threshold = self.ttft.percentile(model, self.settings.hedge_percentile, self.settings.hedge_min_samples)
+        return None if threshold is None else max(self.settings.hedge_min_delay, threshold)
+
 
 @lru_cache
 def get_openai_helper() -> OpenAIHelper:
     return OpenAIHelper()
+
+
+@lru_cache
+def get_async_openai_helper() -> AsyncOpenAIHelper:
+    return AsyncOpenAIHelper()
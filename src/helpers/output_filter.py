@@ -0,0 +1,233 @@
+"""Incremental output guardrails for streamed model text.
+
+`StreamingOutputFilter` applies the same transformation as
+`GuardrailsHelper.validate_output`: it strips active content (script/style
+blocks and tags, then unescapes HTML entities) and redacts matches of the
+engine's `redact_output` rules. It works on a stream of deltas and never
+sees the whole answer at once.
+
+Each `feed` emits everything that can no longer change and holds back only
+the tail that could still be part of a match:
+
+- Tags, entities and `<script>`/`<style>` blocks: the tail from the
+  earliest unterminated `<` or `&`, or from an unclosed script/style
+  block. A `>` inside a closed script/style block does not terminate a
+  tag opened before it, as blocks are removed before tags.
+- Redaction rules: the trailing run of characters the rule's pattern can
+  consume, capped by its maximum match width. A rule that can only match
+  `[A-Za-z0-9-]` never holds back past a space.
+
+Every hold-back is capped at `max_holdback` characters (unclosed
+script/style blocks excepted). A secret or tag longer than that can be
+split.
+"""
+from __future__ import annotations
+
+import html
+import re
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from src.helpers.guardrails_engine import GuardrailRule, GuardrailsEngine
+
+try:  # Python 3.11+
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_constants  # type: ignore[no-redef]
+    import sre_parse  # type: ignore[no-redef]
+
+DEFAULT_MAX_HOLDBACK = 256
+# Longest HTML entity name html.unescape knows is 32 characters.
+_ENTITY_HOLDBACK = 34
+
+_SCRIPT_OPEN_RE = re.compile(r"<\s*(script|style)[^>]*>", re.I)
+_ENTITY_TAIL_RE = re.compile(r"&#?[A-Za-z0-9]*\Z")
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: r"\d",
+    sre_constants.CATEGORY_NOT_DIGIT: r"\D",
+    sre_constants.CATEGORY_SPACE: r"\s",
+    sre_constants.CATEGORY_NOT_SPACE: r"\S",
+    sre_constants.CATEGORY_WORD: r"\w",
+    sre_constants.CATEGORY_NOT_WORD: r"\W",
+}
+
+
+def strip_active_content(text: str) -> str:
+    without_scripts = re.sub(r"<\s*(script|style)[^>]*>.*?<\s*/\s*\1\s*>", " ", text, flags=re.I | re.S)
+    without_tags = re.sub(r"<[^>]+>", " ", without_scripts)
+    return html.unescape(without_tags)
+
+
+def _class_items(parsed: sre_parse.SubPattern) -> list[str] | None:
+    """Regex character-class items covering every character `parsed` can consume, or None for "any"."""
+    items: list[str] = []
+    for op, av in parsed:
+        if op is sre_constants.LITERAL:
+            items.append(re.escape(chr(av)))
+        elif op is sre_constants.IN:
+            for item_op, item_av in av:
+                if item_op is sre_constants.LITERAL:
+                    items.append(re.escape(chr(item_av)))
+                elif item_op is sre_constants.RANGE:
+                    items.append(f"{re.escape(chr(item_av[0]))}-{re.escape(chr(item_av[1]))}")
+                elif item_op is sre_constants.CATEGORY and item_av in _CATEGORIES:
+                    items.append(_CATEGORIES[item_av])
+                else:
+                    return None
+        elif op is sre_constants.SUBPATTERN:
+            nested = _class_items(av[-1])
+            if nested is None:
+                return None
+            items.extend(nested)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, "POSSESSIVE_REPEAT", None)):
+            nested = _class_items(av[2])
+            if nested is None:
+                return None
+            items.extend(nested)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                nested = _class_items(branch)
+                if nested is None:
+                    return None
+                items.extend(nested)
+        elif op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            continue  # zero-width
+        else:
+            return None
+    return items
+
+
+class _TailProbe:
+    """Trailing characters one rule (or rules sharing a character class) may still be matching."""
+
+    def __init__(self, run: re.Pattern[str] | None, width: int) -> None:
+        self.run = run
+        self.width = width
+
+    def holdback(self, reversed_tail: str) -> int:
+        if self.run is None:
+            return min(self.width, len(reversed_tail))
+        return min(self.width, self.run.match(reversed_tail).end())
+
+
+def _probes(rules: Iterable[GuardrailRule], max_holdback: int) -> list[_TailProbe]:
+    widths: dict[tuple[str | None, bool], int] = {}
+    for rule in rules:
+        parsed = sre_parse.parse(rule.pattern, re.IGNORECASE if rule.ignore_case else 0)
+        width = min(parsed.getwidth()[1], max_holdback)
+        items = _class_items(parsed)
+        key = ("".join(items) if items is not None else None, rule.ignore_case)
+        widths[key] = max(widths.get(key, 0), width)
+    return [
+        _TailProbe(re.compile(f"[{items}]*", re.IGNORECASE if ignore_case else 0) if items is not None else None, width)
+        for (items, ignore_case), width in widths.items()
+    ]
+
+
+class StreamingOutputFilter:
+    """Filter one streamed answer; create a new instance per response."""
+
+    def __init__(self, engine: GuardrailsEngine, max_holdback: int = DEFAULT_MAX_HOLDBACK) -> None:
+        self.engine = engine
+        self.max_holdback = max_holdback
+        self._probes = _probes(engine.output_rules, max_holdback)
+        self._raw = ""  # not yet stripped of active content
+        self._stripped = ""  # stripped, not yet redacted
+        self._context = ""  # last character already emitted, for `\b` at the start of `_stripped`
+
+    def feed(self, delta: str) -> str:
+        """Add a delta; return the filtered text that is now safe to emit (possibly "")."""
+        self._raw += delta
+        cut = self._active_content_cut(self._raw)
+        if cut:
+            self._stripped += strip_active_content(self._raw[:cut])
+            self._raw = self._raw[cut:]
+        return self._redact(final=False)
+
+    def flush(self) -> str:
+        """Emit everything still held back; call once at end of stream."""
+        self._stripped += strip_active_content(self._raw)
+        self._raw = ""
+        return self._redact(final=True)
+
+    def _active_content_cut(self, text: str) -> int:
+        cut = len(text)
+        # Closed script/style blocks are removed before tags, so a tag left open before
+        # a block can still be closed by a `>` after it: look for `>` outside blocks only.
+        outside: list[tuple[int, str]] = []
+        position = 0
+        opening = _SCRIPT_OPEN_RE.search(text)
+        while opening is not None:
+            closing = re.search(rf"<\s*/\s*{opening.group(1)}\s*>", text[opening.end():], re.I)
+            if closing is None:
+                cut = opening.start()
+                break
+            outside.append((position, text[position:opening.start()]))
+            position = opening.end() + closing.end()
+            opening = _SCRIPT_OPEN_RE.search(text, position)
+        outside.append((position, text[position:cut]))
+        tag = None
+        for offset, piece in outside:
+            closed = piece.rfind(">")
+            if closed != -1:
+                tag = None
+            if tag is None and (start := piece.find("<", closed + 1)) != -1:
+                tag = offset + start
+        if tag is not None and len(text) - tag <= self.max_holdback:
+            cut = min(cut, tag)
+        entity = _ENTITY_TAIL_RE.search(text, max(0, len(text) - _ENTITY_HOLDBACK))
+        if entity is not None:
+            cut = min(cut, entity.start())
+        return cut
+
+    def _redact(self, final: bool) -> str:
+        if not self._stripped:
+            return ""
+        text = self._context + self._stripped
+        start = len(self._context)
+        if final:
+            cut = len(text)
+        else:
+            reversed_tail = self._stripped[: -self.max_holdback - 1 : -1]
+            cut = len(text) - max((probe.holdback(reversed_tail) for probe in self._probes), default=0)
+        pieces: list[str] = []
+        position = start
+        for rule, match in self.engine.iter_matches(text, output=True, pos=start):
+            if match.start() >= cut:
+                break
+            if not final and match.end() == len(text) and len(text) - match.start() <= self.max_holdback:
+                # Touches the end of what has arrived, so it may still grow: hold it whole.
+                cut = match.start()
+                break
+            pieces.append(text[position:match.start()])
+            pieces.append(rule.replacement)
+            position = match.end()
+        cut = max(cut, position)
+        if cut <= start:
+            return ""
+        pieces.append(text[position:cut])
+        self._context = text[cut - 1]
+        self._stripped = text[cut:]
+        return "".join(pieces)
+
+
+def filter_stream(deltas: Iterable[str], output_filter: StreamingOutputFilter) -> Iterator[str]:
+    """Wrap a sync delta stream such as `OpenAIHelper.stream_response`."""
+    for delta in deltas:
+        chunk = output_filter.feed(delta)
+        if chunk:
+            yield chunk
+    chunk = output_filter.flush()
+    if chunk:
+        yield chunk
+
+
+async def afilter_stream(deltas: AsyncIterable[str], output_filter: StreamingOutputFilter) -> AsyncIterator[str]:
+    """Wrap an async delta stream such as `AsyncOpenAIHelper.astream_response`."""
+    async for delta in deltas:
+        chunk = output_filter.feed(delta)
+        if chunk:
+            yield chunk
+    chunk = output_filter.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable
+
+import bcrypt
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+
+def _lower_priority() -> None:
+    # Hashing competes with the event loop for the same cores; let the loop win.
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+
+def _hash_password(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _check_password(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+def hash_cost(hashed: str) -> int | None:
+    """Cost factor encoded in a bcrypt hash (`$2b$12$...` -> 12)."""
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def default_workers() -> int:
+    """Pool size per server worker: the cores shared among `WEB_CONCURRENCY` workers.
+
+    gunicorn.conf.py sets `WEB_CONCURRENCY` to gunicorn's worker count, so
+    `-w N` does not start N pools of every core.
+    """
+    servers = max(1, int(os.getenv("WEB_CONCURRENCY") or 1))
+    return max(1, (os.cpu_count() or 1) // servers)
+
+
+class PasswordHasher:
+    """bcrypt hashing off the request path, in a bounded process pool.
+
+    Each hash or check pins a CPU for the whole cost factor, so it runs in a
+    dedicated `ProcessPoolExecutor` instead of the event loop or the shared
+    anyio threadpool. At most `max_pending` jobs may be queued or running;
+    beyond that callers get an immediate 503 with `Retry-After` rather than
+    an unbounded queue.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int | None = None, max_pending: int | None = None) -> None:
+        self.rounds = rounds
+        self.workers = workers or default_workers()
+        self.max_pending = max_pending if max_pending is not None else self.workers * 4
+        self._pending = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs an event loop and threads is unsafe.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority,
+            )
+        return self._executor
+
+    async def ahash(self, password: str) -> str:
+        hashed = await self._run(_hash_password, password.encode("utf-8"), self.rounds)
+        return hashed.decode("utf-8")
+
+    async def averify(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """Check `password` against `hashed`.
+
+        Returns `(ok, new_hash)`; `new_hash` is set when the password matched
+        but was stored with a different cost factor and should be replaced.
+        The rehash is best effort: it is skipped while the pool is saturated
+        and never fails the check.
+        """
+        ok = await self._run(_check_password, password.encode("utf-8"), hashed.encode("utf-8"))
+        if not ok or hash_cost(hashed) == self.rounds:
+            return ok, None
+        if self._pending >= self.max_pending:
+            return True, None
+        try:
+            return True, await self.ahash(password)
+        except Exception:
+            logger.warning("password rehash failed; keeping the old hash", exc_info=True)
+            return True, None
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests",
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def awarm_up(self) -> None:
+        """Spawn every worker process now rather than on the first logins."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, os.getpid) for _ in range(self.workers)))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+@lru_cache
+def get_password_hasher() -> PasswordHasher:
+    workers = os.getenv("PASSWORD_HASH_WORKERS")
+    max_pending = os.getenv("PASSWORD_HASH_MAX_PENDING")
+    return PasswordHasher(
+        rounds=int(os.getenv("BCRYPT_ROUNDS", "12")),
+        workers=int(workers) if workers else None,
+        max_pending=int(max_pending) if max_pending else None,
+    )
@@ -2,13 +2,14 @@ from __future__ import annotations
 
 import os
 from functools import lru_cache
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-from pinecone import Pinecone
+from src.helpers.retriever import Hit, Retriever
 
 
-class PineconeHelper:
+class PineconeHelper(Retriever):
     def __init__(self) -> None:
+        super().__init__()
         api_key = os.getenv("PINECONE_API_KEY")
         host = os.getenv("PINECONE_HOST")
         namespace = os.getenv("PINECONE_NAMESPACE", "__default__")
@@ -16,27 +17,76 @@ class PineconeHelper:
             raise RuntimeError("Missing PINECONE_API_KEY environment variable")
         if not host:
             raise RuntimeError("Missing PINECONE_HOST environment variable")
-        self._namespace = namespace
+        self.namespace = namespace
+        # Pinecone has no corpus version to read. A static one comes from the
+        # environment; a version file can be rewritten after re-ingesting the
+        # index and is picked up by running workers.
+        self._version_file = os.getenv("PINECONE_INDEX_VERSION_FILE")
+        self.index_version = self._read_index_version() or os.getenv("PINECONE_INDEX_VERSION", "0")
+        self._host = host
+        # Imported lazily: the SDK is slow to import and unused with RETRIEVER_BACKEND=local.
+        from pinecone import Pinecone
+
         self._client = Pinecone(api_key=api_key)
         self._index = self._client.Index(host=host)
+        self._async_index: Any = None
+
+    def _read_index_version(self) -> str | None:
+        if not self._version_file:
+            return None
+        try:
+            with open(self._version_file, encoding="utf-8") as handle:
+                return handle.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _search(self, query_text: str, top_k: int) -> List[Hit]:
+        result: Dict[str, Any] = self._index.search(query=self._search_payload(query_text, top_k), namespace=self.namespace)  # type: ignore[no-any-return]
+        return self._extract_hits(result)
+
+    def _get_async_index(self) -> Any:
+        if self._async_index is None:
+            # The asyncio index owns an aiohttp session, so it is created lazily
+            # from inside the running loop rather than at construction time.
+            self._async_index = self._client.IndexAsyncio(host=self._host)
+        return self._async_index
+
+    async def awarm_up(self) -> None:
+        # A stats call opens the session's connection without spending an embedding on a query.
+        await self._get_async_index().describe_index_stats()
 
-    def query(self, query_text: str, top_k: int = 10) -> str:
-        """Query vector DB and return concatenated textual context snippets."""
-        query_payload: Dict[str, Any] = {
+    async def _asearch(self, query_text: str, top_k: int) -> List[Hit]:
+        result: Dict[str, Any] = await self._get_async_index().search(query=self._search_payload(query_text, top_k), namespace=self.namespace)  # type: ignore[no-any-return]
+        return self._extract_hits(result)
+
+    @staticmethod
+    def _search_payload(query_text: str, top_k: int) -> Dict[str, Any]:
+        return {
             "inputs": {"text": query_text},
             "top_k": top_k,
         }
-        result: Dict[str, Any] = self._index.search(query=query_payload, namespace=self._namespace)  # type: ignore[no-any-return]
-        docs = ""
-        for hit in result.get("result", {}).get("hits", []):
-            fields = hit.get("fields", {})
-            docs += (
-                f"Source: {hit.get('_id','unknown')}\n"
-                f"Category: {fields.get('category','unknown')}\n"
-                f"Text: {fields.get('text','')}\n\n"
-            )
-        return docs
+
+    @staticmethod
+    def _extract_hits(result: Dict[str, Any]) -> List[Hit]:
+        """Copy hits out of the SDK response into plain dicts that are safe to cache."""
+        return [
+            {"_id": hit.get("_id", "unknown"), "_score": hit.get("_score"), "fields": dict(hit.get("fields", {}))}
+            for hit in result.get("result", {}).get("hits", [])
+        ]
+
 
 @lru_cache
-def get_pinecone_helper() -> PineconeHelper:
-    return PineconeHelper()
\ No newline at end of file
+def get_pinecone_helper() -> Retriever:
+    """Return the configured retrieval backend.
+
+    `RETRIEVER_BACKEND=pinecone` (default) uses the hosted index;
+    `RETRIEVER_BACKEND=local` serves an index built by `python -m src.services.ingest`.
+    """
+    backend = os.getenv("RETRIEVER_BACKEND", "pinecone").lower()
+    if backend == "local":
+        from src.helpers.vector_store import LocalVectorStore
+
+        return LocalVectorStore(os.getenv("LOCAL_INDEX_PATH", "./vector_index"))
+    if backend != "pinecone":
+        raise RuntimeError(f"Unknown RETRIEVER_BACKEND: {backend}")
+    return PineconeHelper()
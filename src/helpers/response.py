@@ -1,16 +1,63 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta
 from typing import Any
 
 from fastapi import Response
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+_UTC_OFFSET = timedelta(0)
+# Exact types, not isinstance checks: this runs over every value of the payload.
+_RENDERED = frozenset((datetime, dict, list, tuple))
+
+
+def _iso_offsets(value: Any) -> Any:
+    """Pre-render UTC datetimes in plain containers with `isoformat()`.
+
+    pydantic-core writes a UTC offset as `Z`; the API has always sent
+    `+00:00` for datetimes outside models, as `jsonable_encoder` did. Only
+    the containers on the path to such a datetime are copied, and models
+    keep their own serialization.
+    """
+    kind = type(value)
+    if kind is datetime:
+        return value.isoformat() if value.utcoffset() == _UTC_OFFSET else value
+    if kind is dict:
+        copied = None
+        for key, item in value.items():
+            if type(item) in _RENDERED:
+                rendered = _iso_offsets(item)
+                if rendered is not item:
+                    if copied is None:
+                        copied = dict(value)
+                    copied[key] = rendered
+        return value if copied is None else copied
+    if kind is list or kind is tuple:
+        copied = None
+        for index, item in enumerate(value):
+            if type(item) in _RENDERED:
+                rendered = _iso_offsets(item)
+                if rendered is not item:
+                    if copied is None:
+                        copied = list(value)
+                    copied[index] = rendered
+        return value if copied is None else copied
+    return value
+
+
+def json_dumps(data: Any) -> bytes:
+    """Encode `data` as compact JSON in a single pass.
+
+    pydantic-core walks pydantic/SQLModel objects, datetimes, enums and
+    containers directly, so there is no `jsonable_encoder` copy of the
+    payload before encoding. Values it has no serializer for are written as
+    their `str()`, the way validation error contexts are rendered. The
+    output matches `jsonable_encoder`, UTC datetimes included.
+    """
+    return to_json(_iso_offsets(data), fallback=str)
+
 
 def api_response(data: Any, status_code: int = 200) -> Response:
-    return JSONResponse(
-        content={
-            "data": jsonable_encoder(data),
-            "status_code": status_code,
-        },
-        status_code=status_code,
-    )
\ No newline at end of file
+    # The `{"data", "status_code"}` envelope is spliced around the encoded payload.
+    body = b'{"data":' + json_dumps(data) + b',"status_code":' + str(status_code).encode() + b"}"
+    return Response(content=body, status_code=status_code, media_type="application/json")
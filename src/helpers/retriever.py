@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+from src.helpers.cache import TTLCache
+
+Hit = Dict[str, Any]
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query_text: str) -> str:
+    """Collapse whitespace and case so trivially different queries share cache entries."""
+    return _WHITESPACE_RE.sub(" ", query_text).strip().casefold()
+
+
+def _hits_size(hits: List[Hit]) -> int:
+    """Approximate memory footprint of cached hits, dominated by their text."""
+    return sum(64 + sum(len(str(value)) for value in hit.get("fields", {}).values()) for hit in hits)
+
+
+class Retriever(ABC):
+    """Base class for context retrieval backends.
+
+    Subclasses implement `_search` (and optionally `_asearch`) returning raw
+    hits shaped like Pinecone's: `{"_id", "_score", "fields": {"text", "category"}}`.
+    This class adds the shared retrieval cache and the prompt formatting.
+
+    Backends that can tell which corpus they serve implement
+    `_read_index_version`. It is checked at most every
+    `version_check_seconds` before a search, and a new version flushes the
+    cache, so a re-ingested index is picked up without a restart.
+    """
+
+    namespace: str = "__default__"
+    # Changes whenever the indexed corpus does, so caches keyed on it go stale on re-ingestion.
+    index_version: str = "0"
+
+    def __init__(self) -> None:
+        self._cache: TTLCache[List[Hit]] = TTLCache(
+            max_entries=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "300")),
+            max_bytes=int(os.getenv("RETRIEVAL_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            sizeof=_hits_size,
+        )
+        self.version_check_seconds = float(os.getenv("INDEX_VERSION_CHECK_SECONDS", "1"))
+        self._version_checked_at = time.monotonic()
+
+    @abstractmethod
+    def _search(self, query_text: str, top_k: int) -> List[Hit]:
+        """Run an uncached search against the backend."""
+
+    async def _asearch(self, query_text: str, top_k: int) -> List[Hit]:
+        """Async uncached search; backends without network I/O can rely on the default."""
+        return self._search(query_text, top_k)
+
+    def _read_index_version(self) -> str | None:
+        """Version of the corpus the backend serves now, or None when it cannot tell (the default)."""
+        return None
+
+    def _switch_index_version(self, version: str) -> None:
+        """Start serving a re-ingested index; subclasses reopen their files here."""
+        self.index_version = version
+        self.clear_cache()
+
+    def refresh(self, force: bool = False) -> bool:
+        """Flush the cache if the index was re-ingested; returns whether the version changed."""
+        now = time.monotonic()
+        if not force and now - self._version_checked_at < self.version_check_seconds:
+            return False
+        self._version_checked_at = now
+        version = self._read_index_version()
+        if version is None or version == self.index_version:
+            return False
+        self._switch_index_version(version)
+        return True
+
+    async def awarm_up(self) -> None:
+        """Open connections or page in index data before the first query (no-op by default)."""
+
+    def query(self, query_text: str, top_k: int = 10) -> str:
+        """Query vector DB and return concatenated textual context snippets."""
+        return self.format_hits(self.search(query_text, top_k))
+
+    async def aquery(self, query_text: str, top_k: int = 10) -> str:
+        """Async variant of `query` that awaits the search on the event loop."""
+        return self.format_hits(await self.asearch(query_text, top_k))
+
+    def search(self, query_text: str, top_k: int = 10) -> List[Hit]:
+        """Return the raw hits for `query_text`, served from the cache when warm."""
+        self.refresh()
+        key = self._cache_key(query_text, top_k)
+        hits = self._cache.get(key)
+        if hits is None:
+            hits = self._search(query_text, top_k)
+            self._cache.set(key, hits)
+        return hits
+
+    async def asearch(self, query_text: str, top_k: int = 10) -> List[Hit]:
+        """Async variant of `search`."""
+        self.refresh()
+        key = self._cache_key(query_text, top_k)
+        hits = self._cache.get(key)
+        if hits is None:
+            hits = await self._asearch(query_text, top_k)
+            self._cache.set(key, hits)
+        return hits
+
+    def clear_cache(self) -> None:
+        """Drop every cached retrieval, e.g. after the index has been re-ingested."""
+        self._cache.clear()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    def _cache_key(self, query_text: str, top_k: int) -> tuple[str, int, str, str]:
+        # Keyed on the index version like the answer cache, so a version change can never serve old hits.
+        return (normalize_query(query_text), top_k, self.namespace, self.index_version)
+
+    @staticmethod
+    def format_hits(hits: List[Hit]) -> str:
+        """Render hits as the context snippets block of `HUMAN_PROMPT`."""
+        docs = ""
+        for hit in hits:
+            fields = hit.get("fields", {})
+            docs += (
+                f"Source: {hit.get('_id','unknown')}\n"
+                f"Category: {fields.get('category','unknown')}\n"
+                f"Text: {fields.get('text','')}\n\n"
+            )
+        return docs
@@ -0,0 +1,142 @@
+"""Delta coalescing and frame encoding shared by the SSE and WebSocket streams.
+
+Model deltas are often only 1-3 characters. Writing one frame per delta
+means thousands of tiny writes per answer. `DeltaCoalescer` batches them:
+a chunk is flushed once it is `max_delay_ms` old or holds `max_bytes` of
+UTF-8, whichever comes first. The first chunk of a stream is flushed
+immediately so time-to-first-token is unchanged.
+
+Frames are built as bytes from pre-encoded constant parts. `SSEResponse`
+sends them and runs a cleanup callback however the response ends.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import suppress
+from functools import lru_cache
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from src.helpers.response import json_dumps
+
+_SSE_DELTA_PREFIX = b'data: {"delta": '
+_SSE_DELTA_SUFFIX = b"}\n\n"
+
+
+def sse_delta_frame(delta: str) -> bytes:
+    """`data: {"delta": ...}` SSE frame, without building a dict per delta."""
+    return _SSE_DELTA_PREFIX + json_dumps(delta) + _SSE_DELTA_SUFFIX
+
+
+def sse_event_frame(event: str, payload: Any) -> bytes:
+    """`event: ...` SSE frame; `payload` may hold pydantic models and datetimes."""
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + json_dumps(payload) + b"\n\n"
+
+
+class SSEResponse(StreamingResponse):
+    """`text/event-stream` response that awaits `on_close` once it is over, however it ends.
+
+    A body generator's `finally` only runs once the body has started; this
+    also covers a client that leaves, or a failed header write, before the
+    first frame. `on_close` may run after the generator already cleaned up,
+    so it must be idempotent.
+    """
+
+    def __init__(self, content: AsyncIterable[bytes], on_close: Callable[[], Awaitable[None]] | None = None, **kwargs: Any) -> None:
+        super().__init__(content, media_type="text/event-stream", **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.on_close is not None:
+                await self.on_close()
+
+
+class DeltaCoalescer:
+    def __init__(self, max_delay_ms: float = 30.0, max_bytes: int = 1024) -> None:
+        self.max_delay = max_delay_ms / 1000
+        self.max_bytes = max_bytes
+
+    async def coalesce(self, deltas: AsyncIterable[str]) -> AsyncIterator[str]:
+        """Re-chunk `deltas`; the concatenation of the output equals that of the input.
+
+        A pump task reads the source into a list and wakes the consumer on
+        a flush, so the per-delta cost is an append; timers and futures are
+        only created once per chunk.
+        """
+        if self.max_delay <= 0 and self.max_bytes <= 1:
+            async for delta in deltas:
+                yield delta
+            return
+        loop = asyncio.get_running_loop()
+        pending: list[str] = []
+        size = 0
+        ready = finished = False
+        error: BaseException | None = None
+        timer: asyncio.TimerHandle | None = None
+        wakeup: asyncio.Future[None] | None = None
+
+        def flush() -> None:
+            nonlocal ready, timer
+            ready = True
+            if timer is not None:
+                timer.cancel()
+                timer = None
+            if wakeup is not None and not wakeup.done():
+                wakeup.set_result(None)
+
+        async def pump() -> None:
+            nonlocal size, finished, error, timer
+            first = True
+            try:
+                async for delta in deltas:
+                    pending.append(delta)
+                    size += len(delta.encode("utf-8"))
+                    if first or size >= self.max_bytes:
+                        first = False
+                        flush()
+                    elif timer is None:
+                        timer = loop.call_later(self.max_delay, flush)
+            except Exception as exc:  # re-raised by the consumer after the text before it
+                error = exc
+            finally:
+                finished = True
+                flush()
+
+        reader = loop.create_task(pump())
+        try:
+            while True:
+                if not ready:
+                    wakeup = loop.create_future()
+                    await wakeup
+                ready = False
+                chunk = "".join(pending)
+                pending.clear()
+                size = 0
+                if chunk:
+                    yield chunk
+                if finished and not pending:
+                    break
+            if error is not None:
+                raise error
+        finally:
+            if not reader.done():
+                reader.cancel()
+                with suppress(asyncio.CancelledError):
+                    await reader
+                aclose = getattr(deltas, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+
+
+@lru_cache
+def get_delta_coalescer() -> DeltaCoalescer:
+    return DeltaCoalescer(
+        max_delay_ms=float(os.getenv("STREAM_COALESCE_MS", "30")),
+        max_bytes=int(os.getenv("STREAM_COALESCE_MAX_BYTES", "1024")),
+    )
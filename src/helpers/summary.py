@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from datetime import UTC, datetime
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from src.constants.prompts import SUMMARY_PROMPT, SUMMARY_UPDATE_PROMPT
+from src.constants.role import Role
+from src.helpers.history import TokenCounter, get_token_counter
+from src.sql_models.message import Message
+
+if TYPE_CHECKING:
+    from src.helpers.openai import AsyncOpenAIHelper
+
+
+def format_message(message: Message) -> str:
+    """One transcript line per message, as the summary prompts expect."""
+    text = message.user_message if message.role == Role.USER else message.content
+    return f"{message.role}: {text}"
+
+
+class ConversationSummarizer:
+    """Fold new messages into a conversation's stored rolling summary.
+
+    Only the messages after the last summarized one are sent, together with
+    the previous summary, so the cost of a summarize call tracks what changed
+    rather than the length of the conversation. A backlog larger than
+    `chunk_tokens` goes through map-reduce instead: each chunk is summarized
+    on its own (at most `map_concurrency` calls at a time) and the partial
+    summaries are then folded into the previous one, recursively if they
+    are themselves too large for one call.
+    """
+
+    def __init__(
+        self,
+        chunk_tokens: int = 6000,
+        map_concurrency: int = 4,
+        counter: TokenCounter | None = None,
+        model: str = "gpt-4o",
+    ) -> None:
+        self.chunk_tokens = chunk_tokens
+        self.map_concurrency = max(1, map_concurrency)
+        self.counter = counter or get_token_counter(model)
+        self.model = model
+
+    async def asummarize(self, previous: str | None, messages: list[Message], openai_helper: AsyncOpenAIHelper) -> str:
+        """Return a summary covering `previous` plus `messages` (oldest first)."""
+        lines = [self._clip(format_message(message)) for message in messages if message.role != Role.SYSTEM]
+        chunks = self._chunk(lines)
+        if len(chunks) > 1:
+            lines = await self._map(chunks, openai_helper)
+            while len(chunks := self._chunk(lines)) > 1:
+                lines = await self._map(chunks, openai_helper)
+        return await self._fold(previous, "\n\n".join(lines), openai_helper)
+
+    async def _fold(self, previous: str | None, context: str, openai_helper: AsyncOpenAIHelper) -> str:
+        if previous:
+            prompt = SUMMARY_UPDATE_PROMPT.format(SUMMARY=previous, CONTEXT=context)
+        else:
+            prompt = SUMMARY_PROMPT.format(CONTEXT=context)
+        return await self._complete(prompt, openai_helper)
+
+    async def _map(self, chunks: list[list[str]], openai_helper: AsyncOpenAIHelper) -> list[str]:
+        limiter = asyncio.Semaphore(self.map_concurrency)
+
+        async def summarize_chunk(chunk: list[str]) -> str:
+            async with limiter:
+                return await self._complete(SUMMARY_PROMPT.format(CONTEXT="\n\n".join(chunk)), openai_helper)
+
+        return list(await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks)))
+
+    async def _complete(self, prompt: str, openai_helper: AsyncOpenAIHelper) -> str:
+        message = Message(conversation_id=None, role=Role.SYSTEM, content=prompt, user_message=None, created_at=datetime.now(UTC))
+        return await openai_helper.agenerate_response([message], model=self.model)
+
+    def _chunk(self, lines: list[str]) -> list[list[str]]:
+        """Group consecutive lines into chunks of at most `chunk_tokens`."""
+        chunks: list[list[str]] = [[]]
+        used = 0
+        for line in lines:
+            cost = self.counter(line)
+            if chunks[-1] and used + cost > self.chunk_tokens:
+                chunks.append([])
+                used = 0
+            chunks[-1].append(line)
+            used += cost
+        return chunks
+
+    def _clip(self, line: str) -> str:
+        # A single oversized message would otherwise make a chunk that never fits.
+        max_chars = self.chunk_tokens * 4
+        return line if len(line) <= max_chars else line[:max_chars] + " …"
+
+
+@lru_cache
+def get_conversation_summarizer() -> ConversationSummarizer:
+    return ConversationSummarizer(
+        chunk_tokens=int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000")),
+        map_concurrency=int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4")),
+    )
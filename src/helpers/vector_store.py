@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from src.helpers.retriever import Hit, Retriever
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """Offline embedder using the hashing trick over word unigrams and bigrams.
+
+    Deterministic, dependency-free (beyond NumPy) and fast enough to embed
+    a query per turn in microseconds. Quality is lexical rather than
+    semantic, which suits FAQ-style corpora and offline test runs.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 1024) -> None:
+        self.dim = dim
+
+    def config(self) -> Dict[str, Any]:
+        return {"name": self.name, "dim": self.dim}
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                digest = zlib.crc32(feature.encode("utf-8"))
+                matrix[row, digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        # Sublinear term frequency, then L2 normalisation so dot product == cosine.
+        np.copysign(np.log1p(np.abs(matrix)), matrix, out=matrix)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    async def aembed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.embed(texts)
+
+
+class OpenAIEmbedder:
+    """Embedder backed by the OpenAI embeddings endpoint (needs network access)."""
+
+    name = "openai"
+
+    def __init__(self, model: str = "text-embedding-3-small") -> None:
+        self.model = model
+        self._client: Any = None
+        self._async_client: Any = None
+
+    def config(self) -> Dict[str, Any]:
+        return {"name": self.name, "model": self.model}
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        response = self._client.embeddings.create(model=self.model, input=list(texts))
+        return self._normalize([item.embedding for item in response.data])
+
+    async def aembed(self, texts: Sequence[str]) -> np.ndarray:
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+
+            self._async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        response = await self._async_client.embeddings.create(model=self.model, input=list(texts))
+        return self._normalize([item.embedding for item in response.data])
+
+    @staticmethod
+    def _normalize(vectors: List[List[float]]) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+def get_embedder(config: Dict[str, Any]) -> HashingEmbedder | OpenAIEmbedder:
+    """Instantiate the embedder described by an index's `meta.json`."""
+    if config.get("name") == OpenAIEmbedder.name:
+        return OpenAIEmbedder(model=config.get("model", "text-embedding-3-small"))
+    if config.get("name") == HashingEmbedder.name:
+        return HashingEmbedder(dim=int(config.get("dim", 1024)))
+    raise ValueError(f"Unknown embedder: {config.get('name')}")
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, iterations: int = 12, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means: returns (centroids, assignment per row)."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    assignment = np.zeros(len(vectors), dtype=np.int64)
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for cluster in range(nlist):
+            members = vectors[assignment == cluster]
+            if len(members) == 0:
+                centroids[cluster] = vectors[rng.integers(len(vectors))]
+                continue
+            centroid = members.sum(axis=0)
+            norm = np.linalg.norm(centroid)
+            centroids[cluster] = centroid / norm if norm else centroid
+    return centroids.astype(np.float32), assignment
+
+
+def build_index(
+    records: Iterable[Dict[str, Any]],
+    path: str | os.PathLike[str],
+    embedder: HashingEmbedder | OpenAIEmbedder,
+    *,
+    nlist: int = 0,
+    namespace: str = "__default__",
+    batch_size: int = 256,
+) -> Dict[str, Any]:
+    """Embed `records` and write a local index directory at `path`.
+
+    Each record needs `text` and optionally `id`/`_id` and `category`.
+    With `nlist > 0` the rows are clustered into an IVF layout and stored
+    grouped by list, so a probe reads contiguous slices of the matrix.
+    The index is written next to `path` and swapped in when complete.
+    Returns the index metadata.
+    """
+    ids: List[str] = []
+    texts: List[str] = []
+    categories: List[str] = []
+    for position, record in enumerate(records):
+        text = record.get("text") or record.get("fields", {}).get("text")
+        if not text:
+            continue
+        ids.append(str(record.get("id") or record.get("_id") or f"doc-{position}"))
+        texts.append(text)
+        categories.append(str(record.get("category") or record.get("fields", {}).get("category") or "unknown"))
+    if not texts:
+        raise ValueError("Corpus is empty")
+
+    vectors = np.concatenate([embedder.embed(texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)])
+
+    centroids = None
+    list_offsets = None
+    if nlist > 0:
+        nlist = min(nlist, len(texts))
+        centroids, assignment = _kmeans(vectors, nlist)
+        order = np.argsort(assignment, kind="stable")
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+        vectors = vectors[order]
+        ids = [ids[i] for i in order]
+        texts = [texts[i] for i in order]
+        categories = [categories[i] for i in order]
+
+    category_names = sorted(set(categories))
+    category_codes = {name: code for code, name in enumerate(category_names)}
+    encoded = [text.encode("utf-8") for text in texts]
+
+    target = Path(path)
+    staging = target.with_name(target.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    np.save(staging / "vectors.npy", vectors.astype(np.float32))
+    np.save(staging / "text_offsets.npy", np.concatenate([[0], np.cumsum([len(b) for b in encoded])]).astype(np.int64))
+    np.save(staging / "categories.npy", np.asarray([category_codes[c] for c in categories], dtype=np.uint16))
+    (staging / "texts.bin").write_bytes(b"".join(encoded))
+    (staging / "ids.json").write_text(json.dumps(ids))
+    if centroids is not None:
+        np.save(staging / "centroids.npy", centroids)
+        np.save(staging / "list_offsets.npy", list_offsets)
+    meta = {
+        "version": INDEX_FORMAT_VERSION,
+        "count": len(texts),
+        "dim": int(vectors.shape[1]),
+        "namespace": namespace,
+        "embedder": embedder.config(),
+        "categories": category_names,
+        "nlist": int(len(centroids)) if centroids is not None else 0,
+    }
+    (staging / "meta.json").write_text(json.dumps(meta, indent=2))
+
+    previous = target.with_name(target.name + ".old")
+    shutil.rmtree(previous, ignore_errors=True)
+    if target.exists():
+        target.rename(previous)
+    staging.rename(target)
+    shutil.rmtree(previous, ignore_errors=True)
+    return meta
+
+
+def _file_version(path: Path) -> str:
+    # The inode tells rebuilds apart even within one tick of a coarse mtime.
+    stat = path.stat()
+    return f"{stat.st_ino}-{stat.st_mtime_ns}"
+
+
+class LocalVectorStore(Retriever):
+    """In-process retriever over an index built by `build_index`.
+
+    The embedding matrix and document text are memory-mapped, so workers
+    share pages through the OS cache and start without reading the corpus.
+    Search is exact (brute force) unless the index was built with IVF lists,
+    in which case only the `nprobe` closest lists are scanned.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], nprobe: int | None = None) -> None:
+        super().__init__()
+        self.path = Path(path)
+        self.nprobe = nprobe if nprobe is not None else int(os.getenv("LOCAL_INDEX_NPROBE", "8"))
+        self.reload()
+
+    def reload(self) -> None:
+        """(Re)open the index files, e.g. after re-ingestion, and flush the cache.
+
+        Every file is opened before any attribute changes, so a reload that
+        fails part-way keeps serving the previous index.
+        """
+        meta_path = self.path / "meta.json"
+        if not meta_path.exists():
+            raise RuntimeError(f"No local vector index at {self.path}; build one with `python -m src.services.ingest`")
+        index_version = _file_version(meta_path)
+        meta = json.loads(meta_path.read_text())
+        if meta.get("version") != INDEX_FORMAT_VERSION:
+            raise RuntimeError(f"Unsupported local index version: {meta.get('version')}")
+        embedder = get_embedder(meta["embedder"])
+        vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        text_offsets = np.load(self.path / "text_offsets.npy")
+        texts = np.memmap(self.path / "texts.bin", dtype=np.uint8, mode="r")
+        category_codes = np.load(self.path / "categories.npy", mmap_mode="r")
+        ids: List[str] = json.loads((self.path / "ids.json").read_text())
+        centroids = list_offsets = None
+        if meta.get("nlist"):
+            centroids = np.load(self.path / "centroids.npy")
+            list_offsets = np.load(self.path / "list_offsets.npy")
+
+        self.namespace = meta.get("namespace", "__default__")
+        self.index_version = index_version
+        self._embedder = embedder
+        self._vectors = vectors
+        self._text_offsets = text_offsets
+        self._texts = texts
+        self._category_codes = category_codes
+        self._category_names: List[str] = meta["categories"]
+        self._ids = ids
+        self._centroids = centroids
+        self._list_offsets = list_offsets
+        self.clear_cache()
+
+    def _read_index_version(self) -> str | None:
+        try:
+            return _file_version(self.path / "meta.json")
+        except FileNotFoundError:  # mid-swap while `build_index` replaces the directory
+            return None
+
+    def _switch_index_version(self, version: str) -> None:
+        try:
+            self.reload()
+        except (OSError, RuntimeError, ValueError):
+            # Caught mid-rebuild; the old index keeps serving and the next check retries.
+            logger.warning("could not reload the local vector index at %s", self.path, exc_info=True)
+
+    def _search(self, query_text: str, top_k: int) -> List[Hit]:
+        return self._top_k(self._embedder.embed([query_text])[0], top_k)
+
+    async def _asearch(self, query_text: str, top_k: int) -> List[Hit]:
+        return self._top_k((await self._embedder.aembed([query_text]))[0], top_k)
+
+    async def awarm_up(self) -> None:
+        # One uncached search pages in the vectors (or centroids) and readies the embedder.
+        await self._asearch("warm up", 1)
+
+    def _top_k(self, query: np.ndarray, top_k: int) -> List[Hit]:
+        if self._centroids is None:
+            rows = None
+            scores = self._vectors @ query
+        else:
+            nprobe = min(self.nprobe, len(self._centroids))
+            probes = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+            ranges = [np.arange(self._list_offsets[p], self._list_offsets[p + 1]) for p in probes]
+            rows = np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+            if len(rows) == 0:
+                return []
+            scores = np.concatenate([self._vectors[self._list_offsets[p]:self._list_offsets[p + 1]] @ query for p in probes])
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [self._hit(int(rows[i]) if rows is not None else int(i), float(scores[i])) for i in best]
+
+    def _hit(self, row: int, score: float) -> Hit:
+        start, end = self._text_offsets[row], self._text_offsets[row + 1]
+        return {
+            "_id": self._ids[row],
+            "_score": score,
+            "fields": {
+                "text": self._texts[start:end].tobytes().decode("utf-8"),
+                "category": self._category_names[int(self._category_codes[row])],
+            },
+        }
+
+
+def suggest_nlist(count: int) -> int:
+    """Suggested IVF list count for a corpus of `count` rows (~sqrt(n))."""
+    return max(1, int(math.sqrt(count)))
@@ -0,0 +1,99 @@
+"""Optional start-up warm-up, enabled with `WARMUP_ON_STARTUP=1`.
+
+Builds the cached helpers and opens their connection pools in parallel
+before the worker takes traffic. The first requests then skip the SDK
+imports, schema migrations, TLS handshakes, token-encoding load and
+process-pool spawn. A failing or slow step is logged and skipped, so
+warm-up never keeps a worker from starting.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable
+
+import anyio
+from sqlalchemy import text
+
+from src.helpers.context import get_context_compressor
+from src.helpers.database import get_async_db_engine
+from src.helpers.guardrails import get_guardrails_helper
+from src.helpers.history import get_history_builder
+from src.helpers.openai import get_async_openai_helper
+from src.helpers.password import get_password_hasher
+from src.helpers.pinecone import get_pinecone_helper
+
+logger = logging.getLogger(__name__)
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("WARMUP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+
+async def _database() -> None:
+    # Migrations run on the sync engine, so engine creation goes to a thread.
+    engine = await anyio.to_thread.run_sync(get_async_db_engine)
+    count = int(os.getenv("WARMUP_DB_CONNECTIONS", "2"))
+    connections = await asyncio.gather(*(engine.connect().start() for _ in range(count)))
+    try:
+        await connections[0].execute(text("SELECT 1"))
+    finally:
+        await asyncio.gather(*(connection.close() for connection in connections))
+
+
+async def _openai() -> None:
+    helper = await anyio.to_thread.run_sync(get_async_openai_helper)
+    if os.getenv("OPENAI_API_KEY"):
+        # with_options shares the underlying httpx pool, so the warmed connection is reused.
+        await helper.client.with_options(timeout=10, max_retries=0).models.list()
+
+
+async def _retriever() -> None:
+    retriever = await anyio.to_thread.run_sync(get_pinecone_helper)
+    await retriever.awarm_up()
+
+
+async def _password_hasher() -> None:
+    await get_password_hasher().awarm_up()
+
+
+async def _in_thread(factory: Callable[[], object]) -> None:
+    await anyio.to_thread.run_sync(factory)
+
+
+STEPS: dict[str, Callable[[], Awaitable[None]]] = {
+    "database": _database,
+    "openai": _openai,
+    "retriever": _retriever,
+    "guardrails": lambda: _in_thread(get_guardrails_helper),
+    "history": lambda: _in_thread(get_history_builder),
+    "context": lambda: _in_thread(get_context_compressor),
+    "password_hasher": _password_hasher,
+}
+
+
+async def warm_up(timeout: float | None = None) -> dict[str, float | str]:
+    """Run every warm-up step concurrently; return seconds taken, or the error, per step."""
+    timeout = timeout if timeout is not None else float(os.getenv("WARMUP_TIMEOUT_SECONDS", "30"))
+    results: dict[str, float | str] = {}
+
+    async def run(name: str, step: Callable[[], Awaitable[None]]) -> None:
+        started = time.perf_counter()
+        try:
+            await step()
+        except Exception as exc:  # noqa: BLE001 - a failed warm-up must not stop the worker
+            logger.warning("warm-up step %s failed: %r", name, exc)
+            results[name] = repr(exc)
+            return
+        results[name] = round(time.perf_counter() - started, 3)
+
+    with anyio.move_on_after(timeout) as scope:
+        async with anyio.create_task_group() as tg:
+            for name, step in STEPS.items():
+                tg.start_soon(run, name, step)
+    if scope.cancelled_caught:
+        logger.warning("warm-up timed out after %.0fs; pending: %s", timeout, sorted(set(STEPS) - set(results)))
+    logger.info("warm-up finished: %s", results)
+    return results
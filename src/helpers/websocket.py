@@ -0,0 +1,187 @@
+"""Long-lived WebSocket sessions that carry many chat turns on one socket.
+
+Client to server, as JSON objects:
+
+- `{"message": "..."}` starts a turn. Only one turn runs at a time.
+- `{"type": "cancel"}` aborts the turn in flight.
+- `{"type": "ping"}` is answered with `{"event": "pong"}`.
+- `{"type": "pong"}` answers a server ping.
+
+Server to client: answer deltas as plain text frames, and everything
+else as JSON objects with an `event` key.
+
+The server sends `{"event": "ping"}` every `ping_interval` seconds. A peer
+that sends nothing for two intervals is dropped. A session with no new
+turn for `idle_timeout` seconds is closed. Outgoing frames go through a
+queue of `send_queue_size` frames, so a slow reader slows the turn down
+instead of growing memory. A reader that blocks the queue for
+`send_timeout` seconds is disconnected.
+
+On close, frames already queued (such as a final `done` or `error`) are
+sent before the close frame, for at most `close_timeout` seconds.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+import anyio
+import anyio.lowlevel
+from anyio.abc import TaskGroup
+from fastapi import WebSocket, WebSocketDisconnect
+
+from src.helpers.response import json_dumps
+
+logger = logging.getLogger(__name__)
+
+WS_PING_INTERVAL_SECONDS = float(os.getenv("WS_PING_INTERVAL_SECONDS", "20"))
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "300"))
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "30"))
+WS_CLOSE_TIMEOUT_SECONDS = float(os.getenv("WS_CLOSE_TIMEOUT_SECONDS", "2"))
+
+CLOSE_NORMAL = 1000
+CLOSE_GOING_AWAY = 1001
+CLOSE_POLICY_VIOLATION = 1008
+
+
+class WebSocketSession:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        *,
+        ping_interval: float = WS_PING_INTERVAL_SECONDS,
+        idle_timeout: float = WS_IDLE_TIMEOUT_SECONDS,
+        send_queue_size: int = WS_SEND_QUEUE_SIZE,
+        send_timeout: float = WS_SEND_TIMEOUT_SECONDS,
+        close_timeout: float = WS_CLOSE_TIMEOUT_SECONDS,
+    ) -> None:
+        self.websocket = websocket
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout
+        self.close_timeout = close_timeout
+        self._outbox, self._outbox_reader = anyio.create_memory_object_stream[str](send_queue_size)
+        self._sender_done = anyio.Event()
+        self._task_group: TaskGroup | None = None
+        self._turn: anyio.CancelScope | None = None
+        self._close_with: tuple[int, str] | None = None
+        self.last_seen = self.last_turn = time.monotonic()
+
+    async def send_text(self, text: str) -> None:
+        """Queue a frame; waits while the queue is full and drops the client after `send_timeout`."""
+        try:
+            with anyio.fail_after(self.send_timeout):
+                await self._outbox.send(text)
+        except TimeoutError:
+            self.close(CLOSE_POLICY_VIOLATION, "client is not reading")
+            await anyio.lowlevel.checkpoint()  # deliver the cancellation
+            raise
+
+    async def send_json(self, payload: Any) -> None:
+        await self.send_text(json_dumps(payload).decode("utf-8"))
+
+    def close(self, code: int = CLOSE_NORMAL, reason: str = "") -> None:
+        """End the session; the socket is closed with `code` once every task has stopped and the queue is drained."""
+        if self._close_with is None:
+            self._close_with = (code, reason)
+        if self._task_group is not None:
+            self._task_group.cancel_scope.cancel()
+
+    def cancel_turn(self) -> bool:
+        if self._turn is None:
+            return False
+        self._turn.cancel()
+        return True
+
+    async def run(self, on_turn: Callable[[str], Awaitable[None]]) -> None:
+        """Serve turns until the client disconnects or the session is closed."""
+        async with anyio.create_task_group() as outer:
+            outer.start_soon(self._sender)
+            async with anyio.create_task_group() as tg:
+                self._task_group = tg
+                tg.start_soon(self._heartbeat)
+                await self._receiver(on_turn)
+                tg.cancel_scope.cancel()
+            # Nothing is queued any more: let the sender flush what is left, then stop it.
+            self._outbox.close()
+            with anyio.move_on_after(self.close_timeout):
+                await self._sender_done.wait()
+            outer.cancel_scope.cancel()
+        if self._close_with is not None:
+            try:
+                await self.websocket.close(*self._close_with)
+            except Exception:  # noqa: BLE001 - the peer may already be gone
+                pass
+
+    async def _receiver(self, on_turn: Callable[[str], Awaitable[None]]) -> None:
+        while True:
+            try:
+                data = await self.websocket.receive_json()
+            except WebSocketDisconnect:
+                return
+            except (ValueError, KeyError):  # not JSON, or a binary frame
+                await self.send_json({"event": "error", "message": "Expected a JSON object"})
+                continue
+            self.last_seen = time.monotonic()
+            kind = data.get("type", "message") if isinstance(data, dict) else None
+            if kind == "ping":
+                await self.send_json({"event": "pong"})
+            elif kind == "pong":
+                continue
+            elif kind == "cancel":
+                if not self.cancel_turn():
+                    await self.send_json({"event": "error", "message": "No response in progress"})
+            elif kind == "message":
+                user_text = data.get("message", "")
+                if not isinstance(user_text, str) or not user_text.strip():
+                    await self.send_json({"event": "error", "message": "Missing 'message'"})
+                elif self._turn is not None:
+                    await self.send_json({"event": "error", "message": "A response is already in progress"})
+                else:
+                    self.last_turn = self.last_seen
+                    self._turn = anyio.CancelScope()
+                    self._task_group.start_soon(self._run_turn, self._turn, on_turn, user_text)
+            else:
+                await self.send_json({"event": "error", "message": f"Unknown message type {kind!r}"})
+
+    async def _run_turn(self, scope: anyio.CancelScope, on_turn: Callable[[str], Awaitable[None]], user_text: str) -> None:
+        try:
+            with scope:
+                await on_turn(user_text)
+        except Exception as exc:  # noqa: BLE001 - a failed turn must not end the session
+            logger.exception("websocket turn failed")
+            await self.send_json({"event": "error", "message": str(exc)})
+        finally:
+            self._turn = None
+            self.last_turn = time.monotonic()
+        if scope.cancel_called:
+            await self.send_json({"event": "cancelled"})
+
+    async def _sender(self) -> None:
+        try:
+            async with self._outbox_reader:
+                async for text in self._outbox_reader:
+                    try:
+                        await self.websocket.send_text(text)
+                    except Exception:  # noqa: BLE001 - disconnected mid-send
+                        if self._task_group is not None:
+                            self._task_group.cancel_scope.cancel()
+                        return
+        finally:
+            self._sender_done.set()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await anyio.sleep(self.ping_interval)
+            now = time.monotonic()
+            if now - self.last_seen > 2 * self.ping_interval and self._turn is None:
+                logger.info("closing unresponsive websocket")
+                self.close(CLOSE_GOING_AWAY, "ping timeout")
+                return
+            if now - self.last_turn > self.idle_timeout and self._turn is None:
+                self.close(CLOSE_NORMAL, "idle timeout")
+                return
+            await self.send_json({"event": "ping"})
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from datetime import datetime
+
 from pydantic import BaseModel, EmailStr
 
 
@@ -10,4 +12,11 @@ class LoginRequest(BaseModel):
 class RegisterRequest(BaseModel):
     email: EmailStr
     password: str
-    name: str
\ No newline at end of file
+    name: str
+
+class CurrentUser(BaseModel):
+    """Authenticated principal: the subset of `User` the routers need, without the password hash."""
+    id: int
+    email: str
+    name: str
+    created_at: datetime | None = None
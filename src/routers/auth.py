@@ -1,20 +1,20 @@
 from __future__ import annotations
 
-import bcrypt
 from fastapi import APIRouter, Depends
 
-from src.controllers.auth import add_user, get_user_by_email, create_user_token, get_current_user
+from src.controllers.auth import aadd_user, aget_current_user, aget_user_by_email, aupdate_user_password, create_user_token
+from src.helpers.password import PasswordHasher, get_password_hasher
 from src.helpers.response import api_response
 from src.models.auth import LoginRequest, RegisterRequest
 
 router = APIRouter(prefix="/auth")
 
 @router.post("/signup")
-def signup_route(payload: RegisterRequest):
+async def signup_route(payload: RegisterRequest, hasher: PasswordHasher = Depends(get_password_hasher)):
     """Create a new user"""
-    if get_user_by_email(payload.email) is not None:
+    if await aget_user_by_email(payload.email) is not None:
         return api_response({"message": "User already exists"}, 400)
-    db_user = add_user(payload.email, payload.name, payload.password)
+    db_user = await aadd_user(payload.email, payload.name, await hasher.ahash(payload.password))
     try:
         sanitized = db_user.model_dump(exclude={"password"})
     except Exception:
@@ -23,13 +23,16 @@ def signup_route(payload: RegisterRequest):
     return api_response({"message": "User created", "user": sanitized, "access_token": token, "token_type": "bearer"}, 201)
 
 @router.post("/login")
-def login_route(payload: LoginRequest):
+async def login_route(payload: LoginRequest, hasher: PasswordHasher = Depends(get_password_hasher)):
     """Login a user"""
-    db_user = get_user_by_email(payload.email)
+    db_user = await aget_user_by_email(payload.email)
     if db_user is None:
         return api_response({"message": "User not found"}, 404)
-    if not bcrypt.checkpw(payload.password.encode("utf-8"), db_user.password.encode("utf-8")):
+    valid, new_hash = await hasher.averify(payload.password, db_user.password)
+    if not valid:
         return api_response({"message": "Invalid password"}, 401)
+    if new_hash is not None:
+        await aupdate_user_password(db_user.id, new_hash)
     try:
         sanitized = db_user.model_dump(exclude={"password"})
     except Exception:
@@ -39,7 +42,7 @@ def login_route(payload: LoginRequest):
 
 
 @router.get("/me")
-def me_route(current_user = Depends(get_current_user)):
+async def me_route(current_user = Depends(aget_current_user)):
     try:
         sanitized = current_user.model_dump(exclude={"password"})
     except Exception:
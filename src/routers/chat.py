@@ -1,136 +1,256 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
-from fastapi.responses import StreamingResponse
-from fastapi.encoders import jsonable_encoder
-import json
-from sqlmodel import Session
-from datetime import datetime, UTC
-
-from src.constants.prompts import HUMAN_PROMPT, SYSTEM_PROMPT, SUMMARY_PROMPT
+import time
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.constants.prompts import EMPTY_SUMMARY, HUMAN_PROMPT, SYSTEM_PROMPT
 from src.constants.role import Role
-from src.controllers.auth import get_current_user, get_current_user_optional, get_user_by_id
+from src.controllers.auth import aget_current_user, aget_current_user_optional, aget_user_principal
 from src.helpers.jwt import decode_token
 from src.controllers.conversation import (
-    create_conversation,
-    create_message,
-    get_conversation_by_id,
-    get_conversation_messages,
-    get_conversations_by_user_id,
-    update_conversation,
+    aget_conversation_by_id,
+    aget_conversations_by_user_id,
+    aget_display_messages,
+    aget_last_messages,
+    aload_conversation,
+    aload_summary_backlog,
+    asave_summary,
+    asave_turn,
+    aupdate_conversation,
+    new_conversation,
+    new_message,
 )
-from src.helpers.database import get_db_session_dep
-from src.helpers.filter_message import filter_messages
-from src.helpers.openai import OpenAIHelper, get_openai_helper
-from src.helpers.pinecone import PineconeHelper, get_pinecone_helper
+from src.helpers.admission import AdmissionController, client_ip, get_admission_controller
+from src.helpers.answer_cache import AnswerCache, get_answer_cache
+from src.helpers.context import ContextCompressor, get_context_compressor
+from src.helpers.database import get_async_db_session_dep
+from src.helpers.filter_message import filter_messages, filter_rows
+from src.helpers.history import HistoryBuilder, get_history_builder
+from src.helpers.metrics import STREAMS_IN_FLIGHT, StageTimings
+from src.helpers.openai import AsyncOpenAIHelper, get_async_openai_helper
+from src.helpers.pinecone import get_pinecone_helper
+from src.helpers.retriever import Retriever
 from src.helpers.response import api_response       
+from src.helpers.summary import ConversationSummarizer, get_conversation_summarizer
+from src.helpers.streaming import DeltaCoalescer, SSEResponse, get_delta_coalescer, sse_delta_frame, sse_event_frame
+from src.helpers.websocket import CLOSE_POLICY_VIOLATION, WebSocketSession
 from src.models.chat import ChatRequest
 from src.helpers.guardrails import GuardrailsHelper, get_guardrails_helper
 from src.sql_models.message import Message
 
 router = APIRouter(prefix="/chat")
 
+def _timed(response: Response, timings: StageTimings) -> Response:
+    response.headers["Server-Timing"] = timings.server_timing()
+    return response
+
+async def _admitted_user(
+    http_request: Request,
+    admission: AdmissionController = Depends(get_admission_controller),
+    current_user = Depends(aget_current_user_optional),
+):
+    """The optional current user, once their rate bucket (or their IP's, when anonymous) admits the request."""
+    await admission.acheck_rate(current_user.id if current_user is not None else None, client_ip(http_request))
+    return current_user
+
+def _is_first_turn(messages: list[Message]) -> bool:
+    """True while the history holds nothing but the system prompt, so the answer only depends on the question and its context."""
+    return all(message.role == Role.SYSTEM for message in messages)
+
 @router.post("/create")
-def chat(
+async def chat(
     request: ChatRequest,
-    openai_helper: OpenAIHelper = Depends(get_openai_helper),
-    pinecone_helper: PineconeHelper = Depends(get_pinecone_helper),
+    openai_helper: AsyncOpenAIHelper = Depends(get_async_openai_helper),
+    pinecone_helper: Retriever = Depends(get_pinecone_helper),
     guardrails: GuardrailsHelper = Depends(get_guardrails_helper),
-    session: Session = Depends(get_db_session_dep),
-    current_user = Depends(get_current_user_optional),
+    history_builder: HistoryBuilder = Depends(get_history_builder),
+    answer_cache: AnswerCache = Depends(get_answer_cache),
+    context_compressor: ContextCompressor = Depends(get_context_compressor),
+    admission: AdmissionController = Depends(get_admission_controller),
+    current_user = Depends(_admitted_user),
 ):
-    conversation = get_conversation_by_id(request.conversation_id, session)
+    timings = StageTimings("create")
+    with timings.stage("db_read"):
+        conversation, history = await aload_conversation(request.conversation_id)
+    turn: list[Message] = []
     if conversation is None:
         user_id = current_user.id if current_user is not None else None
-        conversation = create_conversation(user_id, session)
-        messages: list[Message] = [create_message(conversation.id, Role.SYSTEM, SYSTEM_PROMPT, None, session)]
+        conversation = new_conversation(user_id)
+        turn.append(new_message(Role.SYSTEM, SYSTEM_PROMPT))
+        messages: list[Message] = list(turn)
     else:
         if conversation.user_id is not None:
             if current_user is None or conversation.user_id != current_user.id:
                 return api_response({"message": "Forbidden"}, 403)
-        messages: list[Message] = get_conversation_messages(conversation.id, session)
+        messages: list[Message] = history
         
     if conversation.is_deleted:
         return api_response({"message": "Conversation is deleted"}, 400)
     
-    is_safe_prompt, sanitized_user_text = guardrails.sanitize_user_text(request.message)
+    with timings.stage("guardrails"):
+        is_safe_prompt, sanitized_user_text = guardrails.sanitize_user_text(request.message)
     if not is_safe_prompt:
-        user_message = create_message(conversation.id, Role.GUARDRAILS, sanitized_user_text, request.message, session)
+        user_message = new_message(Role.GUARDRAILS, sanitized_user_text, request.message)
         messages.append(user_message)
-        return api_response({"messages": filter_messages(messages), "conversation_id": conversation.id})
+        with timings.stage("db_write"):
+            await asave_turn(conversation, turn + [user_message])
+        return _timed(api_response({"messages": filter_messages(messages), "conversation_id": conversation.id}), timings)
 
-    docs = pinecone_helper.query(sanitized_user_text, top_k=10)
-    user_message = create_message(conversation.id, Role.USER, HUMAN_PROMPT.format(USER_QUERY=sanitized_user_text, CONTEXT_SNIPPETS=docs), sanitized_user_text, session)
+    with timings.stage("retrieval"):
+        hits = await pinecone_helper.asearch(sanitized_user_text, top_k=context_compressor.top_k)
+        context = await context_compressor.acompress(sanitized_user_text, hits)
+        lookup = None
+        if answer_cache.enabled and _is_first_turn(messages):
+            lookup = await answer_cache.alookup(sanitized_user_text, [hit["_id"] for hit in context.hits], pinecone_helper.index_version)
+    docs = context.render()
+    user_message = new_message(Role.USER, HUMAN_PROMPT.format(USER_QUERY=sanitized_user_text, CONTEXT_SNIPPETS=docs), sanitized_user_text)
     messages.append(user_message)
 
-    response_text = openai_helper.generate_response(messages)
-    create_message(conversation.id, Role.ASSISTANT, response_text, None, session)
-    
-    history = get_conversation_messages(conversation.id, session)
-    return api_response({"messages": filter_messages(history), "conversation_id": conversation.id})
+    if lookup is not None and lookup.answer is not None:
+        answer = lookup.answer
+    else:
+        with timings.stage("admission"):
+            slot = await admission.aacquire(current_user is not None)
+        async with slot:
+            with timings.stage("llm"):
+                response_text = await openai_helper.agenerate_response(history_builder.build(messages))
+        answer = guardrails.validate_output(response_text).answer
+        if lookup is not None:
+            answer_cache.store(lookup, answer)
+    assistant_message = new_message(Role.ASSISTANT, answer)
+    messages.append(assistant_message)
+    with timings.stage("db_write"):
+        await asave_turn(conversation, turn + [user_message, assistant_message])
+
+    return _timed(api_response({"messages": filter_messages(messages), "conversation_id": conversation.id}), timings)
 
 @router.post("/stream")
-def chat_stream(
+async def chat_stream(
     request: ChatRequest,
-    openai_helper: OpenAIHelper = Depends(get_openai_helper),
-    pinecone_helper: PineconeHelper = Depends(get_pinecone_helper),
+    openai_helper: AsyncOpenAIHelper = Depends(get_async_openai_helper),
+    pinecone_helper: Retriever = Depends(get_pinecone_helper),
     guardrails: GuardrailsHelper = Depends(get_guardrails_helper),
-    session: Session = Depends(get_db_session_dep),
-    current_user = Depends(get_current_user_optional),
+    history_builder: HistoryBuilder = Depends(get_history_builder),
+    coalescer: DeltaCoalescer = Depends(get_delta_coalescer),
+    answer_cache: AnswerCache = Depends(get_answer_cache),
+    context_compressor: ContextCompressor = Depends(get_context_compressor),
+    admission: AdmissionController = Depends(get_admission_controller),
+    current_user = Depends(_admitted_user),
 ):
-    """Stream the assistant response over HTTP as server-sent events (SSE)."""
-    conversation = get_conversation_by_id(request.conversation_id, session)
+    """Stream the assistant response over HTTP as server-sent events (SSE).
+
+    The `Server-Timing` header covers the stages before the first frame;
+    generation and the final write are only recorded in the metrics.
+    """
+    timings = StageTimings("stream")
+    with timings.stage("db_read"):
+        conversation, history = await aload_conversation(request.conversation_id)
+    turn: list[Message] = []
     if conversation is None:
         user_id = current_user.id if current_user is not None else None
-        conversation = create_conversation(user_id, session)
-        messages: list[Message] = [create_message(conversation.id, Role.SYSTEM, SYSTEM_PROMPT, None, session)]
+        conversation = new_conversation(user_id)
+        turn.append(new_message(Role.SYSTEM, SYSTEM_PROMPT))
+        messages: list[Message] = list(turn)
     else:
         if conversation.user_id is not None:
             if current_user is None or conversation.user_id != current_user.id:
                 return api_response({"message": "Forbidden"}, 403)
-        messages = get_conversation_messages(conversation.id, session)
+        messages = history
 
     if conversation.is_deleted:
         return api_response({"message": "Conversation is deleted"}, 400)
 
-    is_safe_prompt, sanitized_user_text = guardrails.sanitize_user_text(request.message)
+    with timings.stage("guardrails"):
+        is_safe_prompt, sanitized_user_text = guardrails.sanitize_user_text(request.message)
     if not is_safe_prompt:
-        user_message = create_message(conversation.id, Role.GUARDRAILS, sanitized_user_text, request.message, session)
+        user_message = new_message(Role.GUARDRAILS, sanitized_user_text, request.message)
         messages.append(user_message)
-        return api_response({"messages": filter_messages(messages), "conversation_id": conversation.id})
+        with timings.stage("db_write"):
+            await asave_turn(conversation, turn + [user_message])
+        return _timed(api_response({"messages": filter_messages(messages), "conversation_id": conversation.id}), timings)
 
-    docs = pinecone_helper.query(sanitized_user_text, top_k=10)
-    user_message = create_message(conversation.id, Role.USER, HUMAN_PROMPT.format(USER_QUERY=sanitized_user_text, CONTEXT_SNIPPETS=docs), sanitized_user_text, session)
+    with timings.stage("retrieval"):
+        hits = await pinecone_helper.asearch(sanitized_user_text, top_k=context_compressor.top_k)
+        context = await context_compressor.acompress(sanitized_user_text, hits)
+        lookup = None
+        if answer_cache.enabled and _is_first_turn(messages):
+            lookup = await answer_cache.alookup(sanitized_user_text, [hit["_id"] for hit in context.hits], pinecone_helper.index_version)
+    docs = context.render()
+    user_message = new_message(Role.USER, HUMAN_PROMPT.format(USER_QUERY=sanitized_user_text, CONTEXT_SNIPPETS=docs), sanitized_user_text)
     messages.append(user_message)
+    turn.append(user_message)
 
-    def sse_generator():
-        buffer = ""
-        try:
-            for delta in openai_helper.stream_response(messages):
-                buffer += delta
-                yield f"data: {json.dumps({'delta': delta})}\n\n"
-        except Exception as e:
-            if buffer.strip():
-                create_message(conversation.id, Role.ASSISTANT, buffer, None, session)
-            yield f"event: error\n" f"data: {json.dumps({'message': str(e)})}\n\n"
-            return
-        create_message(conversation.id, Role.ASSISTANT, buffer, None, session)
-        history_local = get_conversation_messages(conversation.id, session)
-        payload = {"conversation_id": conversation.id, "messages": filter_messages(history_local)}
-        yield f"event: done\n" f"data: {json.dumps(jsonable_encoder(payload))}\n\n"
+    replay = lookup is not None and lookup.answer is not None
+    slot = None
+    if not replay:
+        # Taken before the response starts so a full queue is a plain 429, not an error event.
+        with timings.stage("admission"):
+            slot = await admission.aacquire(current_user is not None)
+
+    async def sse_generator():
+        with STREAMS_IN_FLIGHT.labels("sse").track_inprogress():
+            parts: list[str] = []
+            try:
+                if replay:
+                    deltas = answer_cache.replay(lookup.answer)
+                else:
+                    deltas = guardrails.afilter_stream(openai_helper.astream_response(history_builder.build(messages)))
+                with timings.stage("cache_replay" if replay else "llm"):
+                    async for chunk in coalescer.coalesce(deltas):
+                        parts.append(chunk)
+                        yield sse_delta_frame(chunk)
+            except Exception as e:
+                text = "".join(parts)
+                if text.strip():
+                    turn.append(new_message(Role.ASSISTANT, text))
+                await asave_turn(conversation, turn)
+                yield sse_event_frame("error", {"message": str(e)})
+                return
+            except BaseException:
+                # The client went away mid-stream; keep what was generated, shielded
+                # from the cancellation that is tearing the response down.
+                text = "".join(parts)
+                if text.strip():
+                    turn.append(new_message(Role.ASSISTANT, text))
+                with anyio.CancelScope(shield=True):
+                    await asave_turn(conversation, turn)
+                raise
+            finally:
+                if slot is not None:
+                    await slot.arelease()
+            assistant_message = new_message(Role.ASSISTANT, "".join(parts))
+            if lookup is not None and lookup.answer is None:
+                answer_cache.store(lookup, assistant_message.content)
+            with timings.stage("db_write"):
+                await asave_turn(conversation, turn + [assistant_message])
+            payload = {"conversation_id": conversation.id, "messages": filter_messages(messages + [assistant_message])}
+            yield sse_event_frame("done", payload)
 
-    return StreamingResponse(sse_generator(), media_type="text/event-stream")
+    # The generator releases the slot as soon as the model is done; `on_close` covers a
+    # response that ends before the generator ever starts.
+    return SSEResponse(sse_generator(), on_close=slot.arelease if slot is not None else None, headers={"Server-Timing": timings.server_timing()})
 
 @router.websocket("/ws/{conversation_id}")
 async def chat_websocket(
     websocket: WebSocket,
     conversation_id: int,
-    openai_helper: OpenAIHelper = Depends(get_openai_helper),
-    pinecone_helper: PineconeHelper = Depends(get_pinecone_helper),
+    openai_helper: AsyncOpenAIHelper = Depends(get_async_openai_helper),
+    pinecone_helper: Retriever = Depends(get_pinecone_helper),
     guardrails: GuardrailsHelper = Depends(get_guardrails_helper),
-    session: Session = Depends(get_db_session_dep),
+    history_builder: HistoryBuilder = Depends(get_history_builder),
+    coalescer: DeltaCoalescer = Depends(get_delta_coalescer),
+    answer_cache: AnswerCache = Depends(get_answer_cache),
+    context_compressor: ContextCompressor = Depends(get_context_compressor),
+    admission: AdmissionController = Depends(get_admission_controller),
 ):
-    """WebSocket endpoint that streams assistant tokens to the client.
+    """Multi-turn chat over one WebSocket; the protocol is described in `src/helpers/websocket.py`.
+
+    The token, user and conversation history are resolved once and reused
+    by every turn on the socket.
     """
     await websocket.accept()
     try:
@@ -142,79 +262,127 @@ async def chat_websocket(
         elif token_qs:
             token = token_qs
         current_user = None
+        token_expires_at = None
         if token:
-            payload = decode_token(token)
+            try:
+                payload = decode_token(token)
+            except HTTPException as exc:
+                await websocket.send_json({"event": "error", "message": exc.detail})
+                await websocket.close(CLOSE_POLICY_VIOLATION)
+                return
             if payload and payload.get("user_id"):
-                current_user = get_user_by_id(int(payload["user_id"]))
-
-        data = await websocket.receive_json()
-        user_text = data.get("message", "")
-        if not isinstance(user_text, str) or not user_text.strip():
-            await websocket.send_json({"event": "error", "message": "Missing 'message'"})
-            await websocket.close()
-            return
+                current_user = await aget_user_principal(int(payload["user_id"]))
+                token_expires_at = payload.get("exp")
 
-        conversation = get_conversation_by_id(conversation_id, session)
+        # One timer per socket: the history is read once and every turn's stages are added to it.
+        timings = StageTimings("ws")
+        with timings.stage("db_read"):
+            conversation, messages = await aload_conversation(conversation_id)
+        unsaved: list[Message] = []
         if conversation is None:
             user_id = current_user.id if current_user is not None else None
-            conversation = create_conversation(user_id, session)
-            messages: list[Message] = [create_message(conversation.id, Role.SYSTEM, SYSTEM_PROMPT, None, session)]
-        else:
-            if conversation.user_id is not None:
-                if current_user is None or conversation.user_id != current_user.id:
-                    await websocket.send_json({"event": "error", "message": "Forbidden"})
-                    await websocket.close()
-                    return
-            messages = get_conversation_messages(conversation.id, session)
-
+            conversation = new_conversation(user_id)
+            unsaved.append(new_message(Role.SYSTEM, SYSTEM_PROMPT))
+            messages = list(unsaved)
+        elif conversation.user_id is not None and (current_user is None or conversation.user_id != current_user.id):
+            await websocket.send_json({"event": "error", "message": "Forbidden"})
+            await websocket.close(CLOSE_POLICY_VIOLATION)
+            return
         if conversation.is_deleted:
             await websocket.send_json({"event": "error", "message": "Conversation is deleted"})
             await websocket.close()
             return
+    except WebSocketDisconnect:
+        return
+
+    session = WebSocketSession(websocket)
+
+    async def save(rows: list[Message]) -> None:
+        """Persist `rows` (plus the system prompt of a new conversation) and add them to the cached history."""
+        await asave_turn(conversation, unsaved + rows)
+        unsaved.clear()
+        messages.extend(rows)
 
-        is_safe_prompt, sanitized_user_text = guardrails.sanitize_user_text(user_text)
+    async def run_turn(user_text: str) -> None:
+        if isinstance(token_expires_at, (int, float)) and time.time() >= token_expires_at:
+            await session.send_json({"event": "error", "message": "Token expired"})
+            session.close(CLOSE_POLICY_VIOLATION, "token expired")
+            return
+        try:
+            await admission.acheck_rate(current_user.id if current_user is not None else None, client_ip(websocket))
+        except HTTPException as exc:
+            await session.send_json({"event": "error", "message": exc.detail, "retry_after": int(exc.headers["Retry-After"])})
+            return
+
+        with timings.stage("guardrails"):
+            is_safe_prompt, sanitized_user_text = guardrails.sanitize_user_text(user_text)
         if not is_safe_prompt:
-            user_message = create_message(conversation.id, Role.GUARDRAILS, sanitized_user_text, user_text, session)
-            messages.append(user_message)
-            await websocket.send_json({"event": "guardrails", "messages": filter_messages(messages), "conversation_id": conversation.id})
-            await websocket.close()
+            with timings.stage("db_write"):
+                await save([new_message(Role.GUARDRAILS, sanitized_user_text, user_text)])
+            await session.send_json({"event": "guardrails", "messages": filter_messages(messages), "conversation_id": conversation.id})
             return
 
-        docs = pinecone_helper.query(sanitized_user_text, top_k=10)
-        user_message = create_message(conversation.id, Role.USER, HUMAN_PROMPT.format(USER_QUERY=sanitized_user_text, CONTEXT_SNIPPETS=docs), sanitized_user_text, session)
-        messages.append(user_message)
+        with timings.stage("retrieval"):
+            hits = await pinecone_helper.asearch(sanitized_user_text, top_k=context_compressor.top_k)
+            context = await context_compressor.acompress(sanitized_user_text, hits)
+            lookup = None
+            if answer_cache.enabled and _is_first_turn(messages):
+                lookup = await answer_cache.alookup(sanitized_user_text, [hit["_id"] for hit in context.hits], pinecone_helper.index_version)
+        docs = context.render()
+        user_message = new_message(Role.USER, HUMAN_PROMPT.format(USER_QUERY=sanitized_user_text, CONTEXT_SNIPPETS=docs), sanitized_user_text)
 
-        buffer = ""
+        replay = lookup is not None and lookup.answer is not None
+        slot = None
+        if not replay:
+            try:
+                with timings.stage("admission"):
+                    slot = await admission.aacquire(current_user is not None)
+            except HTTPException as exc:
+                await session.send_json({"event": "error", "message": exc.detail, "retry_after": int(exc.headers["Retry-After"])})
+                return
+
+        parts: list[str] = []
         try:
-            for delta in openai_helper.stream_response(messages):
-                buffer += delta
-                await websocket.send_text(delta)
-        except WebSocketDisconnect:
-            if buffer.strip():
-                create_message(conversation.id, Role.ASSISTANT, buffer, None, session)
-            return
+            if replay:
+                deltas = answer_cache.replay(lookup.answer)
+            else:
+                deltas = guardrails.afilter_stream(openai_helper.astream_response(history_builder.build(messages + [user_message])))
+            with STREAMS_IN_FLIGHT.labels("ws").track_inprogress(), timings.stage("cache_replay" if replay else "llm"):
+                async for chunk in coalescer.coalesce(deltas):
+                    parts.append(chunk)
+                    await session.send_text(chunk)
         except Exception as e:
-            if buffer.strip():
-                create_message(conversation.id, Role.ASSISTANT, buffer, None, session)
-            await websocket.send_json({"event": "error", "message": str(e)})
-            await websocket.close()
+            text = "".join(parts)
+            await save([user_message, new_message(Role.ASSISTANT, text)] if text.strip() else [user_message])
+            await session.send_json({"event": "error", "message": str(e)})
             return
+        except BaseException:
+            # Cancelled by the client or the socket closed; keep what was generated.
+            text = "".join(parts)
+            with anyio.CancelScope(shield=True):
+                await save([user_message, new_message(Role.ASSISTANT, text)] if text.strip() else [user_message])
+            raise
+        finally:
+            if slot is not None:
+                await slot.arelease()
 
-        create_message(conversation.id, Role.ASSISTANT, buffer, None, session)
-        history = get_conversation_messages(conversation.id, session)
-        await websocket.send_json(jsonable_encoder({"event": "done", "conversation_id": conversation.id, "messages": filter_messages(history)}))
-        await websocket.close()
-    except WebSocketDisconnect:
-        return
+        assistant_message = new_message(Role.ASSISTANT, "".join(parts))
+        if lookup is not None and lookup.answer is None:
+            answer_cache.store(lookup, assistant_message.content)
+        with timings.stage("db_write"):
+            await save([user_message, assistant_message])
+        await session.send_json({"event": "done", "conversation_id": conversation.id, "messages": filter_messages(messages)})
+
+    await session.run(run_turn)
 
 @router.post("/delete/{conversation_id}")
-def delete_conversation(
+async def delete_conversation(
     conversation_id: int,
-    session: Session = Depends(get_db_session_dep),
-    current_user = Depends(get_current_user_optional),
+    session: AsyncSession = Depends(get_async_db_session_dep),
+    current_user = Depends(aget_current_user_optional),
 ):
     """Delete a conversation"""
-    conversation = get_conversation_by_id(conversation_id, session)
+    conversation = await aget_conversation_by_id(conversation_id, session)
     if conversation is None:
         return api_response({"message": "Conversation not found"}, 404)
     if current_user is not None and conversation.user_id != current_user.id:
@@ -223,17 +391,42 @@ def delete_conversation(
         return api_response({"message": "Conversation already deleted"}, 400)
     
     conversation.is_deleted = True
-    update_conversation(conversation, session)
+    await aupdate_conversation(conversation, session)
     return api_response({"message": "Conversation deleted"})
 
+def _page_info(rows: list, limit: int, oldest_first: bool, forward: bool) -> tuple[list, dict]:
+    """Trim a `limit + 1` keyset read to `limit` rows and describe the cursors.
+
+    The extra row lies past the page in the direction of travel: newer when
+    reading `forward` from an `after` cursor, older otherwise. `before` and
+    `after` in the result are the ids to pass for the older/newer page.
+    """
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[1:] if oldest_first != forward else rows[:limit]
+    ids = [row.id for row in (rows if oldest_first else reversed(rows))]
+    return rows, {
+        "limit": limit,
+        "has_more": has_more,
+        "before": ids[0] if ids else None,
+        "after": ids[-1] if ids else None,
+    }
+
 @router.get("/messages/{conversation_id}")
-def get_conversation_messages_by_id(
+async def get_conversation_messages_by_id(
     conversation_id: int,
-    session: Session = Depends(get_db_session_dep),
-    current_user = Depends(get_current_user_optional),
+    limit: int = Query(100, ge=1, le=500),
+    before: int | None = None,
+    after: int | None = None,
+    session: AsyncSession = Depends(get_async_db_session_dep),
+    current_user = Depends(aget_current_user_optional),
 ):
-    """Get the chat history for a session"""
-    conversation = get_conversation_by_id(conversation_id, session)
+    """Get the chat history for a session, one page at a time.
+
+    Without cursors this is the newest `limit` messages. Pass `before` to
+    page back through older messages, or `after` to fetch newer ones.
+    """
+    conversation = await aget_conversation_by_id(conversation_id, session)
     if conversation is None:
         return api_response({"message": "Conversation not found"}, 404)
     if current_user is not None and conversation.user_id != current_user.id:
@@ -241,38 +434,65 @@ def get_conversation_messages_by_id(
     if conversation.is_deleted:
         return api_response({"message": "Conversation already deleted"}, 400)
 
-    history = get_conversation_messages(conversation_id, session)
-    return api_response({"messages": filter_messages(history), "conversation_id": conversation_id})
+    rows = await aget_display_messages(conversation_id, session, limit=limit + 1, before=before, after=after)
+    rows, page = _page_info(rows, limit, oldest_first=True, forward=after is not None)
+    return api_response({"messages": filter_rows(rows), "conversation_id": conversation_id, "page": page})
 
 @router.get("/conversations")
-def get_user_conversations(
-    session: Session = Depends(get_db_session_dep),
-    current_user = Depends(get_current_user),
+async def get_user_conversations(
+    limit: int = Query(50, ge=1, le=200),
+    before: int | None = None,
+    after: int | None = None,
+    session: AsyncSession = Depends(get_async_db_session_dep),
+    current_user = Depends(aget_current_user),
 ):
-    """Get conversations for the authenticated user"""
-    conversations = get_conversations_by_user_id(current_user.id, session, is_deleted=False)
-    return api_response({"conversations": conversations})
+    """Get conversations for the authenticated user, newest first, with a last-message preview.
+
+    `before`/`after` take a conversation id from a previous page's cursors.
+    """
+    conversations = await aget_conversations_by_user_id(
+        current_user.id, session, is_deleted=False, limit=limit + 1, before=before, after=after
+    )
+    conversations, page = _page_info(conversations, limit, oldest_first=False, forward=after is not None)
+    previews = await aget_last_messages([conversation.id for conversation in conversations], session)
+    return api_response({
+        "conversations": [
+            {
+                "id": conversation.id,
+                "user_id": conversation.user_id,
+                "short_name": conversation.short_name,
+                "created_at": conversation.created_at,
+                "is_deleted": conversation.is_deleted,
+                "last_message": previews.get(conversation.id),
+            }
+            for conversation in conversations
+        ],
+        "page": page,
+    })
 
 
 @router.post("/summarize/{conversation_id}")
-def summarize_conversation(
+async def summarize_conversation(
     conversation_id: int,
-    openai_helper: OpenAIHelper = Depends(get_openai_helper),
-    session: Session = Depends(get_db_session_dep),
-    current_user = Depends(get_current_user_optional),
+    openai_helper: AsyncOpenAIHelper = Depends(get_async_openai_helper),
+    guardrails: GuardrailsHelper = Depends(get_guardrails_helper),
+    summarizer: ConversationSummarizer = Depends(get_conversation_summarizer),
+    admission: AdmissionController = Depends(get_admission_controller),
+    current_user = Depends(_admitted_user),
 ):
-    conversation = get_conversation_by_id(conversation_id, session)
+    """Summarize a conversation, folding only messages newer than the stored summary"""
+    conversation, backlog = await aload_summary_backlog(conversation_id)
     if conversation is None:
         return api_response({"message": "Conversation not found"}, 404)
     if current_user is not None and conversation.user_id != current_user.id:
         return api_response({"message": "Forbidden"}, 403)
 
-    history = get_conversation_messages(conversation_id, session)
-    context_text = "\n\n".join(
-        f"{message.role}: {message.user_message if message.role == Role.USER else message.content}" for message in history if message.role != Role.SYSTEM
-    )
-    
-    messages = [Message(conversation_id=conversation_id, role=Role.SYSTEM, content=SUMMARY_PROMPT.format(CONTEXT=context_text), user_message=None, created_at=datetime.now(UTC))]
-    summary = openai_helper.generate_response(messages)
+    if not backlog:
+        return api_response({"summary": conversation.summary or EMPTY_SUMMARY})
+
+    async with await admission.aacquire(current_user is not None):
+        summary = await summarizer.asummarize(conversation.summary, backlog, openai_helper)
+    summary = guardrails.validate_output(summary).answer
+    await asave_summary(conversation.id, summary, backlog[-1].id)
 
-    return api_response({"summary": summary})
\ No newline at end of file
+    return api_response({"summary": summary})
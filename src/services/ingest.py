@@ -0,0 +1,56 @@
+"""Build a local vector index from a JSONL corpus.
+
+Each line is a JSON object with `text` and optionally `id` (or `_id`) and
+`category`. Example:
+
+    python -m src.services.ingest corpus.jsonl --out ./vector_index --ivf-lists auto
+
+Serve it with RETRIEVER_BACKEND=local and LOCAL_INDEX_PATH=./vector_index.
+Running workers notice the rebuilt index's new meta.json and reload it
+within INDEX_VERSION_CHECK_SECONDS, flushing their caches.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Dict, Iterator
+
+from src.helpers.vector_store import HashingEmbedder, OpenAIEmbedder, build_index, suggest_nlist
+
+
+def _read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise SystemExit(f"{path}:{line_number}: invalid JSON ({exc})")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="path to a JSONL corpus")
+    parser.add_argument("--out", default="./vector_index", help="index directory (default: ./vector_index)")
+    parser.add_argument("--embedder", choices=[HashingEmbedder.name, OpenAIEmbedder.name], default=HashingEmbedder.name)
+    parser.add_argument("--dim", type=int, default=1024, help="hashing embedder dimension")
+    parser.add_argument("--model", default="text-embedding-3-small", help="OpenAI embedding model")
+    parser.add_argument("--ivf-lists", default="0", help="IVF list count, 'auto' for ~sqrt(n), 0 for brute force")
+    parser.add_argument("--namespace", default="__default__")
+    args = parser.parse_args(argv)
+
+    records = list(_read_jsonl(args.corpus))
+    embedder = HashingEmbedder(dim=args.dim) if args.embedder == HashingEmbedder.name else OpenAIEmbedder(model=args.model)
+    nlist = suggest_nlist(len(records)) if args.ivf_lists == "auto" else int(args.ivf_lists)
+
+    started = time.perf_counter()
+    meta = build_index(records, args.out, embedder, nlist=nlist, namespace=args.namespace)
+    elapsed = time.perf_counter() - started
+    print(f"Indexed {meta['count']} documents (dim={meta['dim']}, nlist={meta['nlist']}) into {args.out} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,18 @@ from __future__ import annotations
 
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 class Conversation(SQLModel, table=True):
+    # Serves the per-user sidebar listing: filter on user/is_deleted, newest first.
+    __table_args__ = (Index("ix_conversation_user_id_is_deleted_created_at", "user_id", "is_deleted", "created_at"),)
+
     id: int | None = Field(default=None, primary_key=True)
-    user_id: int | None = Field(index=True, nullable=True)
+    user_id: int | None = Field(nullable=True)
     short_name: str | None = Field(index=True, nullable=True)
     created_at: datetime = Field()
-    is_deleted: bool = Field(default=False)
\ No newline at end of file
+    is_deleted: bool = Field(default=False)
+    # Rolling summary and the id of the last message it covers; see `ConversationSummarizer`.
+    summary: str | None = Field(default=None, nullable=True)
+    summary_message_id: int | None = Field(default=None, nullable=True)
@@ -2,12 +2,17 @@ from __future__ import annotations
 
 from datetime import UTC, datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 class Message(SQLModel, table=True):
+    # History is always read as "messages of one conversation in id order";
+    # the large text columns are never filtered on, so they stay unindexed.
+    __table_args__ = (Index("ix_message_conversation_id_id", "conversation_id", "id"),)
+
     id: int | None = Field(default=None, primary_key=True)
-    conversation_id: int = Field(index=True)
-    role: str = Field(index=True)
-    content: str = Field(index=True)
-    user_message: str | None = Field(index=True, nullable=True)
-    created_at: datetime = Field(default_factory=datetime.now(UTC))
+    conversation_id: int = Field()
+    role: str = Field()
+    content: str = Field()
+    user_message: str | None = Field(nullable=True)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
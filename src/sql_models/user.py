@@ -8,6 +8,6 @@ class User(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     email: str = Field(index=True, unique=True)
     name: str = Field(index=True)
-    password: str = Field(index=True)
+    password: str = Field()
     created_at: datetime = Field(default=None)
     token: str | None = Field(default=None)
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""Shared fixtures: a migrated throwaway SQLite database and the app wired to it."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+
+import anyio
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.helpers.database import get_async_db_url
+from src.helpers.migrations import run_migrations
+from src.models.auth import CurrentUser
+
+USER = CurrentUser(id=1, email="alice@example.com", name="Alice")
+
+
+@pytest.fixture
+def db_url(tmp_path: Path) -> str:
+    url = f"sqlite:///{tmp_path / 'chat.db'}"
+    run_migrations(create_engine(url))
+    return url
+
+
+@pytest.fixture
+def db(db_url: str) -> Iterator[Session]:
+    """Sync session for seeding rows and reading them back."""
+    with Session(create_engine(db_url)) as session:
+        yield session
+
+
+@pytest.fixture
+def async_engine(db_url: str) -> Iterator[AsyncEngine]:
+    # NullPool: each test drives its own event loops, so no connection may outlive one.
+    engine = create_async_engine(get_async_db_url(db_url), poolclass=NullPool)
+    yield engine
+    anyio.run(engine.dispose)
+
+
+@pytest.fixture
+def client(async_engine: AsyncEngine):
+    """TestClient for the app with the database and the signed-in user overridden."""
+    from fastapi.testclient import TestClient
+
+    import main
+    from src.controllers.auth import aget_current_user, aget_current_user_optional
+    from src.helpers.database import get_async_db_session_dep
+
+    async def session_dep() -> AsyncIterator[AsyncSession]:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    overrides = {
+        get_async_db_session_dep: session_dep,
+        aget_current_user: lambda: USER,
+        aget_current_user_optional: lambda: USER,
+    }
+    main.app.dependency_overrides.update(overrides)
+    try:
+        yield TestClient(main.app)
+    finally:
+        for dependency in overrides:
+            main.app.dependency_overrides.pop(dependency, None)
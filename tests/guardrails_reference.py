@@ -0,0 +1,66 @@
+"""Reference implementation for the guardrails tests and benchmark.
+
+`legacy_sanitize` is the per-pattern input scan `GuardrailsEngine`
+replaced: a lowercase copy, six injection searches, four secret searches,
+then email/phone/secret `sub` passes. The engine must agree with it on the
+default rules. `synthetic_rules` grows a rule set without changing what
+matches in text built from `WORDS`.
+"""
+from __future__ import annotations
+
+import random
+import re
+import string
+
+from src.helpers.guardrails_engine import GuardrailRule
+
+WORDS = (
+    "account card transfer limit fee verification identity wire payment refund dispute "
+    "security password device login statement region compliance please help thanks"
+).split()
+
+_LEGACY_INJECTION = [
+    r"ignore\s+(all|any|previous)\s+instructions",
+    r"disregard\s+previous\s+instructions",
+    r"system\s+prompt",
+    r"you\s+are\s+chatgpt",
+    r"override\s+the\s+(rules|instructions)",
+    r"act\s+as\s+an?\s+(.+)",
+]
+_LEGACY_EMAIL = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+_LEGACY_PHONE = re.compile(r"\b(?:\+?\d{1,3}[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?){2}\d{4}\b")
+_LEGACY_SECRETS = [
+    re.compile(r"sk-[A-Za-z0-9]{20,}"),
+    re.compile(r"ghp_[A-Za-z0-9]{36}"),
+    re.compile(r"xox[baprs]-[A-Za-z0-9-]{10,}"),
+    re.compile(r"AIzaSy[0-9A-Za-z\-_]{35}"),
+]
+
+
+def legacy_sanitize(text: str) -> tuple[bool, str]:
+    lowered = text.lower()
+    if any(re.search(pattern, lowered) for pattern in _LEGACY_INJECTION):
+        return False, "Possible prompt injection detected"
+    for regex in _LEGACY_SECRETS:
+        if regex.search(text):
+            return False, "Possible secret detected"
+    redacted = _LEGACY_EMAIL.sub("[redacted-email]", text)
+    redacted = _LEGACY_PHONE.sub("[redacted-phone]", redacted)
+    for regex in _LEGACY_SECRETS:
+        redacted = regex.sub("[redacted-secret]", redacted)
+    return True, redacted
+
+
+def synthetic_rules(count: int, seed: int = 11) -> list[GuardrailRule]:
+    """Vendor-token and phrase rules shaped like the defaults, none of which match the sample text."""
+    rng = random.Random(seed)
+    rules = []
+    for index in range(count):
+        prefix = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 6)))
+        if index % 2:
+            pattern = rf"{prefix}_(live|test)_[A-Za-z0-9]{{24,}}"
+            rules.append(GuardrailRule(name=f"secret.synthetic_{index}", pattern=pattern, reason="Possible secret detected"))
+        else:
+            pattern = rf"{prefix}{rng.choice(WORDS)}\s+mode\s+(on|enabled)"
+            rules.append(GuardrailRule(name=f"injection.synthetic_{index}", pattern=pattern, redact_output=False, ignore_case=True))
+    return rules
@@ -0,0 +1,76 @@
+"""`HistoryBuilder.build` keeps the newest whole turns that fit the token budget."""
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from src.constants.role import Role
+from src.helpers.history import MESSAGE_OVERHEAD_TOKENS, SUMMARY_HEADER, HistoryBuilder
+from src.sql_models.message import Message
+
+NOW = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def _words(text: str) -> int:
+    return len(text.split())
+
+
+def _message(role: Role, content: str, user_message: str | None = None) -> Message:
+    return Message(conversation_id=1, role=role, content=content, user_message=user_message, created_at=NOW)
+
+
+def _history(turns: int) -> list[Message]:
+    messages = [_message(Role.SYSTEM, "system prompt")]
+    for index in range(turns):
+        messages.append(_message(Role.USER, f"context snippets padding padding question {index}", f"question {index}"))
+        messages.append(_message(Role.ASSISTANT, f"answer {index}"))
+    messages.append(_message(Role.GUARDRAILS, "refusal", "blocked prompt"))
+    messages.append(_message(Role.USER, "context snippets current question", "current question"))
+    return messages
+
+
+def _contents(messages: list[Message]) -> list[str]:
+    return [message.content for message in messages]
+
+
+def test_past_turns_are_compacted() -> None:
+    history = _history(2)
+    built = HistoryBuilder(max_tokens=10_000, counter=_words).build(history)
+    assert _contents(built) == ["system prompt", "question 0", "answer 0", "question 1", "answer 1", "context snippets current question"]
+    # Stored rows are left alone; the compacted USER turns are copies.
+    assert history[1].content.startswith("context snippets")
+
+
+def test_oldest_turns_are_dropped_at_the_budget() -> None:
+    builder = HistoryBuilder(counter=_words)
+    fixed = builder.count_tokens([_message(Role.SYSTEM, "system prompt"), _message(Role.USER, "context snippets current question")])
+    turn = builder.count_tokens([_message(Role.USER, "question 9"), _message(Role.ASSISTANT, "answer 9")])
+    builder.max_tokens = fixed + 3 * turn + turn // 2
+
+    built = builder.build(_history(10))
+    assert _contents(built) == [
+        "system prompt",
+        "question 7", "answer 7", "question 8", "answer 8", "question 9", "answer 9",
+        "context snippets current question",
+    ]
+    assert builder.count_tokens(built) <= builder.max_tokens
+
+
+def test_budget_smaller_than_the_current_turn_keeps_it() -> None:
+    built = HistoryBuilder(max_tokens=1, counter=_words).build(_history(3))
+    assert _contents(built) == ["system prompt", "context snippets current question"]
+
+
+def test_dropped_turns_are_summarized_within_budget() -> None:
+    builder = HistoryBuilder(counter=_words, summarize=True)
+    fixed = builder.count_tokens([_message(Role.SYSTEM, "system prompt"), _message(Role.USER, "context snippets current question")])
+    builder.max_tokens = fixed + 40 + 8 * MESSAGE_OVERHEAD_TOKENS
+
+    built = builder.build(_history(10))
+    summary = built[1]
+    assert summary.role == Role.SYSTEM and summary.content.startswith(SUMMARY_HEADER)
+    assert "- question 6" in summary.content and "question 7" not in summary.content
+    assert _contents(built[2:]) == [
+        "question 7", "answer 7", "question 8", "answer 8", "question 9", "answer 9",
+        "context snippets current question",
+    ]
+    assert builder.count_tokens(built) <= builder.max_tokens
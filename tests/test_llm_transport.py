@@ -0,0 +1,23 @@
+"""Every retry and hedging knob of `TransportSettings` can be set from the environment."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from src.helpers.llm_transport import TransportSettings
+
+
+def test_defaults_match_the_dataclass(monkeypatch: pytest.MonkeyPatch) -> None:
+    for name in [name for name in os.environ if name.startswith("OPENAI_")]:
+        monkeypatch.delenv(name)
+    assert TransportSettings.from_env() == TransportSettings()
+
+
+def test_retry_and_hedge_settings_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OPENAI_MAX_RETRIES", "4")
+    monkeypatch.setenv("OPENAI_MAX_BACKOFF_SECONDS", "2.5")
+    monkeypatch.setenv("OPENAI_HEDGE_ENABLED", "true")
+    monkeypatch.setenv("OPENAI_HEDGE_MIN_SAMPLES", "5")
+    settings = TransportSettings.from_env()
+    assert (settings.max_retries, settings.max_backoff, settings.hedge, settings.hedge_min_samples) == (4, 2.5, True, 5)
@@ -0,0 +1,49 @@
+"""Fresh databases must end up with the models' schema, and concurrent boots must migrate once."""
+from __future__ import annotations
+
+import multiprocessing
+from pathlib import Path
+
+from sqlalchemy import inspect, select
+from sqlmodel import SQLModel, create_engine
+
+from src.helpers.migrations import MIGRATIONS, run_migrations, schema_version
+from src.sql_models.conversation import Conversation  # noqa: F401
+from src.sql_models.message import Message  # noqa: F401
+from src.sql_models.user import User  # noqa: F401
+
+
+def _schema(url: str) -> dict[str, tuple]:
+    inspector = inspect(create_engine(url))
+    schema = {}
+    for table in ("user", "conversation", "message"):
+        columns = sorted((column["name"], str(column["type"]), column["nullable"]) for column in inspector.get_columns(table))
+        indexes = sorted((index["name"], tuple(index["column_names"]), bool(index["unique"])) for index in inspector.get_indexes(table))
+        schema[table] = (columns, indexes)
+    return schema
+
+
+def test_fresh_migration_matches_models(tmp_path: Path) -> None:
+    migrated = f"sqlite:///{tmp_path / 'migrated.db'}"
+    run_migrations(create_engine(migrated))
+    modelled = f"sqlite:///{tmp_path / 'modelled.db'}"
+    SQLModel.metadata.create_all(create_engine(modelled))
+    assert _schema(migrated) == _schema(modelled)
+
+
+def _migrate(url: str) -> None:
+    run_migrations(create_engine(url))
+
+
+def test_concurrent_boots_apply_each_migration_once(tmp_path: Path) -> None:
+    url = f"sqlite:///{tmp_path / 'chat.db'}"
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_migrate, args=(url,)) for _ in range(6)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+    assert [worker.exitcode for worker in workers] == [0] * len(workers)
+    with create_engine(url).connect() as conn:
+        versions = list(conn.execute(select(schema_version.c.version)).scalars())
+    assert sorted(versions) == [version for version, _, _ in MIGRATIONS]
@@ -0,0 +1,62 @@
+"""The streamed output filter must emit exactly what `validate_output` returns for the whole answer."""
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from src.helpers.guardrails import GuardrailsHelper
+
+SECRET = "sk-" + "A1b2C3d4E5f6G7h8I9j0K1l2"
+
+SAMPLES = [
+    "<img src=x onerror=alert(1)<script>x</script>>",
+    "<img src=x onerror=alert(1)<style>p{}</style> tail>",
+    "before <b>bold</b> after",
+    "a <script>alert('<b>')</script> b",
+    "a <script>never closed",
+    "x < y and y > z",
+    "fish &amp; chips &lt;b&gt; &#39;q&#39;",
+    f"key {SECRET} in text",
+    f"<i>{SECRET}</i> and mail bob@example.com",
+    "call +1 415-555-0100 now",
+    f"<a href='{SECRET}'>link</a>",
+]
+
+
+def _stream(helper: GuardrailsHelper, deltas: list[str]) -> str:
+    return "".join(helper.filter_stream(deltas))
+
+
+def _splits(text: str, rng: random.Random) -> list[list[str]]:
+    """One delta per character, every two-way split, and a few random splits."""
+    cases = [list(text)]
+    cases += [[text[:cut], text[cut:]] for cut in range(1, len(text))]
+    for _ in range(20):
+        cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, 6))))
+        cases.append([text[start:end] for start, end in zip([0, *cuts], [*cuts, len(text)])])
+    return cases
+
+
+@pytest.fixture(scope="module")
+def helper() -> GuardrailsHelper:
+    return GuardrailsHelper()
+
+
+def test_unterminated_tag_before_script_block(helper: GuardrailsHelper) -> None:
+    deltas = ["<img src=x onerror=alert(1)", "<script>x</script>", ">"]
+    assert _stream(helper, deltas) == helper.validate_output("".join(deltas)).answer
+    assert "onerror" not in _stream(helper, deltas)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_stream_matches_validate_output(helper: GuardrailsHelper, text: str) -> None:
+    expected = helper.validate_output(text).answer
+    for deltas in _splits(text, random.Random(text)):
+        assert _stream(helper, deltas) == expected, deltas
+
+
+def test_secret_split_across_deltas_is_redacted(helper: GuardrailsHelper) -> None:
+    output = _stream(helper, ["token: ", SECRET[:5], SECRET[5:15], SECRET[15:], " done"])
+    assert SECRET not in output
+    assert "[redacted-secret]" in output
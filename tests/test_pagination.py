@@ -0,0 +1,92 @@
+"""Keyset pages of message history and of the conversation list must tile the full listing."""
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+from sqlmodel import Session
+
+from src.constants.role import Role
+from src.sql_models.conversation import Conversation
+from src.sql_models.message import Message
+
+from tests.conftest import USER
+
+START = datetime(2024, 1, 1, 12, 0, 0, tzinfo=UTC)
+
+
+def _seed_messages(db: Session) -> tuple[int, list[str]]:
+    conversation = Conversation(user_id=USER.id, created_at=START)
+    db.add(conversation)
+    db.commit()
+    shown = []
+    for index in range(7):
+        if index == 3:
+            db.add(Message(conversation_id=conversation.id, role=Role.SYSTEM, content="system prompt", user_message=None, created_at=START))
+        db.add(Message(conversation_id=conversation.id, role=Role.ASSISTANT, content=f"answer {index}", user_message=None, created_at=START))
+        shown.append(f"answer {index}")
+    db.commit()
+    return conversation.id, shown
+
+
+def _seed_conversations(db: Session) -> list[int]:
+    """Five live conversations of USER, two of them created in the same instant; newest first."""
+    stamps = [START, START + timedelta(minutes=1), START + timedelta(minutes=1), START + timedelta(minutes=2), START + timedelta(minutes=3)]
+    conversations = [Conversation(user_id=USER.id, short_name=f"c{index}", created_at=stamp) for index, stamp in enumerate(stamps)]
+    db.add_all(conversations)
+    db.add(Conversation(user_id=USER.id, short_name="deleted", created_at=START, is_deleted=True))
+    db.add(Conversation(user_id=USER.id + 1, short_name="someone else", created_at=START))
+    db.commit()
+    return [conversation.id for conversation in sorted(conversations, key=lambda c: (c.created_at, c.id), reverse=True)]
+
+
+def _messages(client, conversation_id: int, **params) -> tuple[list[str], dict]:
+    response = client.get(f"/api/chat/messages/{conversation_id}", params=params)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    return [message["content"] for message in data["messages"]], data["page"]
+
+
+def _conversations(client, **params) -> tuple[list[int], dict]:
+    response = client.get("/api/chat/conversations", params=params)
+    assert response.status_code == 200
+    data = response.json()["data"]
+    return [conversation["id"] for conversation in data["conversations"]], data["page"]
+
+
+def test_message_pages_round_trip(client, db: Session) -> None:
+    conversation_id, shown = _seed_messages(db)
+
+    assert _messages(client, conversation_id)[0] == shown
+
+    newest, page = _messages(client, conversation_id, limit=3)
+    assert newest == shown[4:] and page["has_more"]
+    middle, page = _messages(client, conversation_id, limit=3, before=page["before"])
+    assert middle == shown[1:4] and page["has_more"]
+    oldest, page = _messages(client, conversation_id, limit=3, before=page["before"])
+    assert oldest == shown[:1] and not page["has_more"]
+
+    # And forward again from the oldest page's cursor.
+    forward, page = _messages(client, conversation_id, limit=3, after=page["after"])
+    assert forward == shown[1:4] and page["has_more"]
+    forward, page = _messages(client, conversation_id, limit=3, after=page["after"])
+    assert forward == shown[4:] and not page["has_more"]
+    assert _messages(client, conversation_id, limit=3, after=page["after"]) == ([], {"limit": 3, "has_more": False, "before": None, "after": None})
+
+
+def test_conversation_pages_round_trip(client, db: Session) -> None:
+    newest_first = _seed_conversations(db)
+
+    assert _conversations(client)[0] == newest_first
+
+    first, page = _conversations(client, limit=2)
+    assert first == newest_first[:2] and page["has_more"]
+    second, page = _conversations(client, limit=2, before=page["before"])
+    assert second == newest_first[2:4] and page["has_more"]
+    last, page = _conversations(client, limit=2, before=page["before"])
+    assert last == newest_first[4:] and not page["has_more"]
+
+    # Back towards the newest, through the created_at tie.
+    newer, page = _conversations(client, limit=2, after=page["after"])
+    assert newer == newest_first[2:4] and page["has_more"]
+    newest, page = _conversations(client, limit=2, after=page["after"])
+    assert newest == newest_first[:2] and not page["has_more"]
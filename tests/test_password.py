@@ -0,0 +1,46 @@
+"""A due hash upgrade must never fail a login; the pool size is shared among server workers."""
+from __future__ import annotations
+
+import anyio
+import bcrypt
+import pytest
+from fastapi import HTTPException
+
+from src.helpers.password import PasswordHasher, default_workers
+
+OLD_HASH = bcrypt.hashpw(b"correct horse", bcrypt.gensalt(rounds=4)).decode()
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(rounds=5, workers=1, max_pending=1)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_rehash_upgrades_cost(hasher: PasswordHasher) -> None:
+    ok, new_hash = anyio.run(hasher.averify, "correct horse", OLD_HASH)
+    assert ok
+    assert new_hash is not None and new_hash.startswith("$2b$05$")
+
+
+def test_failed_rehash_keeps_login(hasher: PasswordHasher, monkeypatch: pytest.MonkeyPatch) -> None:
+    async def saturated(password: str) -> str:
+        raise HTTPException(status_code=503, detail="Too many concurrent authentication requests")
+
+    monkeypatch.setattr(hasher, "ahash", saturated)
+    assert anyio.run(hasher.averify, "correct horse", OLD_HASH) == (True, None)
+
+
+def test_wrong_password_skips_rehash(hasher: PasswordHasher) -> None:
+    assert anyio.run(hasher.averify, "wrong", OLD_HASH) == (False, None)
+
+
+def test_default_workers_share_cores(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert default_workers() == 2
+    monkeypatch.setenv("WEB_CONCURRENCY", "16")
+    assert default_workers() == 1
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    assert default_workers() == 8
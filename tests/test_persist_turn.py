@@ -0,0 +1,56 @@
+"""A chat turn is written in one transaction: all of it, or nothing."""
+from __future__ import annotations
+
+import anyio
+import pytest
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.constants.role import Role
+from src.controllers.conversation import apersist_turn, new_conversation, new_message
+from src.sql_models.conversation import Conversation
+from src.sql_models.message import Message
+
+from tests.conftest import USER
+
+
+def _persist(engine: AsyncEngine, conversation: Conversation, messages: list[Message]) -> list[Message]:
+    async def run() -> list[Message]:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            return await apersist_turn(conversation, messages, session)
+
+    return anyio.run(run)
+
+
+def _count(db: Session, model: type) -> int:
+    return db.exec(select(func.count()).select_from(model)).one()
+
+
+def test_new_conversation_and_turn_are_inserted_together(async_engine: AsyncEngine, db: Session) -> None:
+    conversation = new_conversation(USER.id)
+    turn = [new_message(Role.USER, "prompt", "question"), new_message(Role.ASSISTANT, "answer")]
+    saved = _persist(async_engine, conversation, turn)
+
+    assert conversation.id is not None
+    assert [message.conversation_id for message in saved] == [conversation.id] * 2
+    assert all(message.id is not None for message in saved)
+    stored = db.exec(select(Message).order_by(Message.id)).all()
+    assert [(message.id, message.role, message.content) for message in stored] == [(message.id, message.role, message.content) for message in saved]
+
+    # A follow-up turn appends to the existing conversation without inserting it again.
+    _persist(async_engine, conversation, [new_message(Role.USER, "prompt 2", "question 2")])
+    assert _count(db, Conversation) == 1
+    assert _count(db, Message) == 3
+
+
+def test_failed_turn_leaves_no_orphan_conversation(async_engine: AsyncEngine, db: Session) -> None:
+    broken = new_message(Role.ASSISTANT, "answer")
+    broken.content = None  # violates NOT NULL when the batch is flushed
+    with pytest.raises(IntegrityError):
+        _persist(async_engine, new_conversation(USER.id), [new_message(Role.USER, "prompt", "question"), broken])
+
+    assert _count(db, Conversation) == 0
+    assert _count(db, Message) == 0
@@ -0,0 +1,52 @@
+"""`api_response` must put the same JSON on the wire as the `jsonable_encoder` path it replaced."""
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from src.constants.role import Role
+from src.helpers.response import api_response, json_dumps
+from src.models.auth import CurrentUser
+from src.sql_models.conversation import Conversation
+
+MOMENT = datetime(2024, 1, 2, 3, 4, 5)
+UTC_MOMENT = MOMENT.replace(tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        (UTC_MOMENT, "2024-01-02T03:04:05+00:00"),
+        (MOMENT, "2024-01-02T03:04:05"),
+        (MOMENT.replace(tzinfo=timezone(timedelta(hours=2))), "2024-01-02T03:04:05+02:00"),
+        (MOMENT.replace(microsecond=120000, tzinfo=timezone.utc), "2024-01-02T03:04:05.120000+00:00"),
+    ],
+)
+def test_datetime_format(value: datetime, expected: str) -> None:
+    assert json.loads(json_dumps({"at": value})) == {"at": expected}
+    assert json.loads(json_dumps([(value,)])) == [[expected]]
+
+
+PAYLOADS = [
+    {"conversations": [{"id": 1, "created_at": UTC_MOMENT, "last_message": {"role": Role.USER, "content": "hi", "created_at": UTC_MOMENT}}], "page": {"has_more": False}},
+    {"user": CurrentUser(id=1, email="a@example.com", name="A", created_at=UTC_MOMENT).model_dump(), "token_type": "bearer"},
+    {"user": CurrentUser(id=1, email="a@example.com", name="A", created_at=UTC_MOMENT)},
+    {"conversations": [Conversation(id=1, user_id=1, created_at=UTC_MOMENT)]},
+    {"messages": [{"role": Role.ASSISTANT, "content": "<b>ok</b> ☃"}], "conversation_id": 3},
+]
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_matches_jsonable_encoder(payload: object) -> None:
+    response = api_response(payload, status_code=201)
+    assert response.status_code == 201
+    assert json.loads(response.body) == {"data": jsonable_encoder(payload), "status_code": 201}
+
+
+def test_payload_is_not_modified() -> None:
+    payload = {"conversations": [{"id": 1, "created_at": UTC_MOMENT}]}
+    json_dumps(payload)
+    assert payload["conversations"][0]["created_at"] is UTC_MOMENT
@@ -0,0 +1,76 @@
+"""Cached retrievals must not outlive the index version they were fetched from."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+
+import anyio
+import pytest
+
+from src.helpers.answer_cache import AnswerCache
+from src.helpers.retriever import Hit, Retriever
+from src.helpers.vector_store import HashingEmbedder, LocalVectorStore, build_index
+
+
+class CountingRetriever(Retriever):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = 0
+        self.served_version = self.index_version
+
+    def _read_index_version(self) -> str | None:
+        return self.served_version
+
+    def _search(self, query_text: str, top_k: int) -> List[Hit]:
+        self.calls += 1
+        return [{"_id": f"{self.index_version}-{self.calls}", "_score": 1.0, "fields": {"text": query_text}}]
+
+
+@pytest.fixture(autouse=True)
+def check_every_search(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("INDEX_VERSION_CHECK_SECONDS", "0")
+
+
+def test_new_index_version_flushes_a_warm_cache() -> None:
+    retriever = CountingRetriever()
+    first = retriever.search("Card  limit", top_k=3)
+    assert retriever.search("card limit", top_k=3) == first
+    assert retriever.calls == 1
+    retriever.served_version = "1"
+    assert retriever.search("card limit", top_k=3) != first
+    assert retriever.index_version == "1"
+    assert retriever.cache_stats()["entries"] == 1
+
+
+def test_version_checks_are_throttled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("INDEX_VERSION_CHECK_SECONDS", "3600")
+    retriever = CountingRetriever()
+    retriever.search("card limit")
+    retriever.served_version = "1"
+    retriever.search("card limit")
+    assert retriever.calls == 1
+    assert retriever.refresh(force=True)
+    retriever.search("card limit")
+    assert retriever.calls == 2
+
+
+def test_rebuilt_local_index_is_served_without_restart(tmp_path: Path) -> None:
+    embedder = HashingEmbedder(dim=64)
+    build_index([{"id": "old", "text": "raise my card limit"}], tmp_path / "index", embedder)
+    store = LocalVectorStore(tmp_path / "index")
+    assert [hit["_id"] for hit in store.search("card limit", top_k=1)] == ["old"]
+    build_index([{"id": "new", "text": "raise my card limit"}], tmp_path / "index", embedder)
+    assert [hit["_id"] for hit in anyio.run(store.asearch, "card limit", 1)] == ["new"]
+
+
+def test_answer_cache_drops_answers_for_an_old_index() -> None:
+    cache = AnswerCache(enabled=True)
+
+    async def scenario() -> None:
+        lookup = await cache.alookup("card limit", ["doc-1"], "0")
+        cache.store(lookup, "Call us.")
+        assert (await cache.alookup("card limit", ["doc-1"], "0")).answer == "Call us."
+        assert (await cache.alookup("card limit", ["doc-1"], "1")).answer is None
+        assert cache.stats()["entries"] == 0
+
+    anyio.run(scenario)
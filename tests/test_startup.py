@@ -0,0 +1,13 @@
+"""Importing the app must not load the heavy SDKs; they are imported on first use."""
+from __future__ import annotations
+
+import subprocess
+import sys
+
+LAZY_MODULES = ("numpy", "guardrails", "pinecone", "openai", "sentence_transformers")
+
+
+def test_import_main_stays_lazy() -> None:
+    probe = f"import sys, main; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout.split()
+    assert loaded == []
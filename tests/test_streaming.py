@@ -0,0 +1,59 @@
+"""`SSEResponse` must run its cleanup however the response ends."""
+from __future__ import annotations
+
+import anyio
+import pytest
+from starlette.requests import ClientDisconnect
+
+from src.helpers.admission import AdmissionController
+from src.helpers.streaming import SSEResponse
+
+SCOPE = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "method": "POST", "path": "/chat/stream", "headers": []}
+
+
+async def _receive() -> dict:
+    await anyio.sleep_forever()
+    return {}
+
+
+async def _frames():
+    yield b"data: {}\n\n"
+
+
+def _run(response: SSEResponse, send) -> None:
+    async def main() -> None:
+        # Starlette reports a failed send as a client disconnect.
+        with pytest.raises(ClientDisconnect):
+            await response(SCOPE, _receive, send)
+
+    anyio.run(main)
+
+
+def test_slot_released_when_headers_cannot_be_sent() -> None:
+    controller = AdmissionController(max_llm_calls=1)
+
+    async def broken_send(message: dict) -> None:
+        raise OSError("connection reset")
+
+    async def acquire():
+        return await controller.aacquire(True)
+
+    slot = anyio.run(acquire)
+    assert controller.stats()["in_flight"] == 1
+    _run(SSEResponse(_frames(), on_close=slot.arelease), broken_send)
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_on_close_runs_after_a_full_response() -> None:
+    closed = []
+    sent = []
+
+    async def send(message: dict) -> None:
+        sent.append(message)
+
+    async def on_close() -> None:
+        closed.append(True)
+
+    anyio.run(lambda: SSEResponse(_frames(), on_close=on_close)(SCOPE, _receive, send))
+    assert closed == [True]
+    assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
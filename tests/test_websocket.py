@@ -0,0 +1,40 @@
+"""Frames queued before `WebSocketSession.close` must reach the client before the close frame."""
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from src.helpers.websocket import CLOSE_POLICY_VIOLATION, WebSocketSession
+
+
+def _app(frames: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def endpoint(websocket: WebSocket) -> None:
+        await websocket.accept()
+        session = WebSocketSession(websocket, ping_interval=60)
+
+        async def on_turn(user_text: str) -> None:
+            for index in range(frames):
+                await session.send_text(f"delta {index}")
+            await session.send_json({"event": "error", "message": "Token expired"})
+            session.close(CLOSE_POLICY_VIOLATION, "token expired")
+
+        await session.run(on_turn)
+
+    return app
+
+
+@pytest.mark.parametrize("frames", [0, 1, 20])
+def test_queued_frames_are_sent_before_close(frames: int) -> None:
+    with TestClient(_app(frames)).websocket_connect("/ws") as websocket:
+        websocket.send_json({"message": "hello"})
+        received = [websocket.receive_text() for _ in range(frames)]
+        assert received == [f"delta {index}" for index in range(frames)]
+        assert websocket.receive_json() == {"event": "error", "message": "Token expired"}
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_text()
+        assert closed.value.code == CLOSE_POLICY_VIOLATION